@@ -1,20 +1,83 @@
 #!/usr/bin/env python3
 
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 import json
+import re
+import time
 
 import subprocess
-from multiprocessing import Pool, freeze_support
-from typing import List, Tuple, Optional
+from multiprocessing import Pool
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
 
 import click
 import yaml
 import os
 
-from kubernetes import client
+from constants import (
+    ALL_CLUSTERS,
+    APTOS_NODE_HELM_CHART_DIRECTORY,
+    APTOS_NODE_HELM_VALUES_FILE,
+    CLUSTER_CHOICES,
+    CLUSTER_STAKE_AMOUNTS,
+    CLUSTERS,
+    Cluster,
+    GENESIS_DIRECTORY,
+    HOST_CACHE_FILE,
+    HOST_CACHE_TTL_SECS,
+    JOB_LOG_DIRECTORY,
+    NAMESPACE,
+    REST_API_PORT,
+    VALIDATOR_STAKE_AMOUNT,
+    apps_v1_api,
+    cluster_by_name,
+    core_v1_api,
+    kube_clients,
+    settings,
+)
+from era_cleanup import clean_previous_eras, print_era_cleanup_results
+from genesis_manifest import (
+    GenesisManifest,
+    changed_nodes,
+    genesis_up_to_date,
+    hash_layout,
+    hash_node_inputs,
+    load_genesis_manifest,
+    save_genesis_manifest,
+)
+from genesis_secrets import (
+    apply_genesis_secrets,
+    build_genesis_secrets,
+    genesis_secrets_yaml,
+)
+from helm_render import (
+    ManifestDiff,
+    diff_manifest,
+    forget_applied_state,
+    load_applied_state,
+    manifest_objects,
+    parse_manifest,
+    record_applied_objects,
+    render_manifest,
+    save_applied_state,
+)
+from jobs import Job, check_job_results, run_jobs
+from rolling_upgrade import (
+    BatchTiming,
+    ValidatorNode,
+    max_faulty_voting_power,
+    plan_batches,
+    rolling_upgrade,
+    total_voting_power,
+    validator_objects,
+    voting_power,
+)
+from multicluster import print_prefixed, run_on_clusters, run_prefixed, select_clusters
+from target_probe import probe_available, PROBE_DEPENDENCY_ERROR
 
-from constants import *
+if TYPE_CHECKING:
+    from kubernetes import client
 
 
 @dataclass
@@ -23,50 +86,68 @@ class ValidatorFullnodeHosts:
     fullnode_host: str
 
 
-def get_validator_fullnode_host(
-    cluster: Cluster, services: client.V1ServiceList, node_name: str
-) -> ValidatorFullnodeHosts:
+# aptos-node services are named {release}-aptos-node-{index}-{role}, with a -lb suffix for the haproxy LoadBalancer variant
+NODE_SERVICE_NAME_PATTERN = re.compile(
+    r"^(?P<release>.+)-aptos-node-(?P<index>\d+)-(?P<role>validator|fullnode)(?P<lb>-lb)?$"
+)
+
+
+@dataclass
+class MissingHost:
+    cluster: Cluster
+    node_index: int
+    role: str
+    service_name: Optional[str]
+
+    def __str__(self) -> str:
+        if self.service_name is None:
+            return (
+                f"No {self.role} service for node aptos-node-{self.node_index}: "
+                f"kubectl --context {settings.kube_contexts[self.cluster]} get svc | grep aptos-node-{self.node_index}-{self.role}"
+            )
+        return (
+            f"No EXTERNAL-IP for service {self.service_name}: "
+            f"kubectl --context {settings.kube_contexts[self.cluster]} get svc {self.service_name}"
+        )
+
+
+class MissingHostsError(Exception):
     """
-    Get the validator and fullnode hosts for the given node, in sorted order by their index
+    Raised when one or more nodes do not have an external LoadBalancer IP yet
     """
-    validator_host = ""
-    fullnode_host = ""
-    validator_svc_substring = "validator-lb" if HAPROXY_ENABLED else "validator"
-    fullnode_svc_substring = "fullnode-lb" if HAPROXY_ENABLED else "fullnode"
-    for service in services.items:
-        if node_name in service.metadata.name:
-            try:
-                if validator_svc_substring in service.metadata.name:
-                    validator_host = service.status.load_balancer.ingress[0].ip
-                if fullnode_svc_substring in service.metadata.name:
-                    fullnode_host = service.status.load_balancer.ingress[0].ip
-
-            except:
-                print(
-                    f"Failed to get external LoadBalancer IP for service: {service.metadata.name}"
-                )
-                print("Please check that the service has an EXTERNAL-IP address")
-                print(
-                    f"kubectl --context {KUBE_CONTEXTS[cluster]} get svc {service.metadata.name}"
-                )
-                raise SystemExit(1)
-    missing_validator_host = validator_host == ""
-    missing_fullnode_host = fullnode_host == ""
-    if missing_validator_host:
-        print(f"Failed to get validator host for node: {node_name}")
-        print(
-            f"kubectl --context {KUBE_CONTEXTS[cluster]} get svc | grep {node_name}-validator"
-        )
-    if missing_fullnode_host:
-        print(f"Failed to get fullnode host for node: {node_name}")
-        print(
-            f"kubectl --context {KUBE_CONTEXTS[cluster]} get svc | grep {node_name}-fullnode"
+
+    def __init__(self, missing: List[MissingHost]) -> None:
+        self.missing = missing
+        super().__init__(
+            f"Failed to get external LoadBalancer IPs for {len(missing)} services:\n"
+            + "\n".join(str(m) for m in missing)
         )
-    if missing_fullnode_host or missing_validator_host:
-        raise SystemExit(1)
-    return ValidatorFullnodeHosts(
-        validator_host=validator_host, fullnode_host=fullnode_host
-    )
+
+
+def index_node_services(
+    cluster: Cluster, services: client.V1ServiceList
+) -> Dict[Tuple[int, str], client.V1Service]:
+    """
+    Index the cluster's services by (node index, role), where role is validator or fullnode.
+    The haproxy -lb variant is preferred if haproxy is enabled, otherwise the node's own service is preferred
+    """
+    index: Dict[Tuple[int, str], client.V1Service] = {}
+    for service in services.items:
+        match = NODE_SERVICE_NAME_PATTERN.match(service.metadata.name)
+        if not match or match.group("release") != cluster.value:
+            continue
+        key = (int(match.group("index")), match.group("role"))
+        preferred = bool(match.group("lb")) == settings.haproxy_enabled
+        if preferred or key not in index:
+            index[key] = service
+    return index
+
+
+def get_service_external_ip(service: client.V1Service) -> Optional[str]:
+    try:
+        return service.status.load_balancer.ingress[0].ip or None
+    except (AttributeError, IndexError, TypeError):
+        return None
 
 
 # wipe network
@@ -74,40 +155,153 @@ def get_validator_fullnode_hosts(
     cluster: Cluster,
 ) -> List[ValidatorFullnodeHosts]:
     """
-    Get the validator and fullnode hosts for the given cluster, in sorted order by their index
+    Get the validator and fullnode hosts for the given cluster, in sorted order by their index.
+    Raises MissingHostsError listing every node that does not have an external IP
     """
     # get the services for each cluster
-    core_client = client.CoreV1Api(kube_clients()[cluster])
+    core_client = core_v1_api(cluster)
     services = core_client.list_namespaced_service(namespace=NAMESPACE)
+    index = index_node_services(cluster, services)
 
     validator_fullnode_hosts_list = []
-
-    num_nodes = CLUSTERS[cluster]
-    for node in range(num_nodes):
-        node_name = f"node-{node}"
-        validator_fullnode_hosts = get_validator_fullnode_host(
-            cluster, services, node_name
+    missing: List[MissingHost] = []
+    for node in range(CLUSTERS[cluster]):
+        hosts = {}
+        for role in ("validator", "fullnode"):
+            service = index.get((node, role))
+            hosts[role] = get_service_external_ip(service) if service else None
+            if hosts[role] is None:
+                missing.append(
+                    MissingHost(
+                        cluster=cluster,
+                        node_index=node,
+                        role=role,
+                        service_name=service.metadata.name if service else None,
+                    )
+                )
+        validator_fullnode_hosts_list.append(
+            ValidatorFullnodeHosts(
+                validator_host=hosts["validator"], fullnode_host=hosts["fullnode"]
+            )
         )
-        validator_fullnode_hosts_list.append(validator_fullnode_hosts)
 
-    assert len(validator_fullnode_hosts_list) == num_nodes
+    if missing:
+        raise MissingHostsError(missing)
     return validator_fullnode_hosts_list
 
 
+def host_cache_key(cluster: Cluster, era: str) -> str:
+    return f"{settings.kube_contexts[cluster]}/e{era}"
+
+
+def read_host_cache() -> Dict[str, dict]:
+    try:
+        with open(HOST_CACHE_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_host_cache(cache: Dict[str, dict]) -> None:
+    os.makedirs(os.path.dirname(HOST_CACHE_FILE), exist_ok=True)
+    tmp_file = f"{HOST_CACHE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_file, HOST_CACHE_FILE)
+
+
+def forget_cached_hosts(clusters: List[Cluster]) -> None:
+    """
+    Drop the clusters' cached hosts of every era, e.g. once their LoadBalancers are de-provisioned
+    """
+    cache = read_host_cache()
+    prefixes = tuple(f"{settings.kube_contexts[cluster]}/" for cluster in clusters)
+    kept = {key: entry for key, entry in cache.items() if not key.startswith(prefixes)}
+    if len(kept) != len(cache):
+        write_host_cache(kept)
+
+
+def discover_validator_fullnode_hosts(
+    clusters: List[Cluster],
+    refresh: bool = False,
+    ttl_secs: int = HOST_CACHE_TTL_SECS,
+) -> Dict[Cluster, List[ValidatorFullnodeHosts]]:
+    """
+    Get the validator and fullnode hosts for each of the given clusters. Cached entries younger than
+    ttl_secs are reused unless refresh is set, and the remaining clusters are queried concurrently
+    """
+    cache = read_host_cache()
+    now = time.time()
+    hosts: Dict[Cluster, List[ValidatorFullnodeHosts]] = {}
+    for cluster in clusters:
+        entry = cache.get(host_cache_key(cluster, settings.current_era))
+        if (
+            not refresh
+            and entry
+            and now - entry["timestamp"] < ttl_secs
+            and len(entry["hosts"]) == CLUSTERS[cluster]
+        ):
+            hosts[cluster] = [
+                ValidatorFullnodeHosts(validator_host=v, fullnode_host=f)
+                for v, f in entry["hosts"]
+            ]
+
+    stale_clusters = [cluster for cluster in clusters if cluster not in hosts]
+    if not stale_clusters:
+        return hosts
+
+    missing: List[MissingHost] = []
+    for cluster, result in run_on_clusters(
+        get_validator_fullnode_hosts, stale_clusters
+    ).items():
+        if isinstance(result.error, MissingHostsError):
+            missing.extend(result.error.missing)
+            continue
+        if not result.ok:
+            raise result.error
+        hosts[cluster] = result.value
+        cache[host_cache_key(cluster, settings.current_era)] = {
+            "timestamp": now,
+            "hosts": [[h.validator_host, h.fullnode_host] for h in hosts[cluster]],
+        }
+
+    write_host_cache(cache)
+    if missing:
+        raise MissingHostsError(missing)
+    return hosts
+
+
 # authenticate with each network
 @click.group()
-def main() -> None:
+@click.option(
+    "--kube-stats",
+    is_flag=True,
+    default=False,
+    help="Print how many kube API clients and connections were created on exit",
+)
+@click.pass_context
+def main(ctx: click.Context, kube_stats: bool) -> None:
     """Aptos Multi-region Cluster Management CLI"""
     # Check that the current directory is the root of the repository.
     if not os.path.exists(".git"):
         print("This script must be run from the root of the repository.")
         raise SystemExit(1)
+    if kube_stats:
+        ctx.call_on_close(print_kube_client_stats)
+
+
+def print_kube_client_stats() -> None:
+    stats = kube_clients().stats()
+    print(
+        f"kube clients created: {stats['clients_created']}, connections created: {stats['connections_created']}"
+    )
 
 
 def auth_all_clusters() -> int:
     ret = 0
+    # one cluster at a time, since each script writes its credentials to the same kubeconfig
     for cluster in CLUSTERS:
-        cp = subprocess.run(["bash", f"./terraform/{cluster.value}/kubectx.sh"])
+        cp = subprocess.run(["bash", f"./{cluster.terraform_directory}/kubectx.sh"])
         if cp.returncode != 0:
             ret = cp.returncode
             print(f"Failed to authenticate with cluster: {cluster}")
@@ -121,7 +315,7 @@ def reauth_gcloud() -> int:
     ret = subprocess.run(["gcloud", "auth", "login", "--update-adc"])
     if ret.returncode != 0:
         return ret.returncode
-    ret = subprocess.run(["gcloud", "config", "set", "project", GCP_PROJECT_ID])
+    ret = subprocess.run(["gcloud", "config", "set", "project", settings.gcp_project_id])
     if ret.returncode != 0:
         return ret.returncode
     return 0
@@ -142,85 +336,114 @@ def auth() -> None:
         if ret != 0:
             print("Failed to authenticate with cluster")
             raise SystemExit(1)
+    # credentials may have changed, so drop any cached clients
+    kube_clients().invalidate()
 
 
-def generate_keys_for_genesis(cli_path: str = "") -> None:
-    procs: List[subprocess.Popen] = []
+def generate_keys_for_genesis(
+    cli_path: str = "", concurrency: Optional[int] = None, retries: int = 0
+) -> None:
+    jobs: List[Job] = []
     for cluster, nodes_per_cluster in CLUSTERS.items():
         print(
             f"Generating keys for {nodes_per_cluster} validators in cluster: {cluster.value}"
         )
         for i in range(nodes_per_cluster):
-            node_name = f"aptos-node-{i}"
-            procs.append(
-                subprocess.Popen(
-                    f"yes | {cli_path}aptos genesis generate-keys --output-dir {GENESIS_DIRECTORY}/{cluster.value}-{node_name}",
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
+            node_username = f"{cluster.value}-aptos-node-{i}"
+            jobs.append(
+                Job(
+                    name=node_username,
+                    args=f"yes | {cli_path}aptos genesis generate-keys --output-dir {GENESIS_DIRECTORY}/{node_username}",
+                    log_file=f"{JOB_LOG_DIRECTORY}/generate-keys/{node_username}.log",
                     shell=True,
-                    text=True,
                 )
             )
 
-    for proc in procs:
-        proc.wait()
-        if proc.returncode != 0:
-            print(f"Failed to generate keys")
-            outs, errs = proc.communicate()
-            print(outs)
-            print(errs)
-            raise SystemExit(1)
+    results = run_jobs("generate-keys", jobs, concurrency, retries)
+    check_job_results("generate-keys", results)
 
     print("Successfully generated keys for genesis")
 
 
-def set_validator_configuration_for_genesis(cli_path: str = "") -> None:
-    procs: List[subprocess.Popen] = []
+def set_validator_configuration_for_genesis(
+    cli_path: str = "",
+    refresh: bool = False,
+    host_cache_ttl: int = HOST_CACHE_TTL_SECS,
+    concurrency: Optional[int] = None,
+    retries: int = 0,
+    previous_manifest: Optional[GenesisManifest] = None,
+) -> Dict[str, str]:
+    """
+    Set the validator configuration of every node whose inputs changed since the previous manifest.
+    Returns the input hash of every node
+    """
     # get the services for each cluster
+    try:
+        validator_fullnode_hosts = discover_validator_fullnode_hosts(
+            list(CLUSTERS), refresh=refresh, ttl_secs=host_cache_ttl
+        )
+    except MissingHostsError as e:
+        print(e)
+        print("Please check that the services have an EXTERNAL-IP address")
+        raise SystemExit(1)
+
+    node_hosts: Dict[str, Tuple[str, str]] = {}
+    node_stakes: Dict[str, int] = {}
+    node_hashes: Dict[str, str] = {}
     for cluster in CLUSTERS:
-        validator_fullnode_hosts_cluster_list = get_validator_fullnode_hosts(cluster)
-        for i, hosts in enumerate(validator_fullnode_hosts_cluster_list):
-            node_index = f"aptos-node-{i}"
-            node_username = f"{cluster.value}-{node_index}"
-            validator_host_with_port = f"{hosts.validator_host}:6180"
-            fullnode_host_with_port = f"{hosts.fullnode_host}:6182"
-            print(
-                f"Setting validator configuration for {node_username} via aptos CLI: validator host: {validator_host_with_port}, fullnode host: {fullnode_host_with_port}"
+        for i, hosts in enumerate(validator_fullnode_hosts[cluster]):
+            node_username = f"{cluster.value}-aptos-node-{i}"
+            node_hosts[node_username] = (
+                f"{hosts.validator_host}:6180",
+                f"{hosts.fullnode_host}:6182",
             )
-            procs.append(
-                subprocess.Popen(
-                    [
-                        f"{cli_path}aptos",
-                        "genesis",
-                        "set-validator-configuration",
-                        "--owner-public-identity-file",
-                        f"{GENESIS_DIRECTORY}/{node_username}/public-keys.yaml",
-                        "--local-repository-dir",
-                        GENESIS_DIRECTORY,
-                        "--username",
-                        node_username,
-                        "--validator-host",
-                        validator_host_with_port,
-                        "--full-node-host",
-                        fullnode_host_with_port,
-                        "--stake-amount",
-                        f"{10**8 * 10**6}",  # 1M APT in octas
-                    ],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                )
+            node_stakes[node_username] = CLUSTER_STAKE_AMOUNTS.get(
+                cluster, VALIDATOR_STAKE_AMOUNT
+            )
+            node_hashes[node_username] = hash_node_inputs(
+                node_username, *node_hosts[node_username], node_stakes[node_username]
             )
 
-    for proc in procs:
-        proc.wait()
-        if proc.returncode != 0:
-            print(f"Failed to set validator configuration")
-            print(proc.args)
-            outs, errs = proc.communicate()
-            print(outs)
-            print(errs)
-            raise SystemExit(1)
+    nodes_to_configure = changed_nodes(
+        previous_manifest or GenesisManifest(), GenesisManifest(nodes=node_hashes)
+    )
+    print(
+        f"Skipping {len(node_hashes) - len(nodes_to_configure)} nodes with unchanged keys, hosts and stake"
+    )
+
+    jobs: List[Job] = []
+    for node_username in nodes_to_configure:
+        validator_host_with_port, fullnode_host_with_port = node_hosts[node_username]
+        print(
+            f"Setting validator configuration for {node_username} via aptos CLI: validator host: {validator_host_with_port}, fullnode host: {fullnode_host_with_port}"
+        )
+        jobs.append(
+            Job(
+                name=node_username,
+                args=[
+                    f"{cli_path}aptos",
+                    "genesis",
+                    "set-validator-configuration",
+                    "--owner-public-identity-file",
+                    f"{GENESIS_DIRECTORY}/{node_username}/public-keys.yaml",
+                    "--local-repository-dir",
+                    GENESIS_DIRECTORY,
+                    "--username",
+                    node_username,
+                    "--validator-host",
+                    validator_host_with_port,
+                    "--full-node-host",
+                    fullnode_host_with_port,
+                    "--stake-amount",
+                    f"{node_stakes[node_username]}",
+                ],
+                log_file=f"{JOB_LOG_DIRECTORY}/set-validator-configuration/{node_username}.log",
+            )
+        )
+
+    results = run_jobs("set-validator-configuration", jobs, concurrency, retries)
+    check_job_results("set-validator-configuration", results)
+    return node_hashes
 
 
 @main.group()
@@ -249,242 +472,428 @@ def genesis() -> None:
     default=False,
     help="Create the genesis but do not upload to the relevant k8s clusters",
 )
+@click.option(
+    "--refresh",
+    is_flag=True,
+    default=False,
+    help="Ignore the host cache and query the LoadBalancer IPs from each cluster",
+)
+@click.option(
+    "--host-cache-ttl",
+    type=int,
+    default=HOST_CACHE_TTL_SECS,
+    show_default=True,
+    help="Maximum age in seconds of cached LoadBalancer IPs",
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum number of aptos CLI processes at a time. Defaults to the CPU count",
+)
+@click.option(
+    "--retries",
+    type=int,
+    default=2,
+    show_default=True,
+    help="Number of times to retry a failed aptos CLI process",
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help="Ignore the genesis manifest and reconfigure every node",
+)
+@click.option(
+    "--parallelism",
+    type=click.IntRange(min=1),
+    default=16,
+    show_default=True,
+    help="Maximum number of in-flight secret uploads per cluster",
+)
+@click.option(
+    "--cleanup-parallelism",
+    type=click.IntRange(min=1),
+    default=16,
+    show_default=True,
+    help="Maximum number of in-flight list and delete requests across all clusters when cleaning up previous eras",
+)
 def create_genesis(
     generate_keys: bool = False,
     cli_path: str = "",
     dry_run: bool = False,
+    refresh: bool = False,
+    host_cache_ttl: int = HOST_CACHE_TTL_SECS,
+    concurrency: Optional[int] = None,
+    retries: int = 2,
+    force: bool = False,
+    parallelism: int = 16,
+    cleanup_parallelism: int = 16,
 ) -> None:
     """
     Create genesis for the network and write it to the genesis directory
     """
+    previous_manifest = GenesisManifest() if force else load_genesis_manifest()
+    manifest = GenesisManifest(layout=hash_layout(settings.layout))
+
     # generate new keys for each node
     if generate_keys:
         print("Regenerating keys for genesis via aptos CLI")
-        generate_keys_for_genesis(cli_path)
+        generate_keys_for_genesis(cli_path, concurrency, retries)
 
     # set the validator configuration for each node
     # this will fetch the public keys from the keys directory
     # and the public IPs from the LoadBalancer services on each of the k8s clusters
     print("Setting validator configuration for genesis via aptos CLI")
-    set_validator_configuration_for_genesis(cli_path)
+    manifest.nodes = set_validator_configuration_for_genesis(
+        cli_path, refresh, host_cache_ttl, concurrency, retries, previous_manifest
+    )
 
     # create the layout file
     with open("genesis/layout.yaml", "w") as outfile:
-        yaml.dump(LAYOUT, outfile, default_flow_style=False)
-
-    # create genesis
-    subprocess.run(
-        [
-            f"yes | {cli_path}aptos genesis generate-genesis --local-repository-dir {GENESIS_DIRECTORY} --output-dir {GENESIS_DIRECTORY}",
-        ],
-        shell=True,
-    )
+        yaml.dump(settings.layout, outfile, default_flow_style=False)
 
-    # apply
-    dry_run_args = ["--dry-run=client", "--output=yaml"]
+    # create genesis, unless the layout and every node are unchanged since the last one
+    if genesis_up_to_date(previous_manifest, manifest):
+        print("Layout and validator configurations unchanged, reusing existing genesis")
+    else:
+        ret = subprocess.run(
+            [
+                f"yes | {cli_path}aptos genesis generate-genesis --local-repository-dir {GENESIS_DIRECTORY} --output-dir {GENESIS_DIRECTORY}",
+            ],
+            shell=True,
+        )
+        if ret.returncode != 0:
+            print("Failed to generate genesis")
+            raise SystemExit(1)
+        save_genesis_manifest(manifest)
 
     # current_era = get_current_era()
-    with open(APTOS_NODE_HELM_VALUES_FILE, "r") as genesis_file:
-        values = yaml.load(genesis_file, Loader=yaml.FullLoader)
-        current_era = values["chain"]["era"]
-        print(f"Current era: {current_era}")
+    current_era = settings.current_era
+    print(f"Current era: {current_era}")
 
-    # use kubectl to easily create secrets from files
-    procs: List[subprocess.Popen] = []
+    # build the secrets from the genesis files, and write the same YAML bundle kubectl would create
+    cluster_secrets: Dict[Cluster, List[dict]] = {}
     for available_cluster, nodes_per_cluster in CLUSTERS.items():
+        cluster_secrets[available_cluster] = build_genesis_secrets(
+            available_cluster, nodes_per_cluster, current_era
+        )
+        with open(f"{available_cluster.value}-genesis.yaml", "w") as f:
+            f.write(genesis_secrets_yaml(cluster_secrets[available_cluster]))
 
-        cluster_kube_config = KUBE_CONTEXTS[available_cluster]
-        cluster_genesis_fd = open(f"{available_cluster.value}-genesis.yaml", "w")
+    if dry_run:
+        for available_cluster in CLUSTERS:
+            print(
+                f"[DRY RUN {available_cluster.value}] To apply it: $ kubectl --context={settings.kube_contexts[available_cluster]} apply -f {available_cluster.value}-genesis.yaml"
+            )
+        return
 
-        # wipe the previous eras stuff too
-        clean_previous_era_secrets(available_cluster, current_era)
-        clean_previous_era_pvc(available_cluster, current_era)
-        clean_previous_era_stateful_set(available_cluster, current_era)
+    # wipe the previous eras stuff too
+    if not print_era_cleanup_results(
+        clean_previous_eras(list(CLUSTERS), current_era, cleanup_parallelism)
+    ):
+        raise SystemExit(1)
 
-        for i in range(nodes_per_cluster):
-            node_name = f"aptos-node-{i}"
-            node_username = f"{available_cluster.value}-{node_name}"
-
-            # delete if fnot in dry-run mode
-            if not dry_run:
-                subprocess.run(
-                    [
-                        "kubectl",
-                        "--context",
-                        cluster_kube_config,
-                        "delete",
-                        "secret",
-                        f"{node_username}-genesis-e{current_era}",
-                        "--ignore-not-found",
-                    ],
-                    stdout=cluster_genesis_fd,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                )
+    # server-side apply the secrets to each cluster concurrently
+    results = run_on_clusters(
+        lambda available_cluster: apply_genesis_secrets(
+            available_cluster, cluster_secrets[available_cluster], parallelism
+        ),
+        list(CLUSTERS),
+    )
 
-                procs.append(
-                    subprocess.Popen(
-                        [
-                            "kubectl",
-                            "--context",
-                            cluster_kube_config,
-                            "create",
-                            "secret",
-                            "generic",
-                            f"{node_username}-genesis-e{current_era}",
-                            f"--from-file=genesis.blob={GENESIS_DIRECTORY}/genesis.blob",
-                            f"--from-file=waypoint.txt={GENESIS_DIRECTORY}/waypoint.txt",
-                            f"--from-file=validator-identity.yaml={GENESIS_DIRECTORY}/{node_username}/validator-identity.yaml",
-                            f"--from-file=validator-full-node-identity.yaml={GENESIS_DIRECTORY}/{node_username}/validator-full-node-identity.yaml",
-                        ]
-                        + (dry_run_args if dry_run else []),
-                        stdout=cluster_genesis_fd,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                    )
-                )
-                cluster_genesis_fd.flush()
-                cluster_genesis_fd.write(f"---\n")
-                cluster_genesis_fd.flush()
+    err = False
+    for cluster_result in results.values():
+        if not cluster_result.ok:
+            print(
+                f"[{cluster_result.cluster.value}] Error uploading genesis secrets: {cluster_result.error}"
+            )
+            err = True
+            continue
+        result = cluster_result.value
+        print(
+            f"[{result.cluster.value}] applied {len(result.applied)} genesis secrets, "
+            f"{len(result.unchanged)} unchanged, {len(result.failed)} failed ({result.duration_secs:.2f}s)"
+        )
+        for name, error in result.failed:
+            print(f"[{result.cluster.value}] Error uploading genesis secret {name}: {error}")
+            err = True
 
-    # wait for everything
-    for proc in procs:
-        proc.wait()
-        if proc.returncode != 0:
-            print(f"Error uploading genesis secrets to nodes")
-            outs, errs = proc.communicate()
-            print(outs)
-            print(errs)
-            raise SystemExit(1)
+    if err:
+        raise SystemExit(1)
 
     print("Genesis secrets uploaded to nodes")
     print("Enjoy your multi-cluster testnet!")
 
 
+def run_passthrough(
+    command: List[str], args: List[str], cluster: Cluster, parallel: bool
+) -> None:
+    """
+    Run the command against each selected cluster. The kube context is passed after the command.
+    In parallel mode all clusters run at once, with each output line prefixed by the cluster name
+    """
+    clusters = select_clusters(cluster)
+    if not parallel:
+        for available_cluster in clusters:
+            print(f"=== {available_cluster.value} ===")
+            subprocess.run([*command, settings.kube_contexts[available_cluster], *args])
+            print()
+        return
+
+    results = run_on_clusters(
+        lambda available_cluster: run_prefixed(
+            available_cluster, [*command, settings.kube_contexts[available_cluster], *args]
+        ),
+        clusters,
+    )
+    err = False
+    for result in results.values():
+        if not result.ok or result.value != 0:
+            print(
+                f"[{result.cluster.value}] failed: {result.error or f'exit {result.value}'}"
+            )
+            err = True
+    if err:
+        raise SystemExit(1)
+
+
 @main.command("kube")
 @click.argument("args", nargs=-1)
 @click.option(
     "--cluster",
-    type=click.Choice([c.value for c in Cluster]),
-    default=Cluster.ALL.value,
+    type=click.Choice(CLUSTER_CHOICES),
+    default=ALL_CLUSTERS.value,
     help="Cluster to run the command on",
 )
+@click.option(
+    "--parallel",
+    is_flag=True,
+    default=False,
+    help="Run on all clusters at once, prefixing each output line with the cluster name",
+)
 def kube_commands(
     args: Tuple[str, ...],
     cluster: str,
+    parallel: bool,
 ) -> None:
     """Run kubectl commands on the selected cluster(s)"""
-    cluster = Cluster(cluster)
+    cluster = cluster_by_name(cluster)
     args = " ".join(args).split()
     print(args)
-    for available_cluster in CLUSTERS:
-        if cluster != available_cluster and cluster != Cluster.ALL:
-            continue
-        cluster_kube_config = KUBE_CONTEXTS[available_cluster]
-        print(f"=== {available_cluster.value} ===")
-        subprocess.run(
-            [
-                "kubectl",
-                "--context",
-                cluster_kube_config,
-                *args,
-            ]
-        )
-        print()
+    run_passthrough(["kubectl", "--context"], args, cluster, parallel)
 
 
 @main.command("helm")
 @click.argument("args", nargs=-1)
 @click.option(
     "--cluster",
-    type=click.Choice([c.value for c in Cluster]),
-    default=Cluster.ALL.value,
+    type=click.Choice(CLUSTER_CHOICES),
+    default=ALL_CLUSTERS.value,
     help="Cluster to run the command on",
 )
+@click.option(
+    "--parallel",
+    is_flag=True,
+    default=False,
+    help="Run on all clusters at once, prefixing each output line with the cluster name",
+)
 def helm_commands(
     args: Tuple[str, ...],
     cluster: str,
+    parallel: bool,
 ) -> None:
     """Run helm commands on the selected cluster(s)"""
-    cluster = Cluster(cluster)
+    cluster = cluster_by_name(cluster)
     args = " ".join(args).split()
     print(args)
-    for available_cluster in CLUSTERS:
-        if cluster != available_cluster and cluster != Cluster.ALL:
+    run_passthrough(["helm", "--kube-context"], args, cluster, parallel)
+
+
+# aptos-node workloads are named {release}-aptos-node-{index}-{role}, where the helm release is the cluster name
+NODE_WORKLOAD_NAME_PATTERN = re.compile(
+    r"^(?P<release>.+)-aptos-node-(?P<index>\d+)-(?P<role>validator|fullnode-e\d+|haproxy)$"
+)
+
+
+def index_node_workloads(
+    cluster: Cluster, names: List[str]
+) -> Dict[int, Dict[str, List[str]]]:
+    """
+    Index the given workload names by node index and role (validator, fullnode or haproxy)
+    """
+    index: Dict[int, Dict[str, List[str]]] = {}
+    for name in names:
+        match = NODE_WORKLOAD_NAME_PATTERN.match(name)
+        if not match or match.group("release") != cluster.value:
             continue
-        cluster_kube_config = KUBE_CONTEXTS[available_cluster]
-        print(f"=== {available_cluster.value} ===")
-        subprocess.run(
+        role = match.group("role")
+        if role.startswith("fullnode"):
+            role = "fullnode"
+        index.setdefault(int(match.group("index")), {}).setdefault(role, []).append(
+            name
+        )
+    return index
+
+
+@dataclass
+class ScaleResult:
+    cluster: Cluster
+    patched: List[str]
+    failed: List[Tuple[str, str]]
+    duration_secs: float
+
+
+def scale_cluster_nodes(
+    cluster: Cluster,
+    replicas: int,
+    vfn_enabled: bool,
+    haproxy_enabled: bool,
+    executor: ThreadPoolExecutor,
+) -> ScaleResult:
+    """
+    Patch the scale of every node in the given cluster. StatefulSets and Deployments are listed once,
+    and the patches are submitted to the shared executor
+    """
+    start_time = time.time()
+    apps_client = apps_v1_api(cluster)
+    body = [{"op": "replace", "path": "/spec/replicas", "value": replicas}]
+
+    try:
+        stateful_sets = index_node_workloads(
+            cluster,
             [
-                "helm",
-                "--kube-context",
-                cluster_kube_config,
-                *args,
+                stateful_set.metadata.name
+                for stateful_set in apps_client.list_namespaced_stateful_set(
+                    NAMESPACE
+                ).items
             ],
         )
-        print()
+        deployments: Dict[int, Dict[str, List[str]]] = {}
+        if haproxy_enabled:
+            deployments = index_node_workloads(
+                cluster,
+                [
+                    deployment.metadata.name
+                    for deployment in apps_client.list_namespaced_deployment(
+                        NAMESPACE
+                    ).items
+                ],
+            )
+    except Exception as e:
+        return ScaleResult(
+            cluster=cluster,
+            patched=[],
+            failed=[("list workloads", str(e))],
+            duration_secs=time.time() - start_time,
+        )
+
+    futures = {}
+    for i in range(CLUSTERS[cluster]):
+        names = stateful_sets.get(i, {})
+        for name in names.get("validator", []) + (
+            names.get("fullnode", []) if vfn_enabled else []
+        ):
+            future = executor.submit(
+                apps_client.patch_namespaced_stateful_set_scale, name, NAMESPACE, body
+            )
+            futures[future] = name
+        for name in deployments.get(i, {}).get("haproxy", []):
+            future = executor.submit(
+                apps_client.patch_namespaced_deployment_scale, name, NAMESPACE, body
+            )
+            futures[future] = name
+
+    patched = []
+    failed = []
+    for future in as_completed(futures):
+        name = futures[future]
+        try:
+            future.result()
+            patched.append(name)
+        except Exception as e:
+            failed.append((name, str(e)))
+
+    return ScaleResult(
+        cluster=cluster,
+        patched=sorted(patched),
+        failed=sorted(failed),
+        duration_secs=time.time() - start_time,
+    )
 
 
-def patch_node_scale(
+def scale_nodes(
     cluster: Cluster,
-    node_name: str,
     replicas: int,
     vfn_enabled: bool,
-    haproxy_enabled: bool = False,
+    parallelism: int,
+    haproxy_enabled: Optional[bool] = None,
 ) -> None:
     """
-    Patch the node count for the given node
+    Patch the scale of every node in the selected cluster(s) concurrently, with at most
+    `parallelism` patch requests in flight across all clusters. haproxy_enabled defaults to the helm values
     """
-    apps_client = client.AppsV1Api(kube_clients()[cluster])
-    long_node_name = f"{cluster.value}-{node_name}"
-    validator_sts_prefix = f"{long_node_name}-validator"
-    fullnode_sts_prefix = f"{long_node_name}-fullnode-e"
-    stateful_sets = apps_client.list_namespaced_stateful_set(NAMESPACE)
-    for stateful_set in stateful_sets.items:
-        if (
-            validator_sts_prefix in stateful_set.metadata.name
-            or (vfn_enabled and fullnode_sts_prefix in stateful_set.metadata.name)
-        ):
-            apps_client.patch_namespaced_stateful_set_scale(
-                stateful_set.metadata.name,
-                NAMESPACE,
-                [{"op": "replace", "path": "/spec/replicas", "value": replicas}],
-            )
-    if haproxy_enabled:
-        apps_client.patch_namespaced_deployment_scale(
-            f"{long_node_name}-haproxy",
-            NAMESPACE,
-            [{"op": "replace", "path": "/spec/replicas", "value": replicas}],
+    if haproxy_enabled is None:
+        haproxy_enabled = settings.haproxy_enabled
+    with ThreadPoolExecutor(max_workers=parallelism) as patch_executor:
+        results = run_on_clusters(
+            lambda available_cluster: scale_cluster_nodes(
+                available_cluster,
+                replicas,
+                vfn_enabled,
+                haproxy_enabled,
+                patch_executor,
+            ),
+            select_clusters(cluster),
+        )
+
+    err = False
+    for cluster_result in results.values():
+        if not cluster_result.ok:
+            print(f"[{cluster_result.cluster.value}] Failed to scale: {cluster_result.error}")
+            err = True
+            continue
+        result = cluster_result.value
+        print(
+            f"[{result.cluster.value}] patched {len(result.patched)} workloads to {replicas} replicas, "
+            f"{len(result.failed)} failed ({result.duration_secs:.2f}s)"
         )
+        for name, error in result.failed:
+            print(f"[{result.cluster.value}] Failed to patch {name}: {error}")
+            err = True
 
-    print(f"Patched {long_node_name} scale to {replicas}")
+    if err:
+        raise SystemExit(1)
 
 
 @main.command("stop")
 @click.option(
     "--cluster",
-    type=click.Choice([c.value for c in Cluster]),
-    default=Cluster.ALL.value,
+    type=click.Choice(CLUSTER_CHOICES),
+    default=ALL_CLUSTERS.value,
     help="Cluster to run the command on",
 )
+@click.option(
+    "--parallelism",
+    type=click.IntRange(min=1),
+    default=16,
+    show_default=True,
+    help="Maximum number of in-flight scale patch requests across all clusters",
+)
 def kube_stop(
     cluster: str,
+    parallelism: int,
 ) -> None:
     """Stop all compute on the cluster"""
-    cluster = Cluster(cluster)
-    for available_cluster in CLUSTERS:
-        if cluster != available_cluster and cluster != Cluster.ALL:
-            continue
-        for i in range(CLUSTERS[available_cluster]):
-            node_name = f"aptos-node-{i}"
-            patch_node_scale(available_cluster, node_name, 0, vfn_enabled=True)
+    cluster = cluster_by_name(cluster)
+    scale_nodes(cluster, 0, vfn_enabled=True, parallelism=parallelism)
 
 
 @main.command("start")
 @click.option(
     "--cluster",
-    type=click.Choice([c.value for c in Cluster]),
-    default=Cluster.ALL.value,
+    type=click.Choice(CLUSTER_CHOICES),
+    default=ALL_CLUSTERS.value,
     help="Cluster to run the command on",
 )
 @click.option(
@@ -493,25 +902,28 @@ def kube_stop(
     default=False,
     help="",
 )
+@click.option(
+    "--parallelism",
+    type=click.IntRange(min=1),
+    default=16,
+    show_default=True,
+    help="Maximum number of in-flight scale patch requests across all clusters",
+)
 def kube_start(
     cluster: str,
     vfn_enabled: bool,
+    parallelism: int,
 ) -> None:
     """Start all compute on the cluster"""
-    cluster = Cluster(cluster)
-    for available_cluster in CLUSTERS:
-        if cluster != available_cluster and cluster != Cluster.ALL:
-            continue
-        for i in range(CLUSTERS[available_cluster]):
-            node_name = f"aptos-node-{i}"
-            patch_node_scale(available_cluster, node_name, 1, vfn_enabled)
+    cluster = cluster_by_name(cluster)
+    scale_nodes(cluster, 1, vfn_enabled, parallelism=parallelism)
 
 
 @main.command("delete")
 @click.option(
     "--cluster",
-    type=click.Choice([c.value for c in Cluster]),
-    default=Cluster.ALL.value,
+    type=click.Choice(CLUSTER_CHOICES),
+    default=ALL_CLUSTERS.value,
     help="Cluster to run the command on",
 )
 def helm_delete(
@@ -521,7 +933,7 @@ def helm_delete(
     Delete all Aptos-created kubernetes resources on the cluster.
     Useful for a hard reset of the network, in case of a bad deploy, such as when helm is stuck in a bad state
     """
-    cluster = Cluster(cluster)
+    cluster = cluster_by_name(cluster)
     user_input = input("Delete all existing cluster resources (y/n)? ")
     if user_input.lower() != "y":
         print("Aborting delete operation")
@@ -535,11 +947,14 @@ def delete_cluster(
     """
     Delete the cluster from the GCP project
     """
+    # uninstalling de-provisions the LoadBalancers, so the next genesis (e.g. after upgrade --new) must
+    # discover the hosts again rather than reuse the dead IPs
+    forget_cached_hosts(select_clusters(cluster))
     procs = []
     for available_cluster in CLUSTERS:
-        if cluster != available_cluster and cluster != Cluster.ALL:
+        if cluster != available_cluster and cluster != ALL_CLUSTERS:
             continue
-        cluster_kube_config = KUBE_CONTEXTS[available_cluster]
+        cluster_kube_config = settings.kube_contexts[available_cluster]
         procs.append(
             subprocess.Popen(
                 [
@@ -565,49 +980,63 @@ def delete_cluster(
             raise SystemExit(1)
 
 
+def get_cluster_era(cluster: Cluster) -> str:
+    """
+    Infer the era of the cluster from its helm values
+    """
+    ret = subprocess.run(
+        [
+            "helm",
+            "--kube-context",
+            settings.kube_contexts[cluster],
+            "get",
+            "values",
+            cluster.value,  # the helm_release is named after the cluster it is in
+            "-o",
+            "json",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    try:
+        values = json.loads(ret.stdout)
+        return values["chain"]["era"]
+    except Exception as e:
+        print(f"Error fetching helm values for cluster {cluster.value}")
+        print(e)
+        print(ret.stdout)
+        raise
+
+
 def get_current_era() -> str:
     """
-    Get the current era from each of the clusters. They should be matching
+    Get the current era from each of the clusters, concurrently. They should be matching
     """
-    eras = set()
-    # for each cluster, infer the era from the helm values
-    for cluster in CLUSTERS:
-        cluster_kube_config = KUBE_CONTEXTS[cluster]
-        ret = subprocess.run(
-            [
-                "helm",
-                "--kube-context",
-                cluster_kube_config,
-                "get",
-                "values",
-                cluster.value,  # the helm_release is named after the cluster it is in
-                "-o",
-                "json",
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True,
-        )
-        try:
-            values = json.loads(ret.stdout)
-            e = values["chain"]["era"]
-        except Exception as e:
-            print(f"Error fetching helm values for cluster {cluster.value}")
-            print(e)
-            print(ret.stdout)
-            raise
-        eras.add(e)
+    results = run_on_clusters(get_cluster_era, list(CLUSTERS))
+    for result in results.values():
+        if not result.ok:
+            raise result.error
 
+    eras = {result.value for result in results.values()}
     assert len(eras) == 1, "Eras are not matching across clusters"
     cluster_era = eras.pop()
     print(f"Current testnet era across all clusters: {cluster_era}")
     return cluster_era
 
 
-def aptos_node_helm_template(
-    cluster: Cluster, helm_chart_directory: str, values_file: str, vfn_enabled: bool, dry_run: bool = False
-) -> Tuple[Cluster, int]:
+def render_cluster_diff(
+    cluster: Cluster,
+    helm_chart_directory: str,
+    values_file: str,
+    vfn_enabled: bool,
+    full_apply: bool = False,
+) -> ManifestDiff:
+    """
+    Render the cluster's helm template, or reuse the cached render if its inputs are unchanged, and diff it
+    with the last applied render
+    """
     num_nodes = CLUSTERS[cluster]
     helm_upgrade_override_values = [
         "--set",
@@ -618,36 +1047,225 @@ def aptos_node_helm_template(
             "--set",
             f"numFullnodeGroups={num_nodes}",
         ]
+    manifest, cached = render_manifest(
+        cluster, helm_chart_directory, values_file, helm_upgrade_override_values
+    )
+    # the full render, to apply by hand
+    with open(f"helm-template-{cluster.value}.yaml", "w") as f:
+        f.write(manifest)
+
+    diff = diff_manifest(
+        parse_manifest(manifest), None if full_apply else load_applied_state(cluster)
+    )
+    print_prefixed(
+        cluster,
+        f"{'Reused cached' if cached else 'Rendered'} helm template, "
+        f"{len(diff.changed)} of {len(diff.objects)} objects changed since the last applied render",
+    )
+    if diff.removed:
+        print_prefixed(
+            cluster,
+            f"Not deleting {len(diff.removed)} objects that are no longer rendered: "
+            f"{', '.join(diff.removed)}",
+        )
+    return diff
+
+
+def apply_manifest_objects(cluster: Cluster, diff: ManifestDiff, keys: List[str]) -> int:
+    """
+    kubectl apply the given objects of the render, and record them as applied if it succeeds
+    """
+    if not keys:
+        return 0
     proc = subprocess.Popen(
-        f"helm --kube-context={KUBE_CONTEXTS[cluster]} template {cluster.value} {helm_chart_directory} -f={values_file} {' '.join(helm_upgrade_override_values)} > helm-template-{cluster.value}.yaml;"
-        + f"kubectl --context={KUBE_CONTEXTS[cluster]} apply -f helm-template-{cluster.value}.yaml"
-        if not dry_run
-        else "",
-        shell=True,
+        ["kubectl", f"--context={settings.kube_contexts[cluster]}", "apply", "-f", "-"],
+        stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
     )
+    output, _ = proc.communicate(manifest_objects(diff, keys))
+    for line in output.splitlines():
+        if "unchanged" in line:
+            continue
+        print_prefixed(cluster, line.strip())
+
+    if proc.returncode == 0:
+        record_applied_objects(cluster, diff, keys)
+    return proc.returncode
+
+
+def aptos_node_helm_template(
+    cluster: Cluster,
+    helm_chart_directory: str,
+    values_file: str,
+    vfn_enabled: bool,
+    dry_run: bool = False,
+    full_apply: bool = False,
+) -> Tuple[Cluster, int]:
+    """
+    Apply the objects of the cluster's helm template that changed since the last applied render
+    """
+    try:
+        diff = render_cluster_diff(
+            cluster, helm_chart_directory, values_file, vfn_enabled, full_apply
+        )
+    except Exception as e:
+        print(f"[{cluster.value}] {e}", flush=True)
+        return (cluster, 1)
 
     if dry_run:
         print(
-            f"[DRY RUN {cluster.value}] To apply it: $ kubectl --context={KUBE_CONTEXTS[cluster]} apply -f helm-template-{cluster.value}.yaml"
+            f"[DRY RUN {cluster.value}] To apply it: $ kubectl --context={settings.kube_contexts[cluster]} apply -f helm-template-{cluster.value}.yaml"
         )
+        return (cluster, 0)
 
-    for line in iter(proc.stdout.readline, b""):
-        line = line.decode("utf-8").strip()
-        if "unchanged" in line:
-            continue
-        print(f"[{cluster.value}] {line}", flush=True)
+    return_code = apply_manifest_objects(cluster, diff, diff.changed)
+    if return_code == 0:
+        # forget the objects that are no longer rendered
+        save_applied_state(cluster, diff.state)
+    return (cluster, return_code)
+
+
+def rolling_helm_upgrade(
+    clusters: List[Cluster],
+    helm_chart_directory: str,
+    values_file: str,
+    vfn_enabled: bool,
+    dry_run: bool,
+    full_apply: bool,
+    batch_size: int,
+    timeout_secs: int,
+    max_ledger_lag: int,
+) -> None:
+    """
+    Apply everything but the validators at once, then upgrade the changed validators in batches that never
+    take more than f validators of the network down
+    """
+    results = run_on_clusters(
+        lambda available_cluster: render_cluster_diff(
+            available_cluster, helm_chart_directory, values_file, vfn_enabled, full_apply
+        ),
+        clusters,
+    )
+    for result in results.values():
+        if not result.ok:
+            print(f"[{result.cluster.value}] {result.error}")
+            raise SystemExit(1)
+    diffs = {available_cluster: result.value for available_cluster, result in results.items()}
+    validators = {
+        available_cluster: validator_objects(
+            available_cluster, diff.objects, diff.changed
+        )
+        for available_cluster, diff in diffs.items()
+    }
+
+    # f is a share of the voting power, not of the validators, as genesis stakes each cluster's validators
+    # with their cluster's stake
+    total_power = total_voting_power()
+    max_power = max_faulty_voting_power(total_power)
+    batches = plan_batches(
+        {
+            available_cluster: list(cluster_validators.values())
+            for available_cluster, cluster_validators in validators.items()
+        },
+        batch_size,
+        max_power,
+    )
+    print(
+        f"Rolling upgrade of {sum(len(batch) for batch in batches)} validators in {len(batches)} batches, "
+        f"with at most {max_power / total_power:.1%} of the voting power down at a time"
+    )
+    if dry_run:
+        for i, batch in enumerate(batches):
+            print(
+                f"[DRY RUN] Batch {i + 1} ({voting_power(batch) / total_power:.1%} of the voting power): "
+                f"{', '.join(node.statefulset for node in batch)}"
+            )
+    too_heavy = [node for batch in batches for node in batch if node.stake > max_power]
+    if too_heavy:
+        print(
+            f"Taking down any of {', '.join(node.statefulset for node in too_heavy)} would leave less than "
+            f"a quorum of the voting power, upgrade it without --rolling"
+        )
+        raise SystemExit(1)
+    if dry_run:
+        return
+    # the batches are health checked through the validators' REST API
+    if not probe_available():
+        print(PROBE_DEPENDENCY_ERROR)
+        raise SystemExit(1)
 
-    proc.communicate()
+    results = run_on_clusters(
+        lambda available_cluster: apply_manifest_objects(
+            available_cluster,
+            diffs[available_cluster],
+            [key for key in diffs[available_cluster].changed if key not in validators[available_cluster]],
+        ),
+        clusters,
+    )
+    for result in results.values():
+        if not result.ok or result.value != 0:
+            print(
+                f"[{result.cluster.value}] Failed to apply: {result.error or f'exit {result.value}'}"
+            )
+            raise SystemExit(1)
+
+    hosts = discover_validator_fullnode_hosts(list(CLUSTERS))
+    targets = {
+        ValidatorNode(available_cluster, i): f"http://{host.validator_host}:{REST_API_PORT}"
+        for available_cluster, cluster_hosts in hosts.items()
+        for i, host in enumerate(cluster_hosts)
+    }
+
+    def apply_batch(batch: List[ValidatorNode]) -> None:
+        keys = {
+            available_cluster: [
+                key for key, node in validators[available_cluster].items() if node in batch
+            ]
+            for available_cluster in {node.cluster for node in batch}
+        }
+        results = run_on_clusters(
+            lambda available_cluster: apply_manifest_objects(
+                available_cluster, diffs[available_cluster], keys[available_cluster]
+            ),
+            list(keys),
+        )
+        for result in results.values():
+            if not result.ok or result.value != 0:
+                raise Exception(
+                    f"Failed to apply to {result.cluster.value}: {result.error or f'exit {result.value}'}"
+                )
+
+    def print_batch(i: int, timing: BatchTiming) -> None:
+        print(
+            f"Batch {i + 1}/{len(batches)} ({', '.join(node.statefulset for node in timing.nodes)}) "
+            f"upgraded in {timing.total_secs:.0f}s: waited {timing.headroom_secs:.0f}s for other validators, "
+            f"applied in {timing.apply_secs:.0f}s, ready after {timing.ready_secs:.0f}s, "
+            f"caught up after {timing.catch_up_secs:.0f}s",
+            flush=True,
+        )
 
-    return (cluster, proc.returncode)
+    try:
+        timings = rolling_upgrade(
+            batches, apply_batch, targets, max_power, timeout_secs, max_ledger_lag, print_batch
+        )
+    except Exception as e:
+        print(f"Stopping the rolling upgrade: {e}")
+        raise SystemExit(1)
+    for available_cluster, diff in diffs.items():
+        save_applied_state(available_cluster, diff.state)
+    print(
+        f"Upgraded {sum(len(timing.nodes) for timing in timings)} validators in "
+        f"{sum(timing.total_secs for timing in timings):.0f}s"
+    )
 
 
 @main.command("upgrade")
 @click.option(
     "--cluster",
-    type=click.Choice([c.value for c in Cluster]),
-    default=Cluster.ALL.value,
+    type=click.Choice(CLUSTER_CHOICES),
+    default=ALL_CLUSTERS.value,
     help="Cluster to run the command on",
 )
 @click.option(
@@ -683,6 +1301,39 @@ def aptos_node_helm_template(
     default=False,
     help="Create the genesis but do not upload to the relevant k8s clusters",
 )
+@click.option(
+    "--full-apply",
+    is_flag=True,
+    default=False,
+    help="Apply every rendered object, not only those changed since the last applied render",
+)
+@click.option(
+    "--rolling",
+    is_flag=True,
+    default=False,
+    help="Upgrade the validators in batches across regions, waiting for each batch to be healthy",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=5,
+    show_default=True,
+    help="Most validators upgraded at a time with --rolling, within the f of the voting power that can be down",
+)
+@click.option(
+    "--batch-timeout",
+    type=int,
+    default=900,
+    show_default=True,
+    help="Seconds to wait for each step of a --rolling batch",
+)
+@click.option(
+    "--max-ledger-lag",
+    type=int,
+    default=1000,
+    show_default=True,
+    help="Most versions an upgraded validator may be behind the network before the next --rolling batch",
+)
 def upgrade(
     cluster: str,
     values_file: str,
@@ -690,10 +1341,30 @@ def upgrade(
     new: bool,
     vfn_enabled: bool,
     dry_run: bool,
+    full_apply: bool,
+    rolling: bool,
+    batch_size: int,
+    batch_timeout: int,
+    max_ledger_lag: int,
 ) -> None:
     """Wipes the cluster and redeploys via helm chart"""
-    cluster = Cluster(cluster)
-    procs: List[Tuple[Cluster, subprocess.Popen]] = []
+    cluster = cluster_by_name(cluster)
+    if rolling:
+        if new:
+            print("--rolling upgrades a running network, it can't be combined with --new")
+            raise SystemExit(1)
+        rolling_helm_upgrade(
+            select_clusters(cluster),
+            helm_chart_directory,
+            values_file,
+            vfn_enabled,
+            dry_run,
+            full_apply,
+            batch_size,
+            batch_timeout,
+            max_ledger_lag,
+        )
+        return
     # delete the cluster if it exists
     if new:
         print()
@@ -705,15 +1376,18 @@ def upgrade(
             return
         try:
             delete_cluster(cluster)
-        except SystemExit as e:
+        except SystemExit:
             print("The helm release in this cluster may not exist")
             print("Continuing with upgrade...")
+        # the deleted objects must all be applied again
+        for deleted_cluster in select_clusters(cluster):
+            forget_applied_state(deleted_cluster)
 
     else:
         print(
             "Skipping cluster deletion, and reusing cluster state. (Use --new to delete clusters before upgrading)"
         )
-    num_clusters = len(CLUSTERS) if cluster == Cluster.ALL else 1
+    num_clusters = len(CLUSTERS) if cluster == ALL_CLUSTERS else 1
     with Pool(num_clusters) as p:
         all_upgrades = p.starmap(
             aptos_node_helm_template,
@@ -724,9 +1398,10 @@ def upgrade(
                     values_file,
                     vfn_enabled,
                     dry_run,
+                    full_apply,
                 )
                 for available_cluster in CLUSTERS
-                if cluster == available_cluster or cluster == Cluster.ALL
+                if cluster == available_cluster or cluster == ALL_CLUSTERS
             ],
         )
 
@@ -741,102 +1416,47 @@ def upgrade(
         raise SystemExit(1)
 
     print("======== SUCCESS ========")
-    print(f"To view the cluster, run: ./bin/cluster.py kube get pods")
-
-
-def clean_previous_era_secrets(cluster: Cluster, era: str) -> None:
-    """
-    Clean up previous era secrets from the given cluster
-    """
-    genesis_secret_era_substring = "genesis-e"
-    for available_cluster in CLUSTERS:
-        if cluster != available_cluster and cluster != Cluster.ALL:
-            continue
-        core_client = client.CoreV1Api(kube_clients()[available_cluster])
-        secrets = core_client.list_namespaced_secret(NAMESPACE)
-        for secret in secrets.items:
-            # if the secret has an era in the name and is not the current era, delete it
-            if (
-                genesis_secret_era_substring in secret.metadata.name
-                and f"{genesis_secret_era_substring}{era}" not in secret.metadata.name
-            ):
-                print(f"Deleting old secret {secret.metadata.name}")
-                core_client.delete_namespaced_secret(
-                    secret.metadata.name, secret.metadata.namespace
-                )
-
-
-def clean_previous_era_pvc(cluster: Cluster, era: str) -> None:
-    """
-    Clean up previous era PVCs from the given cluster
-    """
-    fullnode_pvc_era_substring = "fullnode-e"
-    validator_pvc_era_substring = "validator-e"
-    for available_cluster in CLUSTERS:
-        if cluster != available_cluster and cluster != Cluster.ALL:
-            continue
-        for pvc_substring in [fullnode_pvc_era_substring, validator_pvc_era_substring]:
-            core_client = client.CoreV1Api(kube_clients()[available_cluster])
-            pvcs = core_client.list_namespaced_persistent_volume_claim(NAMESPACE)
-            for pvc in pvcs.items:
-                # if the PVC has an era in the name and is not the current era, delete it
-                if (
-                    pvc_substring in pvc.metadata.name
-                    and f"{pvc_substring}{era}" not in pvc.metadata.name
-                ):
-                    print(f"Deleting old PVC {pvc.metadata.name}")
-                    core_client.delete_namespaced_persistent_volume_claim(
-                        pvc.metadata.name, pvc.metadata.namespace
-                    )
-
-
-def clean_previous_era_stateful_set(cluster: Cluster, era: str) -> None:
-    """
-    Clean up previous era stateful sets from the given cluster
-    """
-    fullnode_stateful_set_era_substring = "fullnode-e"
-    for available_cluster in CLUSTERS:
-        if cluster != available_cluster and cluster != Cluster.ALL:
-            continue
-        apps_client = client.AppsV1Api(kube_clients()[available_cluster])
-        stateful_sets = apps_client.list_namespaced_stateful_set(NAMESPACE)
-        for stateful_set in stateful_sets.items:
-            # if the stateful_set has an era in the name and is not the current era, delete it
-            if (
-                fullnode_stateful_set_era_substring in stateful_set.metadata.name
-                and f"{fullnode_stateful_set_era_substring}{era}"
-                not in stateful_set.metadata.name
-            ):
-                print(f"Deleting old stateful_set {stateful_set.metadata.name}")
-                apps_client.delete_namespaced_stateful_set(
-                    stateful_set.metadata.name, stateful_set.metadata.namespace
-                )
+    print("To view the cluster, run: ./bin/cluster.py kube get pods")
 
 
 @main.command("era-clean")
 @click.option(
     "--cluster",
-    type=click.Choice([c.value for c in Cluster]),
-    default=Cluster.ALL.value,
+    type=click.Choice(CLUSTER_CHOICES),
+    default=ALL_CLUSTERS.value,
     help="Cluster to run the command on",
 )
-def clean_previous_era_resources(cluster: str) -> None:
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="Print the resources that would be deleted without deleting them",
+)
+@click.option(
+    "--parallelism",
+    type=click.IntRange(min=1),
+    default=16,
+    show_default=True,
+    help="Maximum number of in-flight list and delete requests across all clusters",
+)
+def clean_previous_era_resources(cluster: str, dry_run: bool, parallelism: int) -> None:
     """
     Clean up previous era resources from the given cluster
     """
     # delete the previous era's resources
-
-    cluster = Cluster(cluster)
-    clean_previous_era_secrets(cluster, CURRENT_ERA)
-    clean_previous_era_pvc(cluster, CURRENT_ERA)
-    clean_previous_era_stateful_set(cluster, CURRENT_ERA)
+    cluster = cluster_by_name(cluster)
+    results = clean_previous_eras(
+        select_clusters(cluster), settings.current_era, parallelism, dry_run
+    )
+    if not print_era_cleanup_results(results, dry_run):
+        raise SystemExit(1)
 
 
 @main.command("show-max-resources")
 @click.option(
     "--cluster",
-    type=click.Choice([c.value for c in Cluster]),
-    default=Cluster.ALL.value,
+    type=click.Choice(CLUSTER_CHOICES),
+    default=ALL_CLUSTERS.value,
     help="Cluster to run the command on",
 )
 def show_max_resources(cluster: str) -> None:
@@ -844,11 +1464,10 @@ def show_max_resources(cluster: str) -> None:
     Show the maximum resources that can be used for a node. This assumes that most of your compute resources are used for nodes on each k8s worker, and that the rest of the compute
     is either on other machines, or is resrved for daemonsets.
     """
-    cluster = Cluster(cluster)
-    for available_cluster in CLUSTERS:
-        if cluster != available_cluster and cluster != Cluster.ALL:
-            continue
-        apps_client = client.AppsV1Api(kube_clients()[available_cluster])
+    cluster = cluster_by_name(cluster)
+
+    def print_max_resources(available_cluster: Cluster) -> None:
+        apps_client = apps_v1_api(available_cluster)
         daemonsets = apps_client.list_daemon_set_for_all_namespaces()
         sum_all_memory_requests = 0
         sum_all_memory_limits = 0
@@ -877,14 +1496,26 @@ def show_max_resources(cluster: str) -> None:
                     .replace("m", "")
                 )
             except (KeyError, TypeError):
-                print("No resource info for daemonset")
-        print(
-            f"Total memory requests: {sum_all_memory_requests}Mi, Total memory limits: {sum_all_memory_limits}Mi"
+                print_prefixed(available_cluster, "No resource info for daemonset")
+        print_prefixed(
+            available_cluster,
+            f"Total memory requests: {sum_all_memory_requests}Mi, Total memory limits: {sum_all_memory_limits}Mi",
         )
-        print(
-            f"Total cpu requests: {sum_all_cpu_requests}m, Total cpu limits: {sum_all_cpu_limits}m"
+        print_prefixed(
+            available_cluster,
+            f"Total cpu requests: {sum_all_cpu_requests}m, Total cpu limits: {sum_all_cpu_limits}m",
         )
 
+    # list the daemonsets of every selected cluster at once
+    results = run_on_clusters(print_max_resources, select_clusters(cluster))
+    err = False
+    for result in results.values():
+        if not result.ok:
+            print(f"[{result.cluster.value}] Failed to list daemonsets: {result.error}")
+            err = True
+    if err:
+        raise SystemExit(1)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,710 @@
+#!/usr/bin/env python3
+
+import csv
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import click
+import numpy as np
+import yaml
+
+from constants import (
+    CLUSTER_REGISTRY_FILE,
+    CLUSTER_STAKE_AMOUNTS,
+    CLUSTERS,
+    VALIDATOR_STAKE_AMOUNT,
+    settings,
+)
+from target_planner import (
+    RTT_LATENCY_FILE,
+    load_rtt_matrix,
+    region_rtt_ms,
+)
+
+THROUGHPUT_FILE = "data/google_cloud_inter_region_netperf_throughput.csv"
+# bandwidth of a single flow within a region, which the inter-region measurements don't cover
+INTRA_REGION_GBPS = 10.0
+# serialized size of a coin transfer
+DEFAULT_TXN_BYTES = 300
+DEFAULT_BLOCK_TXNS = (1000, 2500, 5000)
+ROTATIONS = ("round-robin", "random")
+# combinations simulated at once, which bounds the size of the per region triple arrays
+SIMULATION_CHUNK_SIZE = 4096
+# most splits simulated when first covering the search space, before refining the best ones locally
+MAX_GRID_LAYOUTS = 20000
+# best grid splits refined by the local search
+PLACEMENT_SEEDS = 5
+
+
+def load_throughput_matrix(path: str = THROUGHPUT_FILE) -> Dict[Tuple[str, str], float]:
+    """
+    (sending region, receiving region) -> netperf throughput in Gbits/sec
+    """
+    with open(path, "r", newline="") as f:
+        return {
+            (row["sending_region"], row["receiving_region"]): float(row["Gbits/sec"])
+            for row in csv.DictReader(f)
+        }
+
+
+def region_gbps(
+    throughput: Dict[Tuple[str, str], float], source: str, destination: str
+) -> float:
+    if source == destination:
+        return INTRA_REGION_GBPS
+    if (source, destination) in throughput:
+        return throughput[(source, destination)]
+    if (destination, source) in throughput:
+        return throughput[(destination, source)]
+    raise Exception(f"No throughput between {source} and {destination} in {THROUGHPUT_FILE}")
+
+
+@dataclass
+class NetworkModel:
+    regions: List[str]
+    # sending region x receiving region
+    one_way_ms: np.ndarray
+    gbps: np.ndarray
+
+    def region_index(self, region: str) -> int:
+        if region not in self.regions:
+            raise Exception(f"Unknown region {region}, expected one of {', '.join(self.regions)}")
+        return self.regions.index(region)
+
+
+def load_network_model(
+    rtt_path: str = RTT_LATENCY_FILE, throughput_path: str = THROUGHPUT_FILE
+) -> NetworkModel:
+    """
+    The one-way latency and bandwidth between every pair of regions in the measurements
+    """
+    rtt = load_rtt_matrix(rtt_path)
+    throughput = load_throughput_matrix(throughput_path)
+    regions = sorted({region for pair in rtt for region in pair})
+    return NetworkModel(
+        regions=regions,
+        one_way_ms=np.array(
+            [[region_rtt_ms(rtt, source, dest) / 2 for dest in regions] for source in regions]
+        ),
+        gbps=np.array(
+            [[region_gbps(throughput, source, dest) for dest in regions] for source in regions]
+        ),
+    )
+
+
+def quorum_arrival_ms(
+    arrivals: np.ndarray, weights: np.ndarray, quorum: np.ndarray
+) -> np.ndarray:
+    """
+    When the messages from the last axis' regions, arriving at the given times, add up to the quorum
+    voting power. weights broadcast against arrivals, quorum against arrivals without the last axis
+    """
+    order = np.argsort(arrivals, axis=-1)
+    sorted_arrivals = np.take_along_axis(arrivals, order, axis=-1)
+    power = np.cumsum(
+        np.take_along_axis(np.broadcast_to(weights, arrivals.shape), order, axis=-1), axis=-1
+    )
+    index = np.argmax(power >= quorum[..., None], axis=-1)
+    return np.take_along_axis(sorted_arrivals, index[..., None], axis=-1)[..., 0]
+
+
+def leader_transitions(nodes: np.ndarray, power: np.ndarray, rotation: str) -> np.ndarray:
+    """
+    Probability that a round's leader is in region a and the next round's leader in region b,
+    as combination x a x b.
+
+    round-robin goes through the validators in genesis order, in which each region's nodes are
+    consecutive. random draws each leader independently, in proportion to voting power
+    """
+    if rotation == "random":
+        share = power / power.sum(axis=1, keepdims=True)
+        return share[:, :, None] * share[:, None, :]
+    if rotation != "round-robin":
+        raise Exception(f"Unknown rotation {rotation}, expected one of {', '.join(ROTATIONS)}")
+    combinations, regions = nodes.shape
+    total = nodes.sum(axis=1)
+    transitions = np.zeros((combinations, regions, regions))
+    rows = np.arange(combinations)
+    for region in range(regions):
+        transitions[:, region, region] = np.maximum(nodes[:, region] - 1, 0)
+        # the last node of the region hands over to the first node of the next region with nodes
+        next_region = np.full(combinations, region)
+        for offset in range(regions - 1, 0, -1):
+            candidate = (region + offset) % regions
+            next_region = np.where(nodes[:, candidate] > 0, candidate, next_region)
+        transitions[rows, region, next_region] += nodes[:, region] > 0
+    return transitions / total[:, None, None]
+
+
+@dataclass
+class SimulationResult:
+    regions: List[str]
+    # layout x region
+    layouts: np.ndarray
+    block_txns: np.ndarray
+    # layout x block size
+    round_ms: np.ndarray
+    commit_latency_ms: np.ndarray
+    max_tps: np.ndarray
+
+
+def simulate_chunk(
+    model: NetworkModel,
+    nodes: np.ndarray,
+    power: np.ndarray,
+    block_bits: np.ndarray,
+    rotation: str,
+    egress_gbps: Optional[float],
+) -> Tuple[np.ndarray, np.ndarray]:
+    # the leader sends the block to every node at once, each copy at the bandwidth of its route,
+    # or as fast as the leader's egress can push all copies
+    transmit_ms = block_bits[:, None, None] / (model.gbps[None] * 1e9) * 1e3
+    if egress_gbps:
+        broadcast_ms = (nodes.sum(axis=1) - 1) * block_bits / (egress_gbps * 1e9) * 1e3
+        transmit_ms = np.maximum(transmit_ms, broadcast_ms[:, None, None])
+    # proposal from a leader in region a received in region c
+    proposal_ms = model.one_way_ms[None] + transmit_ms
+    # vote from region c, for a proposal from region a, received by the next leader in region b
+    vote_ms = proposal_ms[:, :, None, :] + model.one_way_ms.T[None, None, :, :]
+
+    quorum = np.floor(power.sum(axis=1) * 2 / 3) + 1
+    certified_ms = quorum_arrival_ms(vote_ms, power[:, None, None, :], quorum[:, None, None])
+    delivered_ms = quorum_arrival_ms(proposal_ms, power[:, None, :], quorum[:, None])
+
+    transitions = leader_transitions(nodes, power, rotation)
+    round_ms = (transitions * certified_ms).sum(axis=(1, 2))
+    leader_share = transitions.sum(axis=2)
+    # a block is committed once it and its child are certified, and a quorum has received the
+    # grandchild proposal carrying the child's certificate
+    commit_ms = 2 * round_ms + (leader_share * delivered_ms).sum(axis=1)
+    return round_ms, commit_ms
+
+
+def simulate_rounds(
+    model: NetworkModel,
+    layouts: np.ndarray,
+    block_txns: Sequence[int],
+    txn_bytes: int = DEFAULT_TXN_BYTES,
+    rotation: str = "round-robin",
+    power: Optional[np.ndarray] = None,
+    egress_gbps: Optional[float] = None,
+) -> SimulationResult:
+    """
+    Predict the round time, commit latency and maximum throughput of a pipelined BFT protocol for every
+    layout and block size. Layouts are node counts per region of the model, and power is the voting
+    power per region, the node counts by default.
+
+    Each round the leader broadcasts its block, every node votes to the next leader, and the next leader
+    proposes as soon as votes with a 2f+1 quorum of voting power arrived. Nodes of a region are
+    indistinguishable, so each round's events are computed per region, for every pair of consecutive
+    leader regions, and weighted by how often the rotation goes from one to the other
+    """
+    layouts = np.asarray(layouts, dtype=float)
+    if layouts.ndim != 2 or layouts.shape[1] != len(model.regions):
+        raise Exception(f"Layouts must have a node count for each of {', '.join(model.regions)}")
+    power = layouts if power is None else np.asarray(power, dtype=float)
+    block_txns = np.asarray(block_txns, dtype=float)
+
+    # every layout with every block size, flattened
+    nodes = np.repeat(layouts, len(block_txns), axis=0)
+    combination_power = np.repeat(power, len(block_txns), axis=0)
+    block_bits = np.tile(block_txns * txn_bytes * 8, len(layouts))
+    round_ms = np.empty(len(nodes))
+    commit_ms = np.empty(len(nodes))
+    for start in range(0, len(nodes), SIMULATION_CHUNK_SIZE):
+        chunk = slice(start, start + SIMULATION_CHUNK_SIZE)
+        round_ms[chunk], commit_ms[chunk] = simulate_chunk(
+            model,
+            nodes[chunk],
+            combination_power[chunk],
+            block_bits[chunk],
+            rotation,
+            egress_gbps,
+        )
+
+    shape = (len(layouts), len(block_txns))
+    round_ms = round_ms.reshape(shape)
+    return SimulationResult(
+        regions=model.regions,
+        layouts=layouts,
+        block_txns=block_txns,
+        round_ms=round_ms,
+        commit_latency_ms=commit_ms.reshape(shape),
+        max_tps=block_txns[None, :] / (round_ms / 1000),
+    )
+
+
+def enumerate_layouts(
+    total_nodes: int, regions: int, step: int = 1, min_nodes: int = 0
+) -> np.ndarray:
+    """
+    Every split of total_nodes across the regions, with at least min_nodes each and counts above that
+    in multiples of step. The last region takes the remainder
+    """
+
+    def splits(remaining: int, regions: int) -> Iterator[Tuple[int, ...]]:
+        if regions == 1:
+            if remaining >= min_nodes:
+                yield (remaining,)
+            return
+        for count in range(min_nodes, remaining - min_nodes * (regions - 1) + 1, step):
+            for rest in splits(remaining - count, regions - 1):
+                yield (count,) + rest
+
+    layouts = list(splits(total_nodes, regions))
+    return np.array(layouts, dtype=float).reshape(-1, regions)
+
+
+def current_layout(model: NetworkModel) -> np.ndarray:
+    """
+    The node counts of the cluster registry, per region of the model
+    """
+    layout = np.zeros(len(model.regions))
+    for cluster, count in CLUSTERS.items():
+        layout[model.region_index(cluster.region)] += count
+    return layout
+
+
+def current_power(model: NetworkModel) -> np.ndarray:
+    """
+    The voting power of the cluster registry per region of the model, in multiples of
+    VALIDATOR_STAKE_AMOUNT
+    """
+    power = np.zeros(len(model.regions))
+    for cluster, count in CLUSTERS.items():
+        stake = CLUSTER_STAKE_AMOUNTS.get(cluster, VALIDATOR_STAKE_AMOUNT)
+        power[model.region_index(cluster.region)] += count * stake / VALIDATOR_STAKE_AMOUNT
+    return power
+
+
+def parse_layout(model: NetworkModel, layout: Sequence[str]) -> np.ndarray:
+    nodes = np.zeros(len(model.regions))
+    for entry in layout:
+        region, _, count = entry.partition("=")
+        if region not in model.regions or not count.isdigit():
+            raise click.BadParameter(
+                f"Expected <region>=<nodes> with one of {', '.join(model.regions)}, got {entry}"
+            )
+        nodes[model.region_index(region)] += int(count)
+    return nodes
+
+
+def format_layout(regions: List[str], layout: np.ndarray) -> str:
+    return " ".join(
+        f"{region}={int(count)}" for region, count in zip(regions, layout) if count
+    )
+
+
+@dataclass
+class Placement:
+    # per region of the model
+    nodes: np.ndarray
+    # stake of each node, as a multiple of VALIDATOR_STAKE_AMOUNT
+    stake: np.ndarray
+    commit_latency_ms: float
+    # layouts simulated by the search
+    simulated: int = 0
+
+    @property
+    def power(self) -> np.ndarray:
+        return self.nodes * self.stake
+
+
+def survives_region_loss(power: np.ndarray) -> np.ndarray:
+    """
+    Whether the voting power left after losing any one region still reaches a 2f+1 quorum, per layout
+    """
+    total = power.sum(axis=1)
+    return total - power.max(axis=1) >= np.floor(total * 2 / 3) + 1
+
+
+def grid_step(total_nodes: int, regions: int, min_nodes: int) -> int:
+    """
+    The finest step at which the splits of the nodes fit in MAX_GRID_LAYOUTS
+    """
+    free = max(0, total_nodes - min_nodes * regions)
+    step = 1
+    while math.comb(free // step + regions - 1, regions - 1) > MAX_GRID_LAYOUTS:
+        step += 1
+    return step
+
+
+def placement_moves(
+    nodes: np.ndarray,
+    stake: np.ndarray,
+    columns: List[int],
+    move: int,
+    min_nodes: int,
+    max_stake_multiplier: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Every placement one move away: move nodes from one region to another, or double or halve the stake
+    of a region's nodes
+    """
+    moved_nodes, moved_stake = [], []
+    for source in columns:
+        if nodes[source] - move < min_nodes:
+            continue
+        for destination in columns:
+            if destination != source:
+                moved = nodes.copy()
+                moved[source] -= move
+                moved[destination] += move
+                moved_nodes.append(moved)
+                moved_stake.append(stake)
+    for region in columns:
+        for factor in (2, 0.5):
+            if nodes[region] and 1 <= stake[region] * factor <= max_stake_multiplier:
+                scaled = stake.copy()
+                scaled[region] *= factor
+                moved_nodes.append(nodes)
+                moved_stake.append(scaled)
+    return (
+        np.array(moved_nodes).reshape(-1, len(nodes)),
+        np.array(moved_stake).reshape(-1, len(nodes)),
+    )
+
+
+def optimize_placement(
+    model: NetworkModel,
+    regions: List[str],
+    total_nodes: int,
+    commit_latency_ms: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    min_nodes: int = 0,
+    tolerate_region_loss: bool = False,
+    max_stake_multiplier: int = 1,
+) -> Optional[Placement]:
+    """
+    Search the splits of total_nodes across the regions, and with a max_stake_multiplier above 1 the
+    stake of each region's nodes, for the lowest commit_latency_ms(nodes, power). Returns None if no
+    placement satisfies the constraints.
+
+    A grid over every split, as fine as MAX_GRID_LAYOUTS allows, seeds a local search from its best
+    splits. The local search takes the best move while it lowers the latency, then repeats with moves
+    half as big, down to single nodes
+    """
+    columns = [model.region_index(region) for region in regions]
+    step = grid_step(total_nodes, len(regions), min_nodes)
+    splits = enumerate_layouts(total_nodes, len(regions), step, min_nodes)
+    nodes = np.zeros((len(splits), len(model.regions)))
+    nodes[:, columns] = splits
+    stake = np.ones_like(nodes)
+    simulated = 0
+
+    def evaluate(nodes: np.ndarray, stake: np.ndarray) -> np.ndarray:
+        nonlocal simulated
+        if not len(nodes):
+            return np.empty(0)
+        simulated += len(nodes)
+        latency = commit_latency_ms(nodes, nodes * stake)
+        if tolerate_region_loss:
+            latency = np.where(survives_region_loss(nodes * stake), latency, np.inf)
+        return latency
+
+    latency = evaluate(nodes, stake)
+    best: Optional[Placement] = None
+    for seed in np.argsort(latency, kind="stable")[:PLACEMENT_SEEDS]:
+        if not np.isfinite(latency[seed]):
+            break
+        placement = Placement(nodes[seed], stake[seed], float(latency[seed]))
+        move = step
+        while True:
+            moved_nodes, moved_stake = placement_moves(
+                placement.nodes, placement.stake, columns, move, min_nodes, max_stake_multiplier
+            )
+            moved_latency = evaluate(moved_nodes, moved_stake)
+            i = int(np.argmin(moved_latency)) if len(moved_latency) else -1
+            if i >= 0 and moved_latency[i] < placement.commit_latency_ms - 1e-9:
+                placement = Placement(moved_nodes[i], moved_stake[i], float(moved_latency[i]))
+            elif move > 1:
+                move //= 2
+            else:
+                break
+        if best is None or placement.commit_latency_ms < best.commit_latency_ms:
+            best = placement
+    if best is not None:
+        best.simulated = simulated
+    return best
+
+
+def clusters_config(regions: List[str], nodes: np.ndarray, stake: np.ndarray) -> str:
+    """
+    The placement as a cluster registry. Regions that already have a cluster keep its settings, and
+    other regions get a new bench-<region> cluster, which still needs its terraform
+    """
+    registered = {cluster.region: cluster for cluster in CLUSTERS}
+    entries = []
+    for i, region in enumerate(regions):
+        if not nodes[i]:
+            continue
+        cluster = registered.get(region)
+        entry = {
+            "name": cluster.value if cluster else f"bench-{region}",
+            "region": region,
+            "zone": cluster.zone if cluster else f"{region}-a",
+            "nodes": int(nodes[i]),
+        }
+        if cluster and cluster.loadtest:
+            entry["loadtest"] = True
+        if stake[i] != 1:
+            entry["stake"] = int(stake[i] * VALIDATOR_STAKE_AMOUNT)
+        if cluster and cluster.context:
+            entry["context"] = cluster.context
+        if cluster and cluster.terraform_directory != f"terraform/{cluster.value}":
+            entry["terraform_directory"] = cluster.terraform_directory
+        entries.append(entry)
+    return yaml.dump({"clusters": entries}, default_flow_style=False, sort_keys=False)
+
+
+def print_prediction(label: str, result: SimulationResult, i: int) -> None:
+    print(
+        f"{label:>8} {format_layout(result.regions, result.layouts[i])}: "
+        + ", ".join(
+            f"{txns:.0f} txns {result.commit_latency_ms[i, j]:.0f}ms/{result.max_tps[i, j]:.0f} TPS"
+            for j, txns in enumerate(result.block_txns)
+        )
+    )
+
+
+def simulation_options(f):
+    f = click.option(
+        "--block-txns",
+        type=int,
+        multiple=True,
+        default=DEFAULT_BLOCK_TXNS,
+        show_default=True,
+        help="Transactions per block. Can be given several times",
+    )(f)
+    f = click.option(
+        "--txn-bytes",
+        type=int,
+        default=DEFAULT_TXN_BYTES,
+        show_default=True,
+        help="Size of each transaction",
+    )(f)
+    f = click.option(
+        "--rotation",
+        type=click.Choice(ROTATIONS),
+        default="round-robin",
+        show_default=True,
+        help="How the proposer rotates between rounds",
+    )(f)
+    f = click.option(
+        "--egress-gbps",
+        type=float,
+        help="Egress bandwidth of the leader, shared by every copy of its block. Unlimited by default",
+    )(f)
+    return f
+
+
+@click.group()
+def main() -> None:
+    """
+    Predict consensus latency and throughput of node layouts from the inter-region measurements in ./data
+    """
+    pass
+
+
+@main.command("simulate")
+@click.option(
+    "--layout",
+    multiple=True,
+    help="<region>=<nodes>, given once per region. Defaults to the cluster registry",
+)
+@simulation_options
+def simulate(
+    layout: Tuple[str],
+    block_txns: Tuple[int],
+    txn_bytes: int,
+    rotation: str,
+    egress_gbps: Optional[float],
+) -> None:
+    """
+    Predict the round time, commit latency and maximum TPS of one layout
+    """
+    model = load_network_model()
+    nodes = parse_layout(model, layout) if layout else current_layout(model)
+    power = nodes if layout else current_power(model)
+    result = simulate_rounds(
+        model, nodes[None, :], block_txns, txn_bytes, rotation, power[None, :], egress_gbps
+    )
+    print(f"Layout: {format_layout(model.regions, nodes)}")
+    for i, txns in enumerate(block_txns):
+        print(
+            f"{txns} txns/block: round {result.round_ms[0, i]:.1f}ms, "
+            f"commit latency {result.commit_latency_ms[0, i]:.1f}ms, "
+            f"max {result.max_tps[0, i]:.0f} TPS"
+        )
+
+
+@main.command("sweep")
+@click.option(
+    "--nodes",
+    type=int,
+    default=sum(CLUSTERS.values()),
+    show_default=True,
+    help="Total number of nodes to split across the regions",
+)
+@click.option(
+    "--region",
+    "regions",
+    multiple=True,
+    help="Region to place nodes in. Defaults to the regions of the cluster registry",
+)
+@click.option(
+    "--step", type=int, default=1, show_default=True, help="Granularity of the node counts"
+)
+@click.option(
+    "--min-nodes-per-region",
+    type=int,
+    default=0,
+    show_default=True,
+    help="Fewest nodes in each region",
+)
+@click.option(
+    "--top", type=int, default=10, show_default=True, help="Number of layouts to print"
+)
+@simulation_options
+def sweep(
+    nodes: int,
+    regions: Tuple[str],
+    step: int,
+    min_nodes_per_region: int,
+    top: int,
+    block_txns: Tuple[int],
+    txn_bytes: int,
+    rotation: str,
+    egress_gbps: Optional[float],
+) -> None:
+    """
+    Simulate every split of the nodes across the regions, and print the layouts with the lowest commit
+    latency at the first block size, next to the cluster registry
+    """
+    model = load_network_model()
+    regions = list(regions) or [cluster.region for cluster in CLUSTERS]
+    columns = [model.region_index(region) for region in regions]
+    splits = enumerate_layouts(nodes, len(regions), step, min_nodes_per_region)
+    if not len(splits):
+        print("No layout satisfies the constraints")
+        raise SystemExit(1)
+    layouts = np.zeros((len(splits) + 1, len(model.regions)))
+    layouts[:-1, columns] = splits
+    layouts[-1] = current_layout(model)
+    power = layouts.copy()
+    power[-1] = current_power(model)
+
+    start_time = time.perf_counter()
+    result = simulate_rounds(
+        model, layouts, block_txns, txn_bytes, rotation, power, egress_gbps
+    )
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"Simulated {len(layouts)} layouts x {len(block_txns)} block sizes in {elapsed * 1000:.0f}ms"
+    )
+
+    ranked = np.argsort(result.commit_latency_ms[:-1, 0], kind="stable")
+    for rank, i in enumerate(ranked[:top]):
+        print_prediction(f"#{rank + 1}", result, i)
+    print_prediction("current", result, len(layouts) - 1)
+
+
+@main.command("optimize")
+@click.option(
+    "--nodes",
+    type=int,
+    default=sum(CLUSTERS.values()),
+    show_default=True,
+    help="Total number of validators to place",
+)
+@click.option(
+    "--region",
+    "regions",
+    multiple=True,
+    help="Region to place validators in. Defaults to every region in the measurements",
+)
+@click.option(
+    "--min-nodes-per-region",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="Fewest validators in each region. 0 lets the search drop regions, which usually leaves a single one",
+)
+@click.option(
+    "--tolerate-region-loss",
+    is_flag=True,
+    default=False,
+    help="Only allow placements that keep a quorum after losing any one region",
+)
+@click.option(
+    "--weighted-stake",
+    is_flag=True,
+    default=False,
+    help="Also search the stake of each region's validators, within the min and max stake of the genesis layout",
+)
+@simulation_options
+def optimize(
+    nodes: int,
+    regions: Tuple[str],
+    min_nodes_per_region: int,
+    tolerate_region_loss: bool,
+    weighted_stake: bool,
+    block_txns: Tuple[int],
+    txn_bytes: int,
+    rotation: str,
+    egress_gbps: Optional[float],
+) -> None:
+    """
+    Find the placement of the validators with the lowest commit latency at the first block size, and
+    print it as a cluster registry
+    """
+    model = load_network_model()
+    regions = list(regions) or model.regions
+    max_stake_multiplier = 1
+    if weighted_stake:
+        max_stake_multiplier = settings.layout["max_stake"] // VALIDATOR_STAKE_AMOUNT
+
+    def commit_latency_ms(layouts: np.ndarray, power: np.ndarray) -> np.ndarray:
+        return simulate_rounds(
+            model, layouts, block_txns[:1], txn_bytes, rotation, power, egress_gbps
+        ).commit_latency_ms[:, 0]
+
+    start_time = time.perf_counter()
+    placement = optimize_placement(
+        model,
+        regions,
+        nodes,
+        commit_latency_ms,
+        min_nodes_per_region,
+        tolerate_region_loss,
+        max_stake_multiplier,
+    )
+    elapsed = time.perf_counter() - start_time
+    if placement is None:
+        print("No placement satisfies the constraints")
+        raise SystemExit(1)
+    print(f"Simulated {placement.simulated} placements in {elapsed * 1000:.0f}ms")
+
+    layouts = np.array([placement.nodes, current_layout(model)])
+    power = np.array([placement.power, current_power(model)])
+    result = simulate_rounds(
+        model, layouts, block_txns, txn_bytes, rotation, power, egress_gbps
+    )
+    print_prediction("best", result, 0)
+    print_prediction("current", result, 1)
+    # a benchmark without some of its clusters, or without any emitter, is not a replacement for the registry
+    placed = {region for region, count in zip(model.regions, placement.nodes) if count}
+    dropped = [cluster.value for cluster in CLUSTERS if cluster.region not in placed]
+    if dropped or not any(cluster.loadtest for cluster in CLUSTERS if cluster.region in placed):
+        print(
+            f"The placement drops {', '.join(dropped) or 'every loadtest cluster'} from {CLUSTER_REGISTRY_FILE}, "
+            f"raise --min-nodes-per-region or add their regions with --region to keep them"
+        )
+        raise SystemExit(1)
+    print(f"To deploy it, replace {CLUSTER_REGISTRY_FILE} with:")
+    print(clusters_config(model.regions, placement.nodes, placement.stake), end="")
+
+
+if __name__ == "__main__":
+    main()
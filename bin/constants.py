@@ -1,74 +1,296 @@
 import os
+import threading
 import yaml
-from enum import Enum
-from typing import Dict
-from kubernetes import config, client
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import TYPE_CHECKING, Dict, List, Optional
 
+# kubernetes is slow to import, so it is only imported by the commands that talk to a cluster
+if TYPE_CHECKING:
+    from kubernetes import client, config
 
-class Cluster(Enum):
-    US = "bench-us-west1"
-    EU = "bench-europe-west4"
-    ASIA = "bench-asia-east1"
-    ALL = "all"
+# use the C-accelerated loader when PyYAML was built with libyaml
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 
+# every benchmark cluster, relative to the root of the repository unless overridden
+CLUSTER_REGISTRY_FILE = os.getenv(
+    "CLUSTER_REGISTRY_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "clusters.yaml"),
+)
+
+
+@dataclass(frozen=True)
+class Cluster:
+    """
+    A benchmark cluster from the cluster registry. Clusters are identified by name alone
+    """
+
+    # the helm release is named after the cluster, and the GKE cluster is aptos-<name>
+    value: str
+    region: str = field(default="", compare=False)
+    zone: str = field(default="", compare=False)
+    nodes: int = field(default=0, compare=False)
+    # whether loadtest emitters run in this cluster
+    loadtest: bool = field(default=False, compare=False)
+    # stake of each validator, where it differs from VALIDATOR_STAKE_AMOUNT
+    stake: Optional[int] = field(default=None, compare=False)
+    # kube context, where it differs from the one the cluster's terraform sets up
+    context: Optional[str] = field(default=None, compare=False)
+    terraform_directory: str = field(default="", compare=False)
+
+    def __str__(self) -> str:
+        return self.value
+
+
+# selects every cluster in --cluster options
+ALL_CLUSTERS = Cluster("all")
+
+
+def load_cluster_registry(path: str = CLUSTER_REGISTRY_FILE) -> List[Cluster]:
+    with open(path, "r") as registry_file:
+        entries = yaml.load(registry_file, Loader=YAML_LOADER)["clusters"]
+    clusters = [
+        Cluster(
+            value=entry["name"],
+            region=entry["region"],
+            zone=entry.get("zone", f"{entry['region']}-a"),
+            nodes=int(entry["nodes"]),
+            loadtest=bool(entry.get("loadtest", False)),
+            stake=entry.get("stake"),
+            context=entry.get("context"),
+            terraform_directory=entry.get("terraform_directory", f"terraform/{entry['name']}"),
+        )
+        for entry in entries
+    ]
+    names = [cluster.value for cluster in clusters]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates or ALL_CLUSTERS.value in names:
+        raise Exception(
+            f"Cluster names in {path} must be unique and not {ALL_CLUSTERS.value}: "
+            f"{', '.join(sorted(duplicates)) or ALL_CLUSTERS.value}"
+        )
+    return clusters
+
+
+CLUSTER_REGISTRY = load_cluster_registry()
+
+
+def cluster_by_name(name: str) -> Cluster:
+    """
+    The registered cluster with the given name, or ALL_CLUSTERS for "all"
+    """
+    if name == ALL_CLUSTERS.value:
+        return ALL_CLUSTERS
+    for cluster in CLUSTER_REGISTRY:
+        if cluster.value == name:
+            return cluster
+    raise ValueError(f"Unknown cluster {name} in {CLUSTER_REGISTRY_FILE}")
+
+
+# choices of --cluster options
+CLUSTER_CHOICES = [cluster.value for cluster in CLUSTER_REGISTRY] + [ALL_CLUSTERS.value]
+
 GENESIS_DIRECTORY = "genesis"
+# per-job output of the aptos CLI subprocesses
+JOB_LOG_DIRECTORY = "logs"
 APTOS_NODE_HELM_CHART_DIRECTORY = "submodules/aptos-core/terraform/helm/aptos-node"
 APTOS_NODE_HELM_VALUES_FILE = "aptos_node_helm_values.yaml"
 
-GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
-if not GCP_PROJECT_ID:
-    raise Exception("GCP_PROJECT_ID not set")
-
-CLUSTERS = {Cluster.US: 33, Cluster.EU: 33, Cluster.ASIA: 34}
-# CLUSTERS = {Cluster.NA: 5, Cluster.EU: 5, Cluster.ASIA: 6} # smaller cluster configuration for testing
-KUBE_CONTEXTS = {
-    Cluster.US: f"gke_{GCP_PROJECT_ID}_us-west1-a_aptos-{Cluster.US.value}",
-    Cluster.EU: f"gke_{GCP_PROJECT_ID}_europe-west4-a_aptos-{Cluster.EU.value}",
-    Cluster.ASIA: f"gke_{GCP_PROJECT_ID}_asia-east1-a_aptos-{Cluster.ASIA.value}",
-}
+# number of validators (and VFNs) in each cluster
+CLUSTERS: Dict[Cluster, int] = {cluster: cluster.nodes for cluster in CLUSTER_REGISTRY}
 NAMESPACE = "default"
-
-with open(APTOS_NODE_HELM_VALUES_FILE, "r") as genesis_file:
-    values = yaml.load(genesis_file, Loader=yaml.FullLoader)
-    CURRENT_ERA = values["chain"]["era"]
-    HAPROXY_ENABLED = bool(values["haproxy"]["enabled"])
-
-LAYOUT = {
-    # This is the same testing key as in forge: https://github.com/aptos-labs/aptos-core/blob/main/testsuite/forge/src/backend/k8s/constants.rs#L7-L10
-    # The private mint key being: 0xE25708D90C72A53B400B27FC7602C4D546C7B7469FA6E12544F0EBFB2F16AE19
-    "root_key": "0x48136DF3174A3DE92AFDB375FFE116908B69FF6FAB9B1410E548A33FEA1D159D",
-    "users": [
-        f"{cluster.value}-aptos-node-{i}"
-        for cluster in CLUSTERS
-        for i in range(CLUSTERS[cluster])
-    ],
-    "chain_id": int(
-        CURRENT_ERA
-    ),  # NOTE: the chain_id changes for each era to prevent new nodes from connecting to old chain as its shutting down
-    "allow_new_validators": True,
-    "epoch_duration_secs": 7200,
-    "is_test": True,
-    "min_price_per_gas_unit": 1,
-    "min_stake": 10**8 * 10**6,
-    "min_voting_threshold": 10**8 * 10**6,
-    "max_stake": 10**8 * 10**9,
-    "recurring_lockup_duration_secs": 86400,
-    "required_proposer_stake": 10**8 * 10**6,
-    "rewards_apy_percentage": 10,
-    "voting_duration_secs": 43200,
-    "voting_power_increase_limit": 20,
+# REST API of the validators and fullnodes
+REST_API_PORT = 8080
+VALIDATOR_STAKE_AMOUNT = 10**8 * 10**6  # 1M APT in octas
+# stake of each validator in a cluster, where it differs from VALIDATOR_STAKE_AMOUNT
+CLUSTER_STAKE_AMOUNTS: Dict[Cluster, int] = {
+    cluster: cluster.stake for cluster in CLUSTER_REGISTRY if cluster.stake is not None
 }
 
+# discovered validator and fullnode LoadBalancer IPs, keyed by kube context and era
+HOST_CACHE_FILE = ".cache/hosts.json"
+HOST_CACHE_TTL_SECS = 600
+
+
+class Settings:
+    """
+    Configuration derived from the environment and the helm values file.
+    Each value is computed on first use, so commands that don't need it never pay for it
+    """
+
+    @cached_property
+    def gcp_project_id(self) -> str:
+        gcp_project_id = os.getenv("GCP_PROJECT_ID")
+        if not gcp_project_id:
+            raise Exception("GCP_PROJECT_ID not set")
+        return gcp_project_id
+
+    @cached_property
+    def kube_contexts(self) -> Dict[Cluster, str]:
+        return {
+            cluster: cluster.context
+            or f"gke_{self.gcp_project_id}_{cluster.zone}_aptos-{cluster.value}"
+            for cluster in CLUSTER_REGISTRY
+        }
+
+    @cached_property
+    def helm_values(self) -> dict:
+        with open(APTOS_NODE_HELM_VALUES_FILE, "r") as values_file:
+            return yaml.load(values_file, Loader=YAML_LOADER)
+
+    @cached_property
+    def current_era(self) -> str:
+        return self.helm_values["chain"]["era"]
+
+    @cached_property
+    def image_tag(self) -> str:
+        return str(self.helm_values["imageTag"])
+
+    @cached_property
+    def haproxy_enabled(self) -> bool:
+        return bool(self.helm_values["haproxy"]["enabled"])
+
+    @cached_property
+    def layout(self) -> dict:
+        return {
+            # This is the same testing key as in forge: https://github.com/aptos-labs/aptos-core/blob/main/testsuite/forge/src/backend/k8s/constants.rs#L7-L10
+            # The private mint key being: 0xE25708D90C72A53B400B27FC7602C4D546C7B7469FA6E12544F0EBFB2F16AE19
+            "root_key": "0x48136DF3174A3DE92AFDB375FFE116908B69FF6FAB9B1410E548A33FEA1D159D",
+            "users": [
+                f"{cluster.value}-aptos-node-{i}"
+                for cluster in CLUSTERS
+                for i in range(CLUSTERS[cluster])
+            ],
+            "chain_id": int(
+                self.current_era
+            ),  # NOTE: the chain_id changes for each era to prevent new nodes from connecting to old chain as its shutting down
+            "allow_new_validators": True,
+            "epoch_duration_secs": 7200,
+            "is_test": True,
+            "min_price_per_gas_unit": 1,
+            "min_stake": 10**8 * 10**6,
+            "min_voting_threshold": 10**8 * 10**6,
+            "max_stake": 10**8 * 10**9,
+            "recurring_lockup_duration_secs": 86400,
+            "required_proposer_stake": 10**8 * 10**6,
+            "rewards_apy_percentage": 10,
+            "voting_duration_secs": 43200,
+            "voting_power_increase_limit": 20,
+        }
+
+
+settings = Settings()
+
 # load test
 LOADTEST_POD_SPEC = "loadtest.yaml"
 LOADTEST_POD_NAME = "loadtest"
-LOADTEST_CLUSTERS = [Cluster.ASIA]
+LOADTEST_CLUSTERS = [cluster for cluster in CLUSTER_REGISTRY if cluster.loadtest]
+# per-run emitter time series, one directory per run id
+LOADTEST_RESULTS_DIRECTORY = "loadtest-results"
 
 # clients generation
-def kube_clients() -> Dict[Cluster, client.ApiClient]:
-    clients = {}
-    config.load_kube_config()
-    for cluster, context in KUBE_CONTEXTS.items():
-        clients[cluster] = config.new_client_from_config(context=context)
-    return clients
+# upper bound on pooled connections per cluster, sized for concurrent patch/delete calls
+KUBE_CLIENT_POOL_MAXSIZE = 32
+
+
+class KubeClientRegistry:
+    """
+    Process-wide registry of kube API clients, keyed by cluster.
+    The kubeconfig is parsed once, each client is created the first time its cluster is used,
+    and its connection pool is then reused for the rest of the CLI invocation
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._kube_config: Optional["config.kube_config.ConfigNode"] = None
+        self._clients: Dict[Cluster, "client.ApiClient"] = {}
+        self._retired_connections = 0
+        self.clients_created = 0
+
+    def _load_kube_config(self) -> "config.kube_config.ConfigNode":
+        from kubernetes import config
+
+        if self._kube_config is None:
+            # merge all files in $KUBECONFIG the same way load_kube_config does, but only once
+            self._kube_config = config.kube_config.KubeConfigMerger(
+                os.getenv("KUBECONFIG", config.KUBE_CONFIG_DEFAULT_LOCATION)
+            ).config
+            if self._kube_config is None:
+                raise config.ConfigException(
+                    "Invalid kube-config file. No configuration found."
+                )
+        return self._kube_config
+
+    def __getitem__(self, cluster: Cluster) -> "client.ApiClient":
+        from kubernetes import client, config
+
+        with self._lock:
+            api_client = self._clients.get(cluster)
+            if api_client is None:
+                configuration = client.Configuration()
+                config.load_kube_config_from_dict(
+                    self._load_kube_config(),
+                    context=settings.kube_contexts[cluster],
+                    client_configuration=configuration,
+                )
+                configuration.connection_pool_maxsize = KUBE_CLIENT_POOL_MAXSIZE
+                api_client = client.ApiClient(configuration)
+                self._clients[cluster] = api_client
+                self.clients_created += 1
+            return api_client
+
+    def invalidate(self) -> None:
+        """
+        Close all clients and forget the parsed kubeconfig, e.g. after credentials are refreshed
+        """
+        with self._lock:
+            for api_client in self._clients.values():
+                self._retired_connections += self._pool_connections(api_client)
+                api_client.close()
+            self._clients = {}
+            self._kube_config = None
+
+    @staticmethod
+    def _pool_connections(api_client: "client.ApiClient") -> int:
+        pools = api_client.rest_client.pool_manager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            connections = self._retired_connections + sum(
+                self._pool_connections(api_client)
+                for api_client in self._clients.values()
+            )
+            return {
+                "clients_created": self.clients_created,
+                "connections_created": connections,
+            }
+
+
+_KUBE_CLIENTS = KubeClientRegistry()
+
+
+def kube_clients() -> KubeClientRegistry:
+    """
+    Get the process-wide kube client registry. Index it by cluster to get that cluster's ApiClient
+    """
+    return _KUBE_CLIENTS
+
+
+def core_v1_api(cluster: Cluster) -> "client.CoreV1Api":
+    from kubernetes import client
+
+    return client.CoreV1Api(kube_clients()[cluster])
+
+
+def apps_v1_api(cluster: Cluster) -> "client.AppsV1Api":
+    from kubernetes import client
+
+    return client.AppsV1Api(kube_clients()[cluster])
+
+
+def custom_objects_api(cluster: Cluster) -> "client.CustomObjectsApi":
+    from kubernetes import client
+
+    return client.CustomObjectsApi(kube_clients()[cluster])
@@ -0,0 +1,218 @@
+import math
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from constants import Cluster, NAMESPACE, core_v1_api, custom_objects_api
+
+# the metrics API refreshes pod usage about every 15s
+RESOURCE_SAMPLE_INTERVAL_SECS = 15
+# an emitter whose p95 CPU usage reaches this fraction of its limit was CPU-bound
+CPU_BOUND_UTILIZATION = 0.9
+# largest emitter pod that fits on a loadtest node, in CPUs
+MAX_EMITTER_CPUS = 32
+# headroom kept over the highest observed memory usage when recommending memory
+MEMORY_HEADROOM = 1.5
+
+CPU_SUFFIXES = {"n": 1e-9, "u": 1e-6, "m": 1e-3}
+MEMORY_SUFFIXES = {
+    "Ki": 2**10,
+    "Mi": 2**20,
+    "Gi": 2**30,
+    "Ti": 2**40,
+    "k": 10**3,
+    "M": 10**6,
+    "G": 10**9,
+    "T": 10**12,
+}
+
+
+def parse_cpu(quantity: str) -> float:
+    """
+    A kubernetes CPU quantity in cores, e.g. 15800m or 123456789n
+    """
+    if quantity[-1] in CPU_SUFFIXES:
+        return float(quantity[:-1]) * CPU_SUFFIXES[quantity[-1]]
+    return float(quantity)
+
+
+def parse_memory(quantity: str) -> float:
+    """
+    A kubernetes memory quantity in bytes, e.g. 16Gi or 1234567Ki
+    """
+    for suffix, multiplier in MEMORY_SUFFIXES.items():
+        if quantity.endswith(suffix):
+            return float(quantity[: -len(suffix)]) * multiplier
+    return float(quantity)
+
+
+@dataclass
+class ResourceSample:
+    timestamp: float
+    cpu: float
+    memory_bytes: float
+
+
+@dataclass
+class EmitterUsage:
+    cluster: str
+    pod: str
+    cpu_limit: Optional[float]
+    memory_limit_bytes: Optional[float]
+    samples: int
+    mean_cpu: float
+    p95_cpu: float
+    max_memory_bytes: float
+
+    @property
+    def cpu_bound(self) -> bool:
+        return bool(self.cpu_limit) and self.p95_cpu >= self.cpu_limit * CPU_BOUND_UTILIZATION
+
+
+def read_pod_usage(cluster: Cluster, pod_name: str) -> ResourceSample:
+    """
+    The pod's current CPU and memory usage from the metrics API, summed across its containers
+    """
+    metrics = custom_objects_api(cluster).get_namespaced_custom_object(
+        "metrics.k8s.io", "v1beta1", NAMESPACE, "pods", pod_name
+    )
+    return ResourceSample(
+        timestamp=time.time(),
+        cpu=sum(parse_cpu(container["usage"]["cpu"]) for container in metrics["containers"]),
+        memory_bytes=sum(
+            parse_memory(container["usage"]["memory"]) for container in metrics["containers"]
+        ),
+    )
+
+
+def summarize_usage(
+    cluster: Cluster, pod_name: str, limits: Dict[str, str], samples: List[ResourceSample]
+) -> EmitterUsage:
+    cpu = sorted(sample.cpu for sample in samples)
+    return EmitterUsage(
+        cluster=cluster.value,
+        pod=pod_name,
+        cpu_limit=parse_cpu(limits["cpu"]) if "cpu" in limits else None,
+        memory_limit_bytes=parse_memory(limits["memory"]) if "memory" in limits else None,
+        samples=len(samples),
+        mean_cpu=sum(cpu) / len(cpu) if cpu else 0.0,
+        p95_cpu=cpu[min(len(cpu) - 1, math.ceil(len(cpu) * 0.95) - 1)] if cpu else 0.0,
+        max_memory_bytes=max((sample.memory_bytes for sample in samples), default=0.0),
+    )
+
+
+@dataclass
+class ResourceSampler:
+    """
+    Samples the usage of the cluster's emitter pods in the background, while the run is collected
+    """
+
+    cluster: Cluster
+    pod_names: List[str]
+    interval_secs: float = RESOURCE_SAMPLE_INTERVAL_SECS
+    samples: Dict[str, List[ResourceSample]] = field(default_factory=dict)
+    limits: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "ResourceSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            for pod_name in self.pod_names:
+                try:
+                    if pod_name not in self.limits:
+                        pod = core_v1_api(self.cluster).read_namespaced_pod(pod_name, NAMESPACE)
+                        self.limits[pod_name] = pod.spec.containers[0].resources.limits or {}
+                    sample = read_pod_usage(self.cluster, pod_name)
+                except Exception:
+                    # the pod is not running yet, or the metrics API has no usage for it yet
+                    continue
+                self.samples.setdefault(pod_name, []).append(sample)
+            self._stop.wait(self.interval_secs)
+
+    def usage(self) -> List[EmitterUsage]:
+        return [
+            summarize_usage(
+                self.cluster,
+                pod_name,
+                self.limits.get(pod_name, {}),
+                self.samples.get(pod_name, []),
+            )
+            for pod_name in self.pod_names
+        ]
+
+
+@dataclass
+class ResourceRecommendation:
+    emitter_cpu: str
+    emitter_memory: str
+    emitters_per_cluster: int
+    cpu_bound: bool
+    reason: str
+
+
+def recommend_emitter_resources(
+    usages: List[EmitterUsage],
+    emitter_cpu: str,
+    emitter_memory: str,
+    emitters_per_cluster: int,
+) -> ResourceRecommendation:
+    """
+    Recommend the emitter size for the next run. A CPU-bound emitter's real demand is unknown, so its
+    CPUs are doubled, or once a pod can't grow any further, the emitters per cluster are doubled
+    """
+    cpu = parse_cpu(emitter_cpu)
+    memory_gi = math.ceil(
+        max(
+            parse_memory(emitter_memory),
+            max((usage.max_memory_bytes for usage in usages), default=0.0) * MEMORY_HEADROOM,
+        )
+        / 2**30
+    )
+    bound = [usage for usage in usages if usage.cpu_bound]
+    if not bound:
+        return ResourceRecommendation(
+            emitter_cpu=emitter_cpu,
+            emitter_memory=f"{memory_gi}Gi",
+            emitters_per_cluster=emitters_per_cluster,
+            cpu_bound=False,
+            reason="no emitter was CPU-bound",
+        )
+    pods = ", ".join(f"{usage.cluster}/{usage.pod}" for usage in bound)
+    if cpu * 2 <= MAX_EMITTER_CPUS:
+        return ResourceRecommendation(
+            emitter_cpu=f"{cpu * 2:g}",
+            emitter_memory=f"{memory_gi}Gi",
+            emitters_per_cluster=emitters_per_cluster,
+            cpu_bound=True,
+            reason=f"{pods} CPU-bound, doubling CPUs per emitter",
+        )
+    return ResourceRecommendation(
+        emitter_cpu=emitter_cpu,
+        emitter_memory=f"{memory_gi}Gi",
+        emitters_per_cluster=emitters_per_cluster * 2,
+        cpu_bound=True,
+        reason=f"{pods} CPU-bound at the largest pod size, doubling emitters per cluster",
+    )
+
+
+def resources_record(
+    usages: List[EmitterUsage], recommendation: ResourceRecommendation
+) -> dict:
+    """
+    The usage and recommendation as stored with the run results
+    """
+    return {
+        "usage": [{**asdict(usage), "cpu_bound": usage.cpu_bound} for usage in usages],
+        "recommendation": asdict(recommendation),
+    }
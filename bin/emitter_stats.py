@@ -0,0 +1,264 @@
+import csv
+import math
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from constants import Cluster, LOADTEST_POD_NAME, NAMESPACE, core_v1_api
+
+# the emitter periodically logs its rates, e.g.
+# submitted: 4979 txn/s, committed: 4969 txn/s, expired: 0 txn/s, failed submission: 0 txn/s, latency: 3380 ms, (p50: 3300 ms, p90: 4300 ms, p99: 5900 ms), latency samples: 49690
+# some emitter versions misspell the rate unit, e.g. "failed submission: 0 tnx/s"
+EMITTER_STAT_PATTERN = re.compile(
+    r"(?P<key>submitted|committed|expired|failed submission|latency|p50|p90|p99): (?P<value>\d+(?:\.\d+)?) (?P<unit>t[xn]{2}/s|ms)"
+)
+# the log is read with kubernetes' RFC3339 timestamp prefix, e.g. "2024-05-01T12:00:00.123456789Z submitted: ..."
+LOG_TIMESTAMP_PATTERN = re.compile(
+    r"^(?P<seconds>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?P<fraction>\.\d+)?(?P<zone>Z|[+-]\d{2}:\d{2}) "
+)
+EMITTER_STAT_KEYS = ["submitted", "committed", "expired", "failed submission", "latency", "p50", "p90", "p99"]
+
+
+@dataclass
+class EmitterSample:
+    timestamp: float
+    submitted_tps: float
+    committed_tps: float
+    expired_tps: float
+    failed_submission_tps: float
+    latency_ms: float
+    p50_latency_ms: float
+    p90_latency_ms: float
+    p99_latency_ms: float
+
+
+SAMPLE_FIELDS = [f.name for f in fields(EmitterSample)]
+
+
+def parse_emitter_values(line: str) -> Optional[Dict[str, float]]:
+    """
+    The fields of one of the emitter's periodic rate lines that parsed, by key. Returns None for any other line
+    """
+    if "submitted:" not in line:
+        return None
+    return {
+        match.group("key"): float(match.group("value"))
+        for match in EMITTER_STAT_PATTERN.finditer(line)
+    }
+
+
+def emitter_sample(values: Dict[str, float], timestamp: float) -> Optional[EmitterSample]:
+    """
+    The sample of a rate line's fields. Returns None without submitted and committed, and records the
+    other fields that are missing as NaN, so they are left out of the means rather than counted as 0
+    """
+    if "submitted" not in values or "committed" not in values:
+        return None
+    return EmitterSample(
+        timestamp=timestamp,
+        submitted_tps=values["submitted"],
+        committed_tps=values["committed"],
+        expired_tps=values.get("expired", math.nan),
+        failed_submission_tps=values.get("failed submission", math.nan),
+        latency_ms=values.get("latency", math.nan),
+        p50_latency_ms=values.get("p50", math.nan),
+        p90_latency_ms=values.get("p90", math.nan),
+        p99_latency_ms=values.get("p99", math.nan),
+    )
+
+
+def parse_emitter_line(line: str, timestamp: float) -> Optional[EmitterSample]:
+    """
+    Parse one of the emitter's periodic rate lines. Returns None for any other line
+    """
+    values = parse_emitter_values(line)
+    return emitter_sample(values, timestamp) if values is not None else None
+
+
+def split_log_timestamp(line: str) -> Tuple[Optional[float], str]:
+    """
+    The unix time of the line's timestamp prefix, and the line without it. None if it has no prefix
+    """
+    match = LOG_TIMESTAMP_PATTERN.match(line)
+    if not match:
+        return None, line
+    zone = "+00:00" if match.group("zone") == "Z" else match.group("zone")
+    timestamp = datetime.fromisoformat(match.group("seconds") + zone).timestamp()
+    return timestamp + float(match.group("fraction") or 0), line[match.end() :]
+
+
+def parse_emitter_stream(
+    lines: Iterable[str],
+    on_incomplete: Optional[Callable[[str, List[str]], None]] = None,
+) -> Iterator[EmitterSample]:
+    """
+    Incrementally parse a stream of log lines, holding only the current line in memory. Samples are
+    stamped with the time the line was logged, or the time it was read for lines without a timestamp.
+    on_incomplete is called with each rate line that is missing some of the fields, and the missing keys
+    """
+    for line in lines:
+        timestamp, line = split_log_timestamp(line)
+        values = parse_emitter_values(line)
+        if values is None:
+            continue
+        missing = [key for key in EMITTER_STAT_KEYS if key not in values]
+        if missing and on_incomplete:
+            on_incomplete(line, missing)
+        sample = emitter_sample(values, time.time() if timestamp is None else timestamp)
+        if sample:
+            yield sample
+
+
+@dataclass
+class IncompleteLines:
+    """
+    Counts the emitter's rate lines that are missing fields, and logs the first one
+    """
+
+    label: str
+    count: int = 0
+
+    def __call__(self, line: str, missing: List[str]) -> None:
+        if not self.count:
+            print(
+                f"[{self.label}] Could not parse {', '.join(missing)} from the emitter's rate line, "
+                f"recording it as missing: {line.strip()}",
+                flush=True,
+            )
+        self.count += 1
+
+
+def wait_for_pod_started(
+    cluster: Cluster,
+    pod_name: str = LOADTEST_POD_NAME,
+    timeout_secs: int = 600,
+    poll_interval_secs: float = 2.0,
+) -> None:
+    """
+    Wait until the pod has left Pending, so that its log can be followed
+    """
+    deadline = time.time() + timeout_secs
+    while True:
+        try:
+            phase = core_v1_api(cluster).read_namespaced_pod(pod_name, NAMESPACE).status.phase
+        except Exception as e:
+            if getattr(e, "status", None) != 404:
+                raise
+            phase = None
+        if phase not in (None, "Pending"):
+            return
+        if time.time() > deadline:
+            raise TimeoutError(f"Pod {pod_name} did not start within {timeout_secs}s")
+        time.sleep(poll_interval_secs)
+
+
+def follow_pod_log(cluster: Cluster, pod_name: str = LOADTEST_POD_NAME) -> Iterator[str]:
+    """
+    Follow the pod's log until the pod exits, yielding one line at a time, prefixed with the time it was logged
+    """
+    from kubernetes import watch
+
+    yield from watch.Watch().stream(
+        core_v1_api(cluster).read_namespaced_pod_log,
+        name=pod_name,
+        namespace=NAMESPACE,
+        follow=True,
+        timestamps=True,
+    )
+
+
+def samples_name(cluster: Cluster, pod_name: str = LOADTEST_POD_NAME) -> str:
+    """
+    Name of the emitter's time series. A cluster's single emitter is named after the cluster
+    """
+    if pod_name == LOADTEST_POD_NAME:
+        return cluster.value
+    return f"{cluster.value}-{pod_name}"
+
+
+def samples_path(
+    results_directory: str, run_id: str, cluster: Cluster, pod_name: str = LOADTEST_POD_NAME
+) -> str:
+    return f"{results_directory}/{run_id}/{samples_name(cluster, pod_name)}.csv"
+
+
+def write_samples(samples: Iterable[EmitterSample], out: IO[str]) -> int:
+    """
+    Write each sample as a CSV row as soon as it is parsed. Returns the number of samples written
+    """
+    writer = csv.DictWriter(out, fieldnames=SAMPLE_FIELDS)
+    writer.writeheader()
+    count = 0
+    for sample in samples:
+        writer.writerow(asdict(sample))
+        out.flush()
+        count += 1
+    return count
+
+
+def collect_cluster_samples(
+    cluster: Cluster, run_id: str, results_directory: str, pod_name: str = LOADTEST_POD_NAME
+) -> str:
+    """
+    Follow the cluster's emitter pod log and write its time series. Returns the path of the time series
+    """
+    path = samples_path(results_directory, run_id, cluster, pod_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    wait_for_pod_started(cluster, pod_name)
+    incomplete = IncompleteLines(samples_name(cluster, pod_name))
+    with open(path, "w", newline="") as out:
+        count = write_samples(
+            parse_emitter_stream(follow_pod_log(cluster, pod_name), incomplete), out
+        )
+    print(f"[{cluster.value}] wrote {count} samples to {path}")
+    if incomplete.count:
+        print(f"[{cluster.value}] {incomplete.count} of the emitter's rate lines were missing fields")
+    return path
+
+
+def loadtest_pod_names(cluster: Cluster, run_id: str) -> List[str]:
+    """
+    The emitter pods of the run in the cluster, falling back to every loadtest pod for runs applied without a run id label
+    """
+    api = core_v1_api(cluster)
+    for label_selector in (
+        f"app={LOADTEST_POD_NAME},run-id={run_id}",
+        f"app={LOADTEST_POD_NAME}",
+    ):
+        pods = api.list_namespaced_pod(NAMESPACE, label_selector=label_selector).items
+        if pods:
+            return sorted(pod.metadata.name for pod in pods)
+    return [LOADTEST_POD_NAME]
+
+
+def collect_cluster_run_samples(
+    cluster: Cluster,
+    run_id: str,
+    results_directory: str,
+    pod_names: Optional[List[str]] = None,
+) -> Dict[str, str]:
+    """
+    Follow the logs of all of the run's emitter pods in the cluster at once. Returns the path of each emitter's time series
+    """
+    pod_names = pod_names or loadtest_pod_names(cluster, run_id)
+    with ThreadPoolExecutor(max_workers=len(pod_names)) as executor:
+        paths = executor.map(
+            lambda pod_name: collect_cluster_samples(
+                cluster, run_id, results_directory, pod_name
+            ),
+            pod_names,
+        )
+        return {
+            samples_name(cluster, pod_name): path
+            for pod_name, path in zip(pod_names, paths)
+        }
+
+
+def read_samples(path: str) -> Iterator[EmitterSample]:
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            yield EmitterSample(**{key: float(value) for key, value in row.items()})
@@ -0,0 +1,179 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from constants import Cluster, NAMESPACE, apps_v1_api, core_v1_api
+from multicluster import run_on_clusters
+
+# era-scoped resources carry a -e{era} suffix after their role, e.g. aptos-node-0-genesis-e7 or aptos-node-0-fullnode-e7
+ERA_NAME_PATTERN = re.compile(
+    r"(?:^|-)(?P<marker>genesis|validator|fullnode)-e(?P<era>\d+)(?=-|$)"
+)
+
+
+def parse_era(name: str, markers: Tuple[str, ...]) -> Optional[str]:
+    """
+    Get the era of the resource name if it is scoped to an era by one of the given markers
+    """
+    for match in ERA_NAME_PATTERN.finditer(name):
+        if match.group("marker") in markers:
+            return match.group("era")
+    return None
+
+
+@dataclass
+class EraResourceKind:
+    name: str
+    markers: Tuple[str, ...]
+    list_names: Callable[[Cluster], List[str]]
+    delete: Callable[[Cluster, str], None]
+
+
+ERA_RESOURCE_KINDS = [
+    EraResourceKind(
+        name="secret",
+        markers=("genesis",),
+        list_names=lambda cluster: [
+            secret.metadata.name
+            for secret in core_v1_api(cluster).list_namespaced_secret(NAMESPACE).items
+        ],
+        delete=lambda cluster, name: core_v1_api(cluster).delete_namespaced_secret(
+            name, NAMESPACE
+        ),
+    ),
+    EraResourceKind(
+        name="pvc",
+        markers=("validator", "fullnode"),
+        list_names=lambda cluster: [
+            pvc.metadata.name
+            for pvc in core_v1_api(cluster)
+            .list_namespaced_persistent_volume_claim(NAMESPACE)
+            .items
+        ],
+        delete=lambda cluster, name: core_v1_api(
+            cluster
+        ).delete_namespaced_persistent_volume_claim(name, NAMESPACE),
+    ),
+    EraResourceKind(
+        name="statefulset",
+        markers=("fullnode",),
+        list_names=lambda cluster: [
+            stateful_set.metadata.name
+            for stateful_set in apps_v1_api(cluster)
+            .list_namespaced_stateful_set(NAMESPACE)
+            .items
+        ],
+        delete=lambda cluster, name: apps_v1_api(
+            cluster
+        ).delete_namespaced_stateful_set(name, NAMESPACE),
+    ),
+]
+
+
+@dataclass
+class EraCleanupResult:
+    cluster: Cluster
+    deleted: Dict[str, List[str]] = field(default_factory=dict)
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+    duration_secs: float = 0.0
+
+
+def clean_cluster_previous_eras(
+    cluster: Cluster,
+    era: str,
+    executor: ThreadPoolExecutor,
+    dry_run: bool = False,
+) -> EraCleanupResult:
+    """
+    List each resource kind once, and delete everything scoped to an era other than the given one.
+    Deletes for a kind are submitted as soon as its list returns
+    """
+    start_time = time.time()
+    result = EraCleanupResult(cluster=cluster)
+
+    list_futures = {
+        executor.submit(kind.list_names, cluster): kind for kind in ERA_RESOURCE_KINDS
+    }
+    delete_futures = {}
+    for list_future in as_completed(list_futures):
+        kind = list_futures[list_future]
+        result.deleted[kind.name] = []
+        try:
+            names = list_future.result()
+        except Exception as e:
+            result.failed.append((f"list {kind.name}", str(e)))
+            continue
+        for name in names:
+            resource_era = parse_era(name, kind.markers)
+            if resource_era is None or resource_era == str(era):
+                continue
+            if dry_run:
+                result.deleted[kind.name].append(name)
+                continue
+            delete_futures[executor.submit(kind.delete, cluster, name)] = (kind, name)
+
+    for delete_future in as_completed(delete_futures):
+        kind, name = delete_futures[delete_future]
+        try:
+            delete_future.result()
+            result.deleted[kind.name].append(name)
+        except Exception as e:
+            result.failed.append((f"delete {kind.name} {name}", str(e)))
+
+    result.duration_secs = time.time() - start_time
+    return result
+
+
+def clean_previous_eras(
+    clusters: List[Cluster],
+    era: str,
+    parallelism: int = 16,
+    dry_run: bool = False,
+) -> List[EraCleanupResult]:
+    """
+    Clean up previous era resources from all given clusters concurrently, with at most
+    `parallelism` list and delete requests in flight
+    """
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        cluster_results = run_on_clusters(
+            lambda cluster: clean_cluster_previous_eras(
+                cluster, era, executor, dry_run
+            ),
+            clusters,
+        )
+    return [
+        cluster_result.value
+        if cluster_result.ok
+        else EraCleanupResult(
+            cluster=cluster,
+            failed=[("cleanup", str(cluster_result.error))],
+            duration_secs=cluster_result.duration_secs,
+        )
+        for cluster, cluster_result in cluster_results.items()
+    ]
+
+
+def print_era_cleanup_results(
+    results: List[EraCleanupResult], dry_run: bool = False
+) -> bool:
+    """
+    Print a per-cluster summary of the cleanup. Returns whether every delete succeeded
+    """
+    prefix = "[DRY RUN] would delete" if dry_run else "deleted"
+    ok = True
+    for result in results:
+        for kind, names in sorted(result.deleted.items()):
+            for name in sorted(names):
+                print(f"[{result.cluster.value}] {prefix} {kind} {name}")
+        counts = ", ".join(
+            f"{len(names)} {kind}" for kind, names in sorted(result.deleted.items())
+        )
+        print(
+            f"[{result.cluster.value}] {prefix} {counts}, {len(result.failed)} failed ({result.duration_secs:.2f}s)"
+        )
+        for name, error in result.failed:
+            print(f"[{result.cluster.value}] Failed {name}: {error}")
+            ok = False
+    return ok
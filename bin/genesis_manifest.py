@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import yaml
+
+from constants import GENESIS_DIRECTORY
+
+# records the inputs of the last successful genesis, so unchanged nodes can be skipped
+GENESIS_MANIFEST_FILE = f"{GENESIS_DIRECTORY}/manifest.json"
+GENESIS_OUTPUT_FILES = ["genesis.blob", "waypoint.txt"]
+
+
+@dataclass
+class GenesisManifest:
+    layout: str = ""
+    nodes: Dict[str, str] = field(default_factory=dict)
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_layout(layout: dict) -> str:
+    return sha256_hex(yaml.dump(layout, default_flow_style=False).encode())
+
+
+def hash_node_inputs(
+    node_username: str, validator_host: str, fullnode_host: str, stake_amount: int
+) -> str:
+    """
+    Hash everything set-validator-configuration reads for the node: its public keys, hosts and stake
+    """
+    with open(f"{GENESIS_DIRECTORY}/{node_username}/public-keys.yaml", "rb") as f:
+        public_keys = f.read()
+    return sha256_hex(
+        public_keys
+        + json.dumps([validator_host, fullnode_host, stake_amount]).encode()
+    )
+
+
+def load_genesis_manifest() -> GenesisManifest:
+    try:
+        with open(GENESIS_MANIFEST_FILE, "r") as f:
+            return GenesisManifest(**json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError, TypeError):
+        return GenesisManifest()
+
+
+def save_genesis_manifest(manifest: GenesisManifest) -> None:
+    with open(GENESIS_MANIFEST_FILE, "w") as f:
+        json.dump({"layout": manifest.layout, "nodes": manifest.nodes}, f, indent=2)
+
+
+def changed_nodes(previous: GenesisManifest, current: GenesisManifest) -> List[str]:
+    """
+    Nodes whose inputs changed since the previous manifest, or whose configuration is missing on disk
+    """
+    return [
+        node_username
+        for node_username, node_hash in current.nodes.items()
+        if previous.nodes.get(node_username) != node_hash
+        or not os.path.exists(f"{GENESIS_DIRECTORY}/{node_username}/operator.yaml")
+    ]
+
+
+def genesis_up_to_date(previous: GenesisManifest, current: GenesisManifest) -> bool:
+    """
+    Whether the layout and every node are unchanged, and the genesis outputs are still on disk
+    """
+    return (
+        previous.layout == current.layout
+        and previous.nodes == current.nodes
+        and all(
+            os.path.exists(f"{GENESIS_DIRECTORY}/{output_file}")
+            for output_file in GENESIS_OUTPUT_FILES
+        )
+    )
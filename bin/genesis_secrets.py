@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import yaml
+
+from constants import Cluster, GENESIS_DIRECTORY, NAMESPACE, core_v1_api
+
+# field manager for server-side apply, and the annotation holding the hash of the secret data
+FIELD_MANAGER = "aptos-multi-region-bench"
+CONTENT_HASH_ANNOTATION = "aptos-multi-region-bench/content-hash"
+
+
+@dataclass
+class SecretUploadResult:
+    cluster: Cluster
+    applied: List[str]
+    unchanged: List[str]
+    failed: List[Tuple[str, str]]
+    duration_secs: float
+
+
+def genesis_secret_name(node_username: str, era: str) -> str:
+    return f"{node_username}-genesis-e{era}"
+
+
+def read_file_b64(path: str) -> str:
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+
+def build_genesis_secret(node_username: str, era: str, shared_data: Dict[str, str]) -> dict:
+    """
+    Build the genesis secret for the node, in the same shape as `kubectl create secret generic --dry-run=client -o yaml`
+    """
+    return {
+        "apiVersion": "v1",
+        "data": {
+            **shared_data,
+            "validator-identity.yaml": read_file_b64(
+                f"{GENESIS_DIRECTORY}/{node_username}/validator-identity.yaml"
+            ),
+            "validator-full-node-identity.yaml": read_file_b64(
+                f"{GENESIS_DIRECTORY}/{node_username}/validator-full-node-identity.yaml"
+            ),
+        },
+        "kind": "Secret",
+        "metadata": {
+            "creationTimestamp": None,
+            "name": genesis_secret_name(node_username, era),
+        },
+    }
+
+
+def build_genesis_secrets(cluster: Cluster, num_nodes: int, era: str) -> List[dict]:
+    # genesis.blob and waypoint.txt are the same for every node, so only read them once
+    shared_data = {
+        "genesis.blob": read_file_b64(f"{GENESIS_DIRECTORY}/genesis.blob"),
+        "waypoint.txt": read_file_b64(f"{GENESIS_DIRECTORY}/waypoint.txt"),
+    }
+    return [
+        build_genesis_secret(f"{cluster.value}-aptos-node-{i}", era, shared_data)
+        for i in range(num_nodes)
+    ]
+
+
+def genesis_secrets_yaml(secrets: List[dict]) -> str:
+    """
+    The YAML bundle of the given secrets, one document per secret
+    """
+    return "".join(f"{yaml.dump(secret)}---\n" for secret in secrets)
+
+
+def secret_content_hash(secret: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(secret["data"], sort_keys=True).encode()
+    ).hexdigest()
+
+
+def apply_genesis_secrets(
+    cluster: Cluster, secrets: List[dict], parallelism: int
+) -> SecretUploadResult:
+    """
+    Server-side apply the secrets to the cluster, skipping those whose content hash annotation already matches
+    """
+    start_time = time.time()
+    core_client = core_v1_api(cluster)
+    existing_hashes = {
+        secret.metadata.name: (secret.metadata.annotations or {}).get(
+            CONTENT_HASH_ANNOTATION
+        )
+        for secret in core_client.list_namespaced_secret(NAMESPACE).items
+    }
+
+    def apply_secret(secret: dict) -> None:
+        name = secret["metadata"]["name"]
+        body = {
+            **secret,
+            "metadata": {
+                "name": name,
+                "namespace": NAMESPACE,
+                "annotations": {CONTENT_HASH_ANNOTATION: secret_content_hash(secret)},
+            },
+        }
+        core_client.patch_namespaced_secret(
+            name,
+            NAMESPACE,
+            body,
+            field_manager=FIELD_MANAGER,
+            force=True,
+            _content_type="application/apply-patch+yaml",
+        )
+
+    changed = []
+    unchanged = []
+    for secret in secrets:
+        name = secret["metadata"]["name"]
+        if existing_hashes.get(name) == secret_content_hash(secret):
+            unchanged.append(name)
+        else:
+            changed.append(secret)
+
+    applied = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        futures = [(secret, executor.submit(apply_secret, secret)) for secret in changed]
+        for secret, future in futures:
+            name = secret["metadata"]["name"]
+            try:
+                future.result()
+                applied.append(name)
+            except Exception as e:
+                failed.append((name, str(e)))
+
+    return SecretUploadResult(
+        cluster=cluster,
+        applied=applied,
+        unchanged=unchanged,
+        failed=failed,
+        duration_secs=time.time() - start_time,
+    )
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+from constants import Cluster, YAML_LOADER, settings
+from genesis_manifest import sha256_hex
+
+# rendered manifests, keyed by cluster and render key
+HELM_RENDER_CACHE_DIRECTORY = ".cache/helm"
+
+
+def hash_chart_directory(helm_chart_directory: str) -> str:
+    """
+    Hash the path and contents of every file in the chart, including its subcharts
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(helm_chart_directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, helm_chart_directory).encode() + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def render_key(
+    cluster: Cluster, helm_chart_directory: str, values_file: str, overrides: List[str]
+) -> str:
+    """
+    Hash every input of the cluster's helm template: release name, chart, values file and overrides
+    """
+    with open(values_file, "rb") as f:
+        values = f.read()
+    return sha256_hex(
+        json.dumps(
+            [
+                cluster.value,
+                hash_chart_directory(helm_chart_directory),
+                sha256_hex(values),
+                overrides,
+            ]
+        ).encode()
+    )
+
+
+def render_manifest(
+    cluster: Cluster, helm_chart_directory: str, values_file: str, overrides: List[str]
+) -> Tuple[str, bool]:
+    """
+    The cluster's rendered helm template, from the cache if its inputs are unchanged.
+    Returns the manifest, and whether it came from the cache
+    """
+    key = render_key(cluster, helm_chart_directory, values_file, overrides)
+    cache_file = f"{HELM_RENDER_CACHE_DIRECTORY}/{cluster.value}-{key}.yaml"
+    try:
+        with open(cache_file, "r") as f:
+            return f.read(), True
+    except FileNotFoundError:
+        pass
+
+    proc = subprocess.run(
+        [
+            "helm",
+            f"--kube-context={settings.kube_contexts[cluster]}",
+            "template",
+            cluster.value,
+            helm_chart_directory,
+            f"-f={values_file}",
+            *overrides,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise Exception(f"helm template failed: {proc.stderr.strip()}")
+
+    # drop the cluster's older renders, so the cache holds one manifest per cluster
+    os.makedirs(HELM_RENDER_CACHE_DIRECTORY, exist_ok=True)
+    for name in os.listdir(HELM_RENDER_CACHE_DIRECTORY):
+        if name.startswith(f"{cluster.value}-") and len(name) == len(os.path.basename(cache_file)):
+            os.remove(f"{HELM_RENDER_CACHE_DIRECTORY}/{name}")
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        f.write(proc.stdout)
+    os.replace(tmp_file, cache_file)
+    return proc.stdout, False
+
+
+def object_key(obj: dict) -> str:
+    metadata = obj.get("metadata") or {}
+    return "/".join(
+        [
+            obj.get("apiVersion", ""),
+            obj.get("kind", ""),
+            metadata.get("namespace", ""),
+            metadata.get("name", ""),
+        ]
+    )
+
+
+def parse_manifest(manifest: str) -> Dict[str, dict]:
+    """
+    The manifest's objects, keyed by api version, kind, namespace and name
+    """
+    return {
+        object_key(obj): obj
+        for obj in yaml.load_all(manifest, Loader=YAML_LOADER)
+        if obj
+    }
+
+
+def hash_object(obj: dict) -> str:
+    return sha256_hex(json.dumps(obj, sort_keys=True, default=str).encode())
+
+
+def applied_state_file(cluster: Cluster) -> str:
+    return f"{HELM_RENDER_CACHE_DIRECTORY}/{cluster.value}-applied.json"
+
+
+def load_applied_state(cluster: Cluster) -> Dict[str, str]:
+    """
+    The hash of each object of the cluster's last applied render
+    """
+    try:
+        with open(applied_state_file(cluster), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_applied_state(cluster: Cluster, state: Dict[str, str]) -> None:
+    os.makedirs(HELM_RENDER_CACHE_DIRECTORY, exist_ok=True)
+    state_file = applied_state_file(cluster)
+    tmp_file = f"{state_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, state_file)
+
+
+def forget_applied_state(cluster: Cluster) -> None:
+    """
+    Apply every object on the cluster's next upgrade, e.g. after its resources were deleted
+    """
+    try:
+        os.remove(applied_state_file(cluster))
+    except FileNotFoundError:
+        pass
+
+
+@dataclass
+class ManifestDiff:
+    objects: Dict[str, dict]
+    # object key -> hash, of every object in the render
+    state: Dict[str, str]
+    changed: List[str] = field(default_factory=list)
+    # in the last applied render, but no longer rendered
+    removed: List[str] = field(default_factory=list)
+
+
+def diff_manifest(
+    objects: Dict[str, dict], applied: Optional[Dict[str, str]]
+) -> ManifestDiff:
+    """
+    The objects that are new or changed since the last applied render. Every object with no applied render
+    """
+    state = {key: hash_object(obj) for key, obj in objects.items()}
+    applied = applied or {}
+    return ManifestDiff(
+        objects=objects,
+        state=state,
+        changed=[key for key, obj_hash in state.items() if applied.get(key) != obj_hash],
+        removed=sorted(set(applied) - set(state)),
+    )
+
+
+def manifest_objects(diff: ManifestDiff, keys: List[str]) -> str:
+    return yaml.dump_all([diff.objects[key] for key in keys], default_flow_style=False)
+
+
+def record_applied_objects(cluster: Cluster, diff: ManifestDiff, keys: List[str]) -> None:
+    """
+    Record the given objects of the render as applied, keeping the rest of the last applied render
+    """
+    state = load_applied_state(cluster)
+    state.update({key: diff.state[key] for key in keys})
+    save_applied_state(cluster, state)
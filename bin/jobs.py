@@ -0,0 +1,143 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+
+
+@dataclass
+class Job:
+    name: str
+    # a shell string if shell=True, otherwise an argv list
+    args: Union[str, Sequence[str]]
+    log_file: str
+    shell: bool = False
+
+
+@dataclass
+class JobResult:
+    job: Job
+    returncode: int
+    attempts: int
+    duration_secs: float
+
+
+class JobProgress:
+    """
+    Thread-safe done/running/failed counters, printed on a single line as jobs change state
+    """
+
+    def __init__(self, label: str, total: int) -> None:
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.running = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._tty = sys.stdout.isatty()
+
+    def _print(self) -> None:
+        line = f"[{self.label}] done: {self.done}/{self.total}, running: {self.running}, failed: {self.failed}"
+        if self._tty:
+            print(f"\r{line}", end="", flush=True)
+        elif self.running == 0 and self.done + self.failed == self.total:
+            print(line, flush=True)
+
+    def start(self) -> None:
+        with self._lock:
+            self.running += 1
+            self._print()
+
+    def finish(self, ok: bool) -> None:
+        with self._lock:
+            self.running -= 1
+            if ok:
+                self.done += 1
+            else:
+                self.failed += 1
+            self._print()
+
+    def close(self) -> None:
+        if self._tty:
+            print()
+
+
+def run_job(job: Job, retries: int, progress: JobProgress) -> JobResult:
+    """
+    Run the job, retrying up to `retries` times. All output is streamed to the job's log file
+    """
+    os.makedirs(os.path.dirname(job.log_file) or ".", exist_ok=True)
+    progress.start()
+    start_time = time.time()
+    returncode = -1
+    attempts = 0
+    with open(job.log_file, "w") as log:
+        while attempts <= retries:
+            attempts += 1
+            log.write(f"=== attempt {attempts}: {job.args}\n")
+            log.flush()
+            returncode = subprocess.run(
+                job.args,
+                shell=job.shell,
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                text=True,
+            ).returncode
+            if returncode == 0:
+                break
+        log.write(
+            f"=== exit {returncode} after {attempts} attempts in {time.time() - start_time:.2f}s\n"
+        )
+    progress.finish(returncode == 0)
+    return JobResult(
+        job=job,
+        returncode=returncode,
+        attempts=attempts,
+        duration_secs=time.time() - start_time,
+    )
+
+
+def run_jobs(
+    label: str,
+    jobs: List[Job],
+    concurrency: Optional[int] = None,
+    retries: int = 0,
+) -> List[JobResult]:
+    """
+    Run the jobs with at most `concurrency` (default: CPU count) subprocesses at a time.
+    Results are returned in the same order as the jobs
+    """
+    if not jobs:
+        return []
+    progress = JobProgress(label, len(jobs))
+    with ThreadPoolExecutor(max_workers=concurrency or os.cpu_count() or 1) as executor:
+        results = list(executor.map(lambda job: run_job(job, retries, progress), jobs))
+    progress.close()
+    return results
+
+
+def check_job_results(label: str, results: List[JobResult]) -> None:
+    """
+    Print a timing summary and the log of every failed job, exiting if any job failed
+    """
+    if results:
+        slowest = max(results, key=lambda result: result.duration_secs)
+        total = sum(result.duration_secs for result in results)
+        print(
+            f"[{label}] {len(results)} jobs, mean {total / len(results):.2f}s, "
+            f"slowest {slowest.job.name} {slowest.duration_secs:.2f}s"
+        )
+    failed = [result for result in results if result.returncode != 0]
+    for result in failed:
+        print(
+            f"[{label}] {result.job.name} failed after {result.attempts} attempts "
+            f"(exit {result.returncode}, {result.duration_secs:.2f}s). Log: {result.job.log_file}"
+        )
+        with open(result.job.log_file, "r") as log:
+            print(log.read())
+    if failed:
+        raise SystemExit(1)
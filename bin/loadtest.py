@@ -1,24 +1,57 @@
 #!/usr/bin/env python3
 
-import subprocess
-from typing import List, Optional, Sequence, Tuple, TypedDict
+import copy
+import hashlib
+import json
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypedDict
 
 import click
 import yaml
-from cluster import get_validator_fullnode_hosts
+from cluster import (
+    discover_validator_fullnode_hosts,
+    MissingHostsError,
+    ValidatorFullnodeHosts,
+)
 from constants import (
+    Cluster,
     CLUSTERS,
-    KUBE_CONTEXTS,
+    cluster_by_name,
+    HOST_CACHE_TTL_SECS,
+    LOADTEST_RESULTS_DIRECTORY,
     LOADTEST_POD_SPEC,
     LOADTEST_POD_NAME,
     LOADTEST_CLUSTERS,
+    REST_API_PORT,
+    settings,
+    YAML_LOADER,
+)
+from emitter_resources import ResourceSampler
+from emitter_stats import collect_cluster_run_samples, loadtest_pod_names, read_samples
+from loadtest_pods import (
+    create_loadtest_pods,
+    delete_loadtest_pods,
+    running_spec_hashes,
+    SPEC_HASH_ANNOTATION,
+)
+from multicluster import print_prefixed, run_on_clusters
+from target_planner import load_rtt_matrix, plan_targets, TargetPlan
+from target_probe import (
+    filter_probe_results,
+    probe_available,
+    probe_targets,
+    PROBE_DEPENDENCY_ERROR,
+    TargetFilter,
 )
-
-REST_API_PORT = 8080
 
 
 class Metadata(TypedDict):
     name: str
+    labels: Dict[str, str]
+    annotations: Dict[str, str]
 
 
 class Env(TypedDict):
@@ -44,7 +77,12 @@ class PodTemplate(TypedDict):
     spec: Spec
 
 
-def build_pod_template() -> PodTemplate:
+# default emitter pod size
+EMITTER_CPU = "16"
+EMITTER_MEMORY = "16Gi"
+
+
+def build_pod_template(cpu: str = EMITTER_CPU, memory: str = EMITTER_MEMORY) -> PodTemplate:
     return {
         "apiVersion": "v1",
         "kind": "Pod",
@@ -72,12 +110,12 @@ def build_pod_template() -> PodTemplate:
                     # is not the bottleneck
                     "resources": {
                         "requests": {
-                            "cpu": "16",
-                            "memory": "16Gi",
+                            "cpu": cpu,
+                            "memory": memory,
                         },
                         "limits": {
-                            "cpu": "16",
-                            "memory": "16Gi",
+                            "cpu": cpu,
+                            "memory": memory,
                         },
                     },
                 }
@@ -94,6 +132,37 @@ class LoadTestConfig(TypedDict):
     duration: int
     mempool_backlog: int
     txn_expiration_time_secs: int
+    # emitter pods in each loadtest cluster, which split the cluster's load and targets
+    emitters_per_cluster: int
+    # seed of the emitter's accounts, so that emitters sharing a mint key use disjoint accounts
+    account_minter_seed: Optional[str]
+    delay_after_minting: int
+    # unix time at which every emitter starts minting, so all clusters measure over the same window
+    start_at: Optional[int]
+    emitter_cpu: str
+    emitter_memory: str
+
+
+# upper bound of a single emitter's TPS, to size its accounts when it has no target TPS
+EMITTER_MAX_TPS = 20000
+# time for every cluster's emitter pods to be scheduled and pull their image before the shared start
+LOADTEST_START_DELAY_SECS = 120
+# settling time after minting on top of the txn expiration, by which every minting txn has committed or expired
+MINTING_SETTLE_MARGIN_SECS = 10
+# sleeps until $LOADTEST_START_AT, then runs its arguments
+START_BARRIER_SCRIPT = 'delay=$((LOADTEST_START_AT - $(date +%s))); if [ "$delay" -gt 0 ]; then sleep "$delay"; fi; exec "$@"'
+
+
+def default_delay_after_minting(txn_expiration_time_secs: int) -> int:
+    """
+    Minting in every cluster starts at the same time, so after minting the emitter only needs to wait
+    for its own minting txns to commit or expire
+    """
+    return txn_expiration_time_secs + MINTING_SETTLE_MARGIN_SECS
+
+
+def expected_max_txns(loadtestConfig: LoadTestConfig) -> int:
+    return (loadtestConfig["target_tps"] or EMITTER_MAX_TPS) * loadtestConfig["duration"]
 
 
 def build_loadtest_command(
@@ -111,10 +180,15 @@ def build_loadtest_command(
             else f"--mempool-backlog={loadtestConfig['mempool_backlog']}"
         ],
         f"--duration={loadtestConfig['duration']}",
-        f"--delay-after-minting=300",
-        f"--expected-max-txns={20000 * loadtestConfig['duration']}",
+        f"--delay-after-minting={loadtestConfig['delay_after_minting']}",
+        f"--expected-max-txns={expected_max_txns(loadtestConfig)}",
         "--txn-expiration-time-secs=" f"{loadtestConfig['txn_expiration_time_secs']}",
         "--max-transactions-per-account=5",
+        *(
+            [f"--account-minter-seed={loadtestConfig['account_minter_seed']}"]
+            if loadtestConfig.get("account_minter_seed")
+            else []
+        ),
         *(
             ["--transaction-type", "coin-transfer"]
             if loadtestConfig["coin_transfer"]
@@ -134,99 +208,621 @@ def configure_loadtest(
     template: PodTemplate,
     loadtestConfig: LoadTestConfig,
 ) -> PodTemplate:
-    pod = PodTemplate(template)
-    pod["spec"]["containers"][0]["command"] = build_loadtest_command(loadtestConfig)
-    print(" ".join(pod["spec"]["containers"][0]["command"]))
+    pod = copy.deepcopy(template)
+    container = pod["spec"]["containers"][0]
+    container["command"] = build_loadtest_command(loadtestConfig)
+    if loadtestConfig.get("start_at"):
+        container["env"].append(
+            {"name": "LOADTEST_START_AT", "value": str(loadtestConfig["start_at"])}
+        )
+        container["command"] = [
+            "/bin/sh",
+            "-c",
+            START_BARRIER_SCRIPT,
+            LOADTEST_POD_NAME,
+            *container["command"],
+        ]
     return pod
 
 
-def automatically_determine_targets(clusters: List[str]) -> List[str]:
-    """
-    Automatically determine the targets to use for load testing.
-    TODO: implement some target filtering
-    """
-    targets = []
-    for cluster in clusters:
-        validator_fullnode_hosts_cluster_list = get_validator_fullnode_hosts(cluster)
-        for host in validator_fullnode_hosts_cluster_list:
-            targets.append(f"http://{host.validator_host}:{REST_API_PORT}")
-            # targets.append(f"http://{host.fullnode_host}:{REST_API_PORT}")
-
-    return targets
-
-
-def apply_spec(delete=False, only_asia=False) -> None:
-    """Delete the existing loadtest pod and apply the new spec. If delete=True, then just do the delete"""
-    # For each cluster
-    # TODO: implement some target cluster filtering
-    procs: List[subprocess.Popen] = []
-    for cluster in CLUSTERS:
-        spec_file = f"{cluster.value}_{LOADTEST_POD_SPEC}"
-
-        print(f"Applying loadtest spec to {cluster}...")
-        cluster_kube_config = KUBE_CONTEXTS[cluster]
-        procs.append(
-            subprocess.Popen(
-                [
-                    "kubectl",
-                    "--context",
-                    cluster_kube_config,
-                    "delete",
-                    "pod",
-                    LOADTEST_POD_NAME,
-                    "--ignore-not-found",
-                    "--force",
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
+def emitter_pod_name(shard: int, shards: int) -> str:
+    """
+    A cluster's only emitter keeps the plain loadtest pod name
+    """
+    return LOADTEST_POD_NAME if shards == 1 else f"{LOADTEST_POD_NAME}-{shard}"
+
+
+def shard_targets(targets: List[str], shards: int) -> List[Tuple[List[str], float]]:
+    """
+    Split the targets, weighted by repetition, between the shards. Each shard gets every Nth distinct target
+    with all its copies. With more shards than distinct targets, shards share targets. Returns each shard's
+    targets and its share of the cluster's load, in proportion to the copies it holds
+    """
+    # distinct targets in their first occurrence order -> copies
+    copies = Counter(targets)
+    distinct = list(copies)
+    assigned = [
+        distinct[shard::shards] or [distinct[shard % len(distinct)]] for shard in range(shards)
+    ]
+    holders = Counter(target for shard_distinct in assigned for target in shard_distinct)
+    return [
+        (
+            [target for target in shard_distinct for _ in range(copies[target])],
+            sum(copies[target] / holders[target] for target in shard_distinct) / len(targets),
         )
-        if delete or (only_asia and cluster not in LOADTEST_CLUSTERS):
-            print(f"Skipping cluster {cluster}")
-            continue
-        procs.append(
-            subprocess.Popen(
-                [
-                    "kubectl",
-                    "--context",
-                    cluster_kube_config,
-                    "apply",
-                    "-f",
-                    spec_file,
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
+        for shard_distinct in assigned
+    ]
+
+
+def apportion(total: int, shares: List[float]) -> List[int]:
+    """
+    Split total in proportion to the shares, by largest remainder, so the parts add up to total
+    """
+    exact = [total * share for share in shares]
+    parts = [math.floor(part) for part in exact]
+    by_remainder = sorted(range(len(exact)), key=lambda i: parts[i] - exact[i])
+    for i in by_remainder[: total - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+def shard_loadtest_config(
+    cluster: Cluster, loadtestConfig: LoadTestConfig, shard: int
+) -> LoadTestConfig:
+    """
+    The config of one of the cluster's emitter pods, with its own accounts. Each emitter gets every Nth
+    distinct target with all its copies, and the share of the cluster's TPS and mempool backlog that
+    those copies make up, so the weighting by repetition holds across the whole cluster
+    """
+    shards = loadtestConfig["emitters_per_cluster"]
+    if shards == 1:
+        return loadtestConfig
+    split = shard_targets(list(loadtestConfig["targets"]), shards)
+    shares = [share for _, share in split]
+    return {
+        **loadtestConfig,
+        "targets": split[shard][0],
+        "target_tps": loadtestConfig["target_tps"]
+        and max(1, apportion(loadtestConfig["target_tps"], shares)[shard]),
+        "mempool_backlog": max(
+            1, apportion(loadtestConfig["mempool_backlog"], shares)[shard]
+        ),
+        "account_minter_seed": hashlib.sha256(
+            f"{cluster.value}-{shard}".encode()
+        ).hexdigest(),
+    }
+
+
+def build_cluster_pods(
+    cluster: Cluster, loadtestConfig: LoadTestConfig, run_id: str
+) -> List[PodTemplate]:
+    """
+    The cluster's emitter pods, all labelled with the run id. Each pod is built from a fresh template
+    """
+    shards = loadtestConfig["emitters_per_cluster"]
+    pods = []
+    for shard in range(shards):
+        pod = configure_loadtest(
+            build_pod_template(
+                loadtestConfig.get("emitter_cpu", EMITTER_CPU),
+                loadtestConfig.get("emitter_memory", EMITTER_MEMORY),
+            ),
+            shard_loadtest_config(cluster, loadtestConfig, shard),
+        )
+        pod["metadata"]["name"] = emitter_pod_name(shard, shards)
+        pod["metadata"]["labels"] = {"app": LOADTEST_POD_NAME, "run-id": run_id}
+        pods.append(pod)
+    return pods
+
+
+@dataclass(frozen=True)
+class ClusterSpec:
+    cluster: Cluster
+    # hash of the pods, leaving out the run id and start time which change on every run
+    spec_hash: str
+    # YAML of a v1 List of the cluster's emitter pods
+    document: str
+
+    @property
+    def spec_file(self) -> str:
+        return f"{self.cluster.value}_{LOADTEST_POD_SPEC}"
+
+
+def loadtest_spec_hash(cluster: Cluster, loadtestConfig: LoadTestConfig) -> str:
+    pods = build_cluster_pods(cluster, {**loadtestConfig, "start_at": None}, run_id="")
+    return hashlib.sha256(json.dumps(pods, sort_keys=True).encode()).hexdigest()
+
+
+def build_cluster_spec(
+    cluster: Cluster, loadtestConfig: LoadTestConfig, run_id: str
+) -> ClusterSpec:
+    spec_hash = loadtest_spec_hash(cluster, loadtestConfig)
+    pods = build_cluster_pods(cluster, loadtestConfig, run_id)
+    for pod in pods:
+        pod["metadata"]["annotations"] = {SPEC_HASH_ANNOTATION: spec_hash}
+        print(" ".join(pod["spec"]["containers"][0]["command"]))
+    return ClusterSpec(
+        cluster=cluster,
+        spec_hash=spec_hash,
+        document=yaml.dump({"apiVersion": "v1", "kind": "List", "items": pods}),
+    )
+
+
+def read_spec_hash(spec_file: str) -> Optional[str]:
+    """
+    The hash of a previously written spec, if there is one
+    """
+    try:
+        with open(spec_file, "r") as f:
+            spec = yaml.load(f, Loader=YAML_LOADER)
+        return spec["items"][0]["metadata"]["annotations"][SPEC_HASH_ANNOTATION]
+    except (FileNotFoundError, KeyError, IndexError, TypeError):
+        return None
+
+
+def cluster_targets(
+    clusters: List[Cluster],
+    hosts: Dict[Cluster, List[ValidatorFullnodeHosts]],
+) -> Dict[Cluster, List[str]]:
+    """
+    The candidate targets of each cluster, from its discovered hosts
+    """
+    return {
+        cluster: [
+            f"http://{host.validator_host}:{REST_API_PORT}"
+            # f"http://{host.fullnode_host}:{REST_API_PORT}"
+            for host in hosts[cluster]
+        ]
+        for cluster in clusters
+    }
+
+
+def automatically_determine_targets(
+    clusters: List[Cluster],
+    hosts: Dict[Cluster, List[ValidatorFullnodeHosts]],
+    target_filter: Optional[TargetFilter] = None,
+) -> List[str]:
+    """
+    Automatically determine the targets to use for load testing, from the discovered hosts of each cluster.
+    With a target filter, only the targets that passed the probe are used
+    """
+    candidates = cluster_targets(clusters, hosts)
+    if target_filter:
+        return target_filter.select(candidates)
+    return [target for targets in candidates.values() for target in targets]
+
+
+def probe_loadtest_targets(
+    hosts: Dict[Cluster, List[ValidatorFullnodeHosts]],
+    max_ledger_lag: int,
+    max_latency_ms: float,
+    fastest_n: Optional[int],
+    weight_by_latency: bool,
+) -> TargetFilter:
+    """
+    Probe the REST API of every discovered target concurrently, and drop the unhealthy, lagging and slow ones.
+    Latency is measured from where this is run, not from the emitter pods
+    """
+    if not probe_available():
+        print(f"{PROBE_DEPENDENCY_ERROR}, or pass --no-probe")
+        raise SystemExit(1)
+    candidates = {
+        target: cluster
+        for cluster, targets in cluster_targets(list(hosts), hosts).items()
+        for target in targets
+    }
+    print(f"Probing {len(candidates)} targets...")
+    filtered = filter_probe_results(
+        probe_targets(candidates), max_ledger_lag, max_latency_ms
+    )
+    for target, reason in sorted(filtered.dropped.items()):
+        print(f"[{candidates[target].value}] Dropping target {target}: {reason}")
+    print(f"{len(filtered.kept)}/{len(candidates)} targets passed the probe")
+    return TargetFilter(
+        probes=filtered.kept, fastest_n=fastest_n, weight_by_latency=weight_by_latency
+    )
+
+
+def check_plan_options(
+    plan_targets: bool, fastest_n: Optional[int], weight_by_latency: bool
+) -> None:
+    """
+    --plan-targets weights the targets itself, from the probe latencies and node capacities
+    """
+    if plan_targets and (fastest_n or weight_by_latency):
+        raise click.UsageError(
+            "--fastest-n and --weight-by-latency can't be combined with --plan-targets"
+        )
+
+
+def plan_loadtest_targets(
+    hosts: Dict[Cluster, List[ValidatorFullnodeHosts]],
+    emitters: List[Cluster],
+    target_filter: Optional[TargetFilter],
+    node_capacity: Sequence[str],
+) -> TargetPlan:
+    """
+    Split the discovered targets among the emitters by region RTT, probe latency and per-node capacity
+    """
+    capacity_by_cluster: Dict[Cluster, float] = {}
+    for entry in node_capacity:
+        cluster_name, _, capacity = entry.partition("=")
+        try:
+            capacity_by_cluster[cluster_by_name(cluster_name)] = float(capacity)
+        except ValueError:
+            print(f"Invalid --node-capacity {entry}, expected <cluster>=<capacity>")
+            raise SystemExit(1)
+    targets = {
+        target: cluster
+        for cluster, cluster_target_list in cluster_targets(list(hosts), hosts).items()
+        for target in cluster_target_list
+    }
+    plan = plan_targets(
+        emitters,
+        targets,
+        load_rtt_matrix(),
+        probes=target_filter.probes if target_filter else None,
+        capacities={
+            target: capacity_by_cluster.get(cluster, 1.0)
+            for target, cluster in targets.items()
+        },
+    )
+    for emitter, emitter_targets in plan.targets.items():
+        distinct_targets = set(emitter_targets)
+        per_cluster = ", ".join(
+            f"{sum(targets[target] == cluster for target in distinct_targets)} in {cluster.value}"
+            for cluster in hosts
+        )
+        print(f"[{emitter.value}] Planned {len(distinct_targets)} targets: {per_cluster}")
+    print(f"Planned mean emitter to target latency: {plan.mean_latency_ms:.1f}ms")
+    return plan
+
+
+def add_options(fn: Callable, options: List[Callable]) -> Callable:
+    for option in reversed(options):
+        fn = option(fn)
+    return fn
+
+
+def emitter_options(fn: Callable) -> Callable:
+    """
+    Options for the transactions the emitters submit, and where they run
+    """
+    options = [
+        click.option(
+            "--txn-expiration-time-secs",
+            type=int,
+            default=60,
+            show_default=True,
+        ),
+        click.option(
+            "--coin-transfer",
+            is_flag=True,
+            default=False,
+            show_default=True,
+        ),
+        click.option(
+            "--only-loadtest-clusters",
+            "--only-asia",
+            is_flag=True,
+            default=False,
+            show_default=True,
+            help="Only run emitters in the clusters with the loadtest role in the cluster registry",
+        ),
+        click.option(
+            "--only-within-cluster",
+            is_flag=True,
+            default=False,
+            show_default=True,
+        ),
+    ]
+    return add_options(fn, options)
+
+
+def host_options(fn: Callable) -> Callable:
+    """
+    Options for discovering the targets' LoadBalancer IPs
+    """
+    options = [
+        click.option(
+            "--refresh",
+            is_flag=True,
+            default=False,
+            show_default=True,
+            help="Ignore the host cache and query the LoadBalancer IPs from each cluster",
+        ),
+        click.option(
+            "--host-cache-ttl",
+            type=int,
+            default=HOST_CACHE_TTL_SECS,
+            show_default=True,
+            help="Maximum age in seconds of cached LoadBalancer IPs",
+        ),
+    ]
+    return add_options(fn, options)
+
+
+def emitter_resource_options(fn: Callable) -> Callable:
+    """
+    Options for the number and size of the emitter pods, and when they start
+    """
+    options = [
+        click.option(
+            "--emitters-per-cluster",
+            type=click.IntRange(min=1),
+            default=1,
+            show_default=True,
+            help="Emitter pods per loadtest cluster. Each gets a share of the cluster's targets, the share of its load they carry, and its own accounts",
+        ),
+        click.option(
+            "--start-delay",
+            type=int,
+            default=LOADTEST_START_DELAY_SECS,
+            show_default=True,
+            help="Seconds from applying until every emitter starts minting at the same time",
+        ),
+        click.option(
+            "--delay-after-minting",
+            type=int,
+            help="Seconds each emitter waits between minting and submitting. Defaults to the txn expiration time plus a margin",
+        ),
+        click.option(
+            "--emitter-cpu",
+            default=EMITTER_CPU,
+            show_default=True,
+            help="CPUs of each emitter pod",
+        ),
+        click.option(
+            "--emitter-memory",
+            default=EMITTER_MEMORY,
+            show_default=True,
+            help="Memory of each emitter pod",
+        ),
+        click.option(
+            "--auto-size",
+            is_flag=True,
+            default=False,
+            show_default=True,
+            help="Size the emitters as recommended from the resource usage of the last collected run",
+        ),
+    ]
+    return add_options(fn, options)
+
+
+def plan_options(fn: Callable) -> Callable:
+    """
+    Options for planning which emitter sends to which target
+    """
+    options = [
+        click.option(
+            "--plan-targets",
+            is_flag=True,
+            default=False,
+            show_default=True,
+            help="Split the targets among the emitters to minimize latency while keeping the load on each node balanced",
+        ),
+        click.option(
+            "--node-capacity",
+            multiple=True,
+            help="Relative capacity of each node of a cluster for --plan-targets, e.g. bench-asia-east1=2. Defaults to 1",
+        ),
+    ]
+    return add_options(fn, options)
+
+
+def probe_options(fn: Callable) -> Callable:
+    """
+    Options for probing the automatically determined targets
+    """
+    options = [
+        click.option(
+            "--probe/--no-probe",
+            default=True,
+            show_default=True,
+            help="Probe the automatically determined targets and drop the unhealthy, lagging and slow ones",
+        ),
+        click.option(
+            "--max-ledger-lag",
+            type=int,
+            default=50000,
+            show_default=True,
+            help="Drop targets more than this many versions behind the most up to date target",
+        ),
+        click.option(
+            "--max-probe-latency-ms",
+            type=float,
+            default=2000,
+            show_default=True,
+            help="Drop targets whose median probe latency is higher than this",
+        ),
+        click.option(
+            "--fastest-n",
+            type=int,
+            help="Only use the fastest N targets of each cluster",
+        ),
+        click.option(
+            "--weight-by-latency",
+            is_flag=True,
+            default=False,
+            show_default=True,
+            help="Repeat faster targets in the emitter's targets, so they get a bigger share of the load",
+        ),
+    ]
+    return add_options(fn, options)
+
+
+def discover_loadtest_hosts(
+    target: Sequence[str], refresh: bool, host_cache_ttl: int
+) -> Dict[Cluster, List[ValidatorFullnodeHosts]]:
+    """
+    Discover the hosts of every cluster, unless the targets were given explicitly
+    """
+    if target:
+        return {}
+    try:
+        return discover_validator_fullnode_hosts(
+            list(CLUSTERS), refresh=refresh, ttl_secs=host_cache_ttl
         )
-    print("Waiting for kubectl to finish...")
-
-    # wait for everything
-    for proc in procs:
-        proc.wait()
-        if proc.returncode != 0:
-            print(f"Error starting loadtest")
-            outs, errs = proc.communicate()
-            print(outs)
-            print(errs)
+    except MissingHostsError as e:
+        print(e)
+        raise SystemExit(1)
+
+
+def build_loadtest_configs(
+    base_config: LoadTestConfig,
+    hosts: Dict[Cluster, List[ValidatorFullnodeHosts]],
+    only_within_cluster: bool,
+    target_filter: Optional[TargetFilter] = None,
+    plan: Optional[TargetPlan] = None,
+) -> Dict[Cluster, LoadTestConfig]:
+    """
+    Build the config of each cluster's emitter. Emitters without explicit targets target their
+    planned targets, or the discovered hosts of their own cluster, or of every cluster
+    """
+    configs: Dict[Cluster, LoadTestConfig] = {
+        cluster: {
+            **base_config,
+            "targets": base_config["targets"]
+            or (plan.targets.get(cluster) if plan else None)
+            or automatically_determine_targets(
+                [cluster] if only_within_cluster else list(CLUSTERS),
+                hosts,
+                target_filter,
+            ),
+        }
+        for cluster in CLUSTERS
+    }
+    for cluster, config in configs.items():
+        if not config["targets"]:
+            print(f"[{cluster.value}] No loadtest targets left after probing")
             raise SystemExit(1)
+    return configs
 
-    print("Done! Printing loadtest pod status...")
-    print("$ ./bin/cluster.py kube get pods loadtest")
-    print()
-    subprocess.run(
-        [
-            "./bin/cluster.py",  # ensure this is run from project root
-            "kube",
-            "get",
-            "pods",
-            "loadtest",
-        ],
+
+def build_loadtest_specs(
+    configs: Dict[Cluster, LoadTestConfig], run_id: str
+) -> Dict[Cluster, ClusterSpec]:
+    return {
+        cluster: build_cluster_spec(cluster, config, run_id)
+        for cluster, config in configs.items()
+    }
+
+
+def write_loadtest_specs(specs: Dict[Cluster, ClusterSpec], force: bool = False) -> None:
+    """
+    Write each cluster's spec for apply_spec, unless the spec on disk is already the same.
+    force rewrites them anyway, to pick up a new run id and start time
+    """
+    for spec in specs.values():
+        if not force and read_spec_hash(spec.spec_file) == spec.spec_hash:
+            print(f"Pod spec {spec.spec_file} is unchanged")
+            continue
+        with open(spec.spec_file, "w") as f:
+            f.write(spec.document)
+            print(f"Wrote pod spec to {spec.spec_file}")
+
+
+def loadtest_specs_running(specs: Dict[Cluster, ClusterSpec]) -> bool:
+    """
+    Whether every cluster is already running exactly these specs' pods
+    """
+    results = run_on_clusters(running_spec_hashes, list(specs))
+    for cluster, spec in specs.items():
+        result = results[cluster]
+        if not result.ok:
+            print(f"[{cluster.value}] Failed to check the running loadtest pods: {result.error}")
+            return False
+        expected = {
+            pod["metadata"]["name"]: spec.spec_hash
+            for pod in yaml.load(spec.document, Loader=YAML_LOADER)["items"]
+        }
+        if result.value != expected:
+            return False
+    return True
+
+
+def record_loadtest_run(run_id: str, configs: Dict[Cluster, LoadTestConfig]) -> None:
+    """
+    Record the run's configuration in the results store, so `collect` and `results` can join metrics to it
+    """
+    from results_store import record_run, RunMetadata
+
+    record_run(
+        RunMetadata(
+            run_id=run_id,
+            created_at=time.time(),
+            era=str(settings.current_era),
+            image_tag=settings.image_tag,
+            clusters={cluster.value: count for cluster, count in CLUSTERS.items()},
+            loadtest_configs={
+                cluster.value: {**config, "targets": list(config["targets"])}
+                for cluster, config in configs.items()
+            },
+        )
     )
+    print(f"Recorded loadtest run {run_id}")
+
+
+def apply_spec(delete=False, only_loadtest_clusters=False, timeout_secs: int = 600) -> None:
+    """Delete the existing loadtest pods and create the new spec's pods, in every cluster at once. If delete=True, then just do the delete"""
+    applied_clusters = [] if delete else loadtest_clusters(only_loadtest_clusters)
+    specs = {}
+    for cluster in applied_clusters:
+        with open(f"{cluster.value}_{LOADTEST_POD_SPEC}", "r") as f:
+            specs[cluster] = yaml.load(f, Loader=YAML_LOADER)
+
+    def apply_cluster_spec(cluster: Cluster) -> list:
+        deleted = delete_loadtest_pods(cluster, timeout_secs)
+        print_prefixed(cluster, f"Deleted {', '.join(deleted) or 'no loadtest pods'}")
+        if cluster not in specs:
+            return []
+        print_prefixed(cluster, "Creating loadtest pods...")
+        return create_loadtest_pods(cluster, specs[cluster]["items"], timeout_secs)
+
+    results = run_on_clusters(apply_cluster_spec, list(CLUSTERS))
+    err = False
+    for result in results.values():
+        if not result.ok:
+            print(f"[{result.cluster.value}] Error starting loadtest: {result.error}")
+            err = True
+            continue
+        for startup in result.value:
+            print(
+                f"[{result.cluster.value}] {startup.name} {startup.phase}: "
+                f"scheduled after {startup.scheduled_secs or 0:.1f}s, "
+                f"running after {startup.running_secs or 0:.1f}s"
+            )
+    if err:
+        raise SystemExit(1)
 
 
-@click.command()
+class DefaultCommandGroup(click.Group):
+    """
+    A group that runs its default command when the first argument is not a subcommand,
+    so `loadtest.py <mint_key> <chain_id> ...` keeps working alongside the subcommands
+    """
+
+    default_command = "run"
+
+    def parse_args(self, ctx: click.Context, args: List[str]) -> List[str]:
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultCommandGroup)
+def main() -> None:
+    """
+    Aptos Multi-region Loadtest CLI. Without a subcommand, the arguments are passed to `run`
+    """
+    pass
+
+
+def loadtest_clusters(only_loadtest_clusters: bool) -> List[Cluster]:
+    return LOADTEST_CLUSTERS if only_loadtest_clusters else list(CLUSTERS)
+
+
+@main.command("run")
 @click.argument("mint_key")
 @click.argument("chain_id")
 @click.argument(
@@ -237,6 +833,7 @@ def apply_spec(delete=False, only_asia=False) -> None:
     "--target-tps",
     type=int,
     show_default=True,
+    help="Target TPS of each loadtest cluster, split evenly between its emitter pods",
 )
 @click.option(
     "--duration",
@@ -250,12 +847,6 @@ def apply_spec(delete=False, only_asia=False) -> None:
     default=1000,
     show_default=True,
 )
-@click.option(
-    "--txn-expiration-time-secs",
-    type=int,
-    default=60,
-    show_default=True,
-)
 @click.option(
     "--apply",
     is_flag=True,
@@ -268,25 +859,17 @@ def apply_spec(delete=False, only_asia=False) -> None:
     default=False,
     show_default=True,
 )
+@emitter_options
+@host_options
+@probe_options
+@plan_options
+@emitter_resource_options
 @click.option(
-    "--coin-transfer",
-    is_flag=True,
-    default=False,
-    show_default=True,
-)
-@click.option(
-    "--only-asia",
-    is_flag=True,
-    default=False,
-    show_default=True,
+    "--run-id",
+    default=lambda: time.strftime("%Y%m%d-%H%M%S"),
+    help="Id to record the applied run under in the results store. Defaults to the current time",
 )
-@click.option(
-    "--only-within-cluster",
-    is_flag=True,
-    default=False,
-    show_default=True,
-)
-def main(
+def run_loadtest(
     mint_key: str,
     chain_id: str,
     target_tps: Optional[int],
@@ -297,11 +880,27 @@ def main(
     apply: bool,
     delete: bool,
     coin_transfer: bool,
-    only_asia: bool,
+    only_loadtest_clusters: bool,
     only_within_cluster: bool,
+    refresh: bool,
+    host_cache_ttl: int,
+    probe: bool,
+    max_ledger_lag: int,
+    max_probe_latency_ms: float,
+    fastest_n: Optional[int],
+    weight_by_latency: bool,
+    plan_targets: bool,
+    node_capacity: Tuple[str],
+    emitters_per_cluster: int,
+    start_delay: int,
+    delay_after_minting: Optional[int],
+    emitter_cpu: str,
+    emitter_memory: str,
+    auto_size: bool,
+    run_id: str,
 ) -> None:
     """
-    Generate a pod spec for load testing.
+    Generate a pod spec for load testing (default command).
 
     \b
     params:
@@ -311,33 +910,479 @@ def main(
         --apply  - Apply the generated pod spec to the cluster
         --delete - Delete the existing loadtest pods
     """
-    template = build_pod_template()
-
-    for cluster in CLUSTERS:
-        config: LoadTestConfig = {
+    check_plan_options(plan_targets, fastest_n, weight_by_latency)
+    if auto_size:
+        emitter_cpu, emitter_memory, emitters_per_cluster = recommended_emitter_size(
+            emitter_cpu, emitter_memory, emitters_per_cluster
+        )
+    hosts = discover_loadtest_hosts(target, refresh, host_cache_ttl)
+    target_filter = (
+        probe_loadtest_targets(
+            hosts, max_ledger_lag, max_probe_latency_ms, fastest_n, weight_by_latency
+        )
+        if hosts and probe
+        else None
+    )
+    plan = (
+        plan_loadtest_targets(
+            hosts, loadtest_clusters(only_loadtest_clusters), target_filter, node_capacity
+        )
+        if hosts and plan_targets
+        else None
+    )
+    configs = build_loadtest_configs(
+        {
             "mint_key": mint_key,
             "chain_id": chain_id,
-            "targets": target
-            or automatically_determine_targets(
-                [cluster] if only_within_cluster else list(CLUSTERS)
-            ),
+            "targets": target,
             "target_tps": target_tps,
             "duration": duration,
             "mempool_backlog": mempool_backlog,
             "txn_expiration_time_secs": txn_expiration_time_secs,
             "coin_transfer": coin_transfer,
-            "delay_after_minting": 300,
-        }
-        spec = configure_loadtest(template, config)
-        spec_file = f"{cluster.value}_{LOADTEST_POD_SPEC}"
-        with open(spec_file, "w") as f:
-            f.write(yaml.dump(spec))
-            print(f"Wrote pod spec to {spec_file}")
+            "delay_after_minting": delay_after_minting
+            or default_delay_after_minting(txn_expiration_time_secs),
+            "emitters_per_cluster": emitters_per_cluster,
+            "account_minter_seed": None,
+            "start_at": int(time.time()) + start_delay if apply else None,
+            "emitter_cpu": emitter_cpu,
+            "emitter_memory": emitter_memory,
+        },
+        hosts,
+        only_within_cluster,
+        target_filter,
+        plan,
+    )
+    specs = build_loadtest_specs(configs, run_id)
+    applied_specs = {
+        cluster: specs[cluster] for cluster in loadtest_clusters(only_loadtest_clusters)
+    }
+    if apply and not delete and loadtest_specs_running(applied_specs):
+        print("Loadtest pods are already running these specs, nothing to apply")
+        return
+    write_loadtest_specs(specs, force=apply)
 
     if apply or delete:
-        apply_spec(delete=delete, only_asia=only_asia)
+        apply_spec(delete=delete, only_loadtest_clusters=only_loadtest_clusters)
+        if not delete:
+            record_loadtest_run(
+                run_id,
+                {
+                    cluster: configs[cluster]
+                    for cluster in loadtest_clusters(only_loadtest_clusters)
+                },
+            )
     else:
-        print(yaml.dump(spec))
+        print(specs[list(CLUSTERS)[-1]].document)
+
+
+def recommended_emitter_size(
+    emitter_cpu: str, emitter_memory: str, emitters_per_cluster: int
+) -> Tuple[str, str, int]:
+    """
+    The emitter size recommended after the latest collected run, or the given size if there is none
+    """
+    from results_store import load_results_store
+
+    sized = [
+        run
+        for run in load_results_store().runs
+        if run.extra.get("emitter_resources", {}).get("recommendation")
+    ]
+    if not sized:
+        print("No emitter size recommendation stored yet, using the given size")
+        return emitter_cpu, emitter_memory, emitters_per_cluster
+    run = max(sized, key=lambda run: run.created_at)
+    recommendation = run.extra["emitter_resources"]["recommendation"]
+    print(
+        f"Sizing emitters as recommended after run {run.run_id}: {recommendation['emitter_cpu']} CPUs, "
+        f"{recommendation['emitter_memory']}, {recommendation['emitters_per_cluster']} per cluster"
+    )
+    return (
+        recommendation["emitter_cpu"],
+        recommendation["emitter_memory"],
+        recommendation["emitters_per_cluster"],
+    )
+
+
+def collect_run(
+    run_id: str, clusters: List[Cluster], results_directory: str
+) -> Tuple[Dict[str, str], bool]:
+    """
+    Follow every emitter pod of the run while sampling their resource usage, then store both with
+    the run. Returns the path of each emitter's time series, and whether every cluster was collected
+    """
+    from emitter_resources import recommend_emitter_resources, resources_record
+    from results_store import ingest_run_metrics, load_results_store, update_run_extra
+
+    def collect_cluster(cluster: Cluster):
+        pod_names = loadtest_pod_names(cluster, run_id)
+        with ResourceSampler(cluster, pod_names) as sampler:
+            paths = collect_cluster_run_samples(
+                cluster, run_id, results_directory, pod_names
+            )
+        return paths, sampler.usage()
+
+    results = run_on_clusters(collect_cluster, clusters)
+    ok = True
+    paths: Dict[str, str] = {}
+    usages = []
+    for result in results.values():
+        if not result.ok:
+            print(f"[{result.cluster.value}] Failed to collect results: {result.error}")
+            ok = False
+            continue
+        paths.update(result.value[0])
+        usages.extend(result.value[1])
+
+    count = ingest_run_metrics(run_id, paths, results_directory)
+    print(f"Stored {count} samples for run {run_id} in {results_directory}")
+
+    for usage in usages:
+        print(
+            f"[{usage.cluster}] {usage.pod}: CPU mean {usage.mean_cpu:.1f}, p95 {usage.p95_cpu:.1f} "
+            f"of {usage.cpu_limit or 'unlimited'}, memory max {usage.max_memory_bytes / 2**30:.1f}Gi"
+            + (" - CPU-bound, the emitter may have been the bottleneck" if usage.cpu_bound else "")
+        )
+    store = load_results_store(results_directory)
+    configs = list(store.runs[store.run_index(run_id)].loadtest_configs.values())
+    config = configs[0] if configs else {}
+    recommendation = recommend_emitter_resources(
+        usages,
+        config.get("emitter_cpu", EMITTER_CPU),
+        config.get("emitter_memory", EMITTER_MEMORY),
+        config.get("emitters_per_cluster", 1),
+    )
+    print(
+        f"Recommended emitter size: {recommendation.emitter_cpu} CPUs, {recommendation.emitter_memory}, "
+        f"{recommendation.emitters_per_cluster} per cluster ({recommendation.reason})"
+    )
+    update_run_extra(
+        run_id,
+        "emitter_resources",
+        resources_record(usages, recommendation),
+        results_directory,
+    )
+    return paths, ok
+
+
+def default_run_id() -> str:
+    from results_store import latest_run_id
+
+    return latest_run_id() or time.strftime("%Y%m%d-%H%M%S")
+
+
+@main.command("collect")
+@click.option(
+    "--run-id",
+    default=default_run_id,
+    help="Id of the run to record the results under. Defaults to the last applied run, or the current time",
+)
+@click.option(
+    "--only-loadtest-clusters",
+    "--only-asia",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Only collect from the clusters the loadtest was applied to with --only-loadtest-clusters",
+)
+@click.option(
+    "--results-directory",
+    default=LOADTEST_RESULTS_DIRECTORY,
+    show_default=True,
+)
+def collect(run_id: str, only_loadtest_clusters: bool, results_directory: str) -> None:
+    """
+    Follow the loadtest pod logs in all loadtest clusters at once, and write each emitter's
+    submitted/committed/expired rates and latency percentiles as a time series
+    """
+    print(f"Collecting loadtest results for run {run_id}...")
+    _, ok = collect_run(
+        run_id, loadtest_clusters(only_loadtest_clusters), results_directory
+    )
+    if not ok:
+        raise SystemExit(1)
+
+
+@main.command("sweep")
+@click.argument("mint_key")
+@click.argument("chain_id")
+@click.argument(
+    "target",
+    nargs=-1,
+)
+@click.option("--start-tps", type=int, default=1000, show_default=True)
+@click.option("--max-tps", type=int, default=30000, show_default=True)
+@click.option(
+    "--ramp-factor",
+    type=float,
+    default=2.0,
+    show_default=True,
+    help="Multiply the target TPS by this after each sustainable step, until the knee is found",
+)
+@click.option(
+    "--resolution",
+    type=int,
+    default=500,
+    show_default=True,
+    help="Binary search between the last sustainable and first unsustainable target TPS until they are this close",
+)
+@click.option("--max-steps", type=int, default=12, show_default=True)
+@click.option(
+    "--step-duration",
+    type=int,
+    default=300,
+    show_default=True,
+    help="Duration of each step's emitter run, in seconds",
+)
+@click.option(
+    "--min-commit-ratio",
+    type=float,
+    default=0.95,
+    show_default=True,
+    help="A step is unsustainable if committed/submitted TPS drops below this",
+)
+@click.option(
+    "--max-p99-latency-ms",
+    type=float,
+    default=10000,
+    show_default=True,
+    help="A step is unsustainable if the mean p99 latency rises above this",
+)
+@click.option(
+    "--warmup-fraction",
+    type=float,
+    default=0.1,
+    show_default=True,
+    help="Fraction of each emitter's samples to ignore at the start of a step",
+)
+@emitter_options
+@host_options
+@probe_options
+@plan_options
+@emitter_resource_options
+@click.option(
+    "--sweep-id",
+    default=lambda: time.strftime("%Y%m%d-%H%M%S"),
+    help="Each step is recorded as run <sweep-id>-<target-tps>. Defaults to the current time",
+)
+@click.option(
+    "--results-directory",
+    default=LOADTEST_RESULTS_DIRECTORY,
+    show_default=True,
+)
+def sweep(
+    mint_key: str,
+    chain_id: str,
+    target: Tuple[str],
+    start_tps: int,
+    max_tps: int,
+    ramp_factor: float,
+    resolution: int,
+    max_steps: int,
+    step_duration: int,
+    min_commit_ratio: float,
+    max_p99_latency_ms: float,
+    warmup_fraction: float,
+    txn_expiration_time_secs: int,
+    coin_transfer: bool,
+    only_loadtest_clusters: bool,
+    only_within_cluster: bool,
+    refresh: bool,
+    host_cache_ttl: int,
+    probe: bool,
+    max_ledger_lag: int,
+    max_probe_latency_ms: float,
+    fastest_n: Optional[int],
+    weight_by_latency: bool,
+    plan_targets: bool,
+    node_capacity: Tuple[str],
+    emitters_per_cluster: int,
+    start_delay: int,
+    delay_after_minting: Optional[int],
+    emitter_cpu: str,
+    emitter_memory: str,
+    auto_size: bool,
+    sweep_id: str,
+    results_directory: str,
+) -> None:
+    """
+    Find the maximum sustainable TPS with a series of short emitter runs. The per-cluster
+    target TPS is ramped up until the committed/submitted ratio or p99 latency crosses
+    its threshold, then binary searched between the last sustainable and first
+    unsustainable target. Each step is recorded in the results store.
+    """
+    from throughput_sweep import search_max_tps, summarize_step, SweepCriteria, StepResult
+
+    check_plan_options(plan_targets, fastest_n, weight_by_latency)
+    if auto_size:
+        emitter_cpu, emitter_memory, emitters_per_cluster = recommended_emitter_size(
+            emitter_cpu, emitter_memory, emitters_per_cluster
+        )
+    clusters = loadtest_clusters(only_loadtest_clusters)
+    hosts = discover_loadtest_hosts(target, refresh, host_cache_ttl)
+    target_filter = (
+        probe_loadtest_targets(
+            hosts, max_ledger_lag, max_probe_latency_ms, fastest_n, weight_by_latency
+        )
+        if hosts and probe
+        else None
+    )
+    plan = (
+        plan_loadtest_targets(
+            hosts, loadtest_clusters(only_loadtest_clusters), target_filter, node_capacity
+        )
+        if hosts and plan_targets
+        else None
+    )
+
+    def run_step(target_tps: int) -> StepResult:
+        run_id = f"{sweep_id}-{target_tps}"
+        print(f"Running step {run_id} at {target_tps} TPS per loadtest cluster for {step_duration}s...")
+        configs = build_loadtest_configs(
+            {
+                "mint_key": mint_key,
+                "chain_id": chain_id,
+                "targets": target,
+                "target_tps": target_tps,
+                "duration": step_duration,
+                "mempool_backlog": 0,
+                "txn_expiration_time_secs": txn_expiration_time_secs,
+                "coin_transfer": coin_transfer,
+                "delay_after_minting": delay_after_minting
+                or default_delay_after_minting(txn_expiration_time_secs),
+                "emitters_per_cluster": emitters_per_cluster,
+                "account_minter_seed": None,
+                "start_at": int(time.time()) + start_delay,
+                "emitter_cpu": emitter_cpu,
+                "emitter_memory": emitter_memory,
+            },
+            hosts,
+            only_within_cluster,
+            target_filter,
+            plan,
+        )
+        write_loadtest_specs(build_loadtest_specs(configs, run_id), force=True)
+        apply_spec(only_loadtest_clusters=only_loadtest_clusters)
+        record_loadtest_run(run_id, {cluster: configs[cluster] for cluster in clusters})
+        paths, ok = collect_run(run_id, clusters, results_directory)
+        if not ok:
+            raise SystemExit(1)
+        return summarize_step(
+            target_tps,
+            {name: list(read_samples(path)) for name, path in paths.items()},
+            warmup_fraction,
+            run_id,
+        )
+
+    def print_step(step: StepResult, sustainable: bool) -> None:
+        print(
+            f"{step.run_id}: target {step.target_tps} TPS, submitted {step.submitted_tps:.0f} TPS, "
+            f"committed {step.committed_tps:.0f} ± {step.committed_tps_ci:.0f} TPS, "
+            f"commit ratio {step.commit_ratio:.3f}, p99 {step.p99_latency_ms:.0f}ms: "
+            f"{'sustainable' if sustainable else 'unsustainable'}"
+        )
+
+    result = search_max_tps(
+        run_step,
+        SweepCriteria(
+            min_commit_ratio=min_commit_ratio, max_p99_latency_ms=max_p99_latency_ms
+        ),
+        start_tps=start_tps,
+        max_tps=max_tps,
+        ramp_factor=ramp_factor,
+        resolution=resolution,
+        max_steps=max_steps,
+        on_step=print_step,
+    )
+    apply_spec(delete=True, only_loadtest_clusters=only_loadtest_clusters)
+
+    if result.best is None:
+        print(f"No sustainable target TPS at or above {start_tps}")
+        raise SystemExit(1)
+    best = result.best
+    print(
+        f"Max sustainable TPS: {best.committed_tps:.0f} "
+        f"(95% CI {best.committed_tps - best.committed_tps_ci:.0f}-{best.committed_tps + best.committed_tps_ci:.0f}) "
+        f"at {best.target_tps} TPS per loadtest cluster, run {best.run_id}"
+    )
+    if result.knee is None:
+        print(f"The knee was not reached below {max_tps} TPS per loadtest cluster within {max_steps} steps")
+    else:
+        print(
+            f"The knee is between {best.target_tps} and {result.knee.target_tps} TPS per loadtest cluster "
+            f"(committed {result.knee.committed_tps:.0f} TPS, commit ratio {result.knee.commit_ratio:.3f}, "
+            f"p99 {result.knee.p99_latency_ms:.0f}ms)"
+        )
+
+
+@main.group()
+@click.option(
+    "--results-directory",
+    default=LOADTEST_RESULTS_DIRECTORY,
+    show_default=True,
+)
+@click.option(
+    "--warmup-fraction",
+    type=float,
+    default=0.1,
+    show_default=True,
+    help="Fraction of each emitter's samples to ignore at the start of a run",
+)
+@click.pass_context
+def results(ctx: click.Context, results_directory: str, warmup_fraction: float) -> None:
+    """
+    Query the stored loadtest results
+    """
+    from results_store import load_results_store
+
+    ctx.obj = (load_results_store(results_directory), warmup_fraction)
+
+
+@results.command("runs")
+@click.pass_obj
+def results_runs(obj) -> None:
+    """
+    List the stored runs with their configuration and sustained TPS
+    """
+    from results_store import run_sustained_tps
+
+    store, warmup_fraction = obj
+    tps = run_sustained_tps(store, warmup_fraction)
+    for run, run_tps in zip(store.runs, tps):
+        print(
+            f"{run.run_id}: era {run.era}, image {run.image_tag}, "
+            f"nodes {sum(run.clusters.values())}, target TPS {run.target_tps or 'backlog'}, "
+            f"sustained TPS {run_tps:.0f}"
+        )
+
+
+@results.command("best-tps")
+@click.pass_obj
+def results_best_tps(obj) -> None:
+    """
+    Best sustained committed TPS for each image tag
+    """
+    from results_store import best_sustained_tps_by_image_tag
+
+    store, warmup_fraction = obj
+    for image_tag, tps, run_id in best_sustained_tps_by_image_tag(store, warmup_fraction):
+        print(f"{image_tag or '<unknown>'}: {tps:.0f} TPS (run {run_id})")
+
+
+@results.command("latency")
+@click.pass_obj
+def results_latency(obj) -> None:
+    """
+    Mean p99 latency against target TPS, for runs with a target TPS
+    """
+    from results_store import p99_latency_by_target_tps
+
+    store, warmup_fraction = obj
+    for target_tps, p99, tps, run_id in p99_latency_by_target_tps(store, warmup_fraction):
+        print(
+            f"target {target_tps} TPS: p99 {p99:.0f}ms, sustained {tps:.0f} TPS (run {run_id})"
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from constants import Cluster, LOADTEST_POD_NAME, NAMESPACE, core_v1_api
+
+LOADTEST_POD_SELECTOR = f"app={LOADTEST_POD_NAME}"
+SPEC_HASH_ANNOTATION = "aptos-multi-region-bench/spec-hash"
+
+
+@dataclass
+class PodStartup:
+    name: str
+    phase: str = "Pending"
+    # seconds from the create request until the pod was seen scheduled, and running
+    scheduled_secs: Optional[float] = None
+    running_secs: Optional[float] = None
+
+
+def is_not_found(e: Exception) -> bool:
+    return getattr(e, "status", None) == 404
+
+
+def delete_loadtest_pods(cluster: Cluster, timeout_secs: int = 300) -> List[str]:
+    """
+    Delete every loadtest pod in the cluster, labelled or named like the single emitter of older specs,
+    and watch until they are all gone. Returns the names of the deleted pods
+    """
+    from kubernetes import watch
+
+    api = core_v1_api(cluster)
+    listed = api.list_namespaced_pod(NAMESPACE, label_selector=LOADTEST_POD_SELECTOR)
+    names = {pod.metadata.name for pod in listed.items}
+    try:
+        api.read_namespaced_pod(LOADTEST_POD_NAME, NAMESPACE)
+        names.add(LOADTEST_POD_NAME)
+    except Exception as e:
+        if not is_not_found(e):
+            raise
+
+    remaining = set()
+    for name in names:
+        try:
+            api.delete_namespaced_pod(name, NAMESPACE)
+            remaining.add(name)
+        except Exception as e:
+            if not is_not_found(e):
+                raise
+    if not remaining:
+        return sorted(names)
+
+    w = watch.Watch()
+    for event in w.stream(
+        api.list_namespaced_pod,
+        NAMESPACE,
+        resource_version=listed.metadata.resource_version,
+        timeout_seconds=timeout_secs,
+    ):
+        if event["type"] == "DELETED":
+            remaining.discard(event["object"].metadata.name)
+        if not remaining:
+            w.stop()
+    if remaining:
+        raise TimeoutError(
+            f"Pods {', '.join(sorted(remaining))} were not deleted within {timeout_secs}s"
+        )
+    return sorted(names)
+
+
+def running_spec_hashes(cluster: Cluster) -> Dict[str, Optional[str]]:
+    """
+    The spec hash annotation of each of the cluster's pending or running loadtest pods
+    """
+    pods = core_v1_api(cluster).list_namespaced_pod(
+        NAMESPACE, label_selector=LOADTEST_POD_SELECTOR
+    ).items
+    return {
+        pod.metadata.name: (pod.metadata.annotations or {}).get(SPEC_HASH_ANNOTATION)
+        for pod in pods
+        if pod.status.phase in ("Pending", "Running")
+    }
+
+
+def pod_scheduled(pod) -> bool:
+    return any(
+        condition.type == "PodScheduled" and condition.status == "True"
+        for condition in pod.status.conditions or []
+    )
+
+
+def create_loadtest_pods(
+    cluster: Cluster, pods: List[dict], timeout_secs: int = 600
+) -> List[PodStartup]:
+    """
+    Create the pods, and watch them until they are all running, recording how long each took
+    to be scheduled and to start
+    """
+    from kubernetes import watch
+
+    api = core_v1_api(cluster)
+    startups: Dict[str, PodStartup] = {}
+    created_at: Dict[str, float] = {}
+    resource_version = None
+    for pod in pods:
+        created = api.create_namespaced_pod(NAMESPACE, pod)
+        name = created.metadata.name
+        created_at[name] = time.time()
+        startups[name] = PodStartup(name=name)
+        # watch from the first create, so no pod's transitions are missed
+        resource_version = resource_version or created.metadata.resource_version
+
+    pending = set(startups)
+    w = watch.Watch()
+    for event in w.stream(
+        api.list_namespaced_pod,
+        NAMESPACE,
+        label_selector=LOADTEST_POD_SELECTOR,
+        resource_version=resource_version,
+        timeout_seconds=timeout_secs,
+    ):
+        pod = event["object"]
+        startup = startups.get(pod.metadata.name)
+        if startup is None or pod.metadata.name not in pending:
+            continue
+        elapsed = time.time() - created_at[startup.name]
+        startup.phase = pod.status.phase
+        if startup.scheduled_secs is None and pod_scheduled(pod):
+            startup.scheduled_secs = elapsed
+        if startup.phase != "Pending":
+            startup.running_secs = elapsed
+            pending.discard(startup.name)
+        if not pending:
+            w.stop()
+
+    failed = [startup.name for startup in startups.values() if startup.phase == "Failed"]
+    if failed:
+        raise Exception(f"Pods {', '.join(failed)} failed to start")
+    if pending:
+        raise TimeoutError(
+            f"Pods {', '.join(sorted(pending))} were not running within {timeout_secs}s"
+        )
+    return list(startups.values())
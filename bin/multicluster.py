@@ -0,0 +1,83 @@
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Generic, List, Optional, Sequence, TypeVar
+
+from constants import ALL_CLUSTERS, Cluster, CLUSTERS
+
+T = TypeVar("T")
+
+# serializes output lines from concurrent per-cluster tasks
+_print_lock = threading.Lock()
+
+
+@dataclass
+class ClusterResult(Generic[T]):
+    cluster: Cluster
+    value: Optional[T]
+    error: Optional[Exception]
+    duration_secs: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def select_clusters(cluster: Cluster) -> List[Cluster]:
+    """
+    The clusters selected by a --cluster option, in CLUSTERS order
+    """
+    return [
+        available_cluster
+        for available_cluster in CLUSTERS
+        if cluster == available_cluster or cluster == ALL_CLUSTERS
+    ]
+
+
+def run_on_clusters(
+    fn: Callable[[Cluster], T], clusters: Sequence[Cluster]
+) -> Dict[Cluster, ClusterResult[T]]:
+    """
+    Run fn once per cluster, all at the same time. Exceptions are captured in each cluster's result
+    rather than raised, and the results are returned in the order of the given clusters
+    """
+
+    def run(cluster: Cluster) -> ClusterResult[T]:
+        start_time = time.time()
+        try:
+            value, error = fn(cluster), None
+        except Exception as e:
+            value, error = None, e
+        return ClusterResult(
+            cluster=cluster,
+            value=value,
+            error=error,
+            duration_secs=time.time() - start_time,
+        )
+
+    if not clusters:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(clusters)) as executor:
+        return {result.cluster: result for result in executor.map(run, clusters)}
+
+
+def print_prefixed(cluster: Cluster, line: str) -> None:
+    with _print_lock:
+        print(f"[{cluster.value}] {line}", flush=True)
+
+
+def run_prefixed(cluster: Cluster, args: List[str]) -> int:
+    """
+    Run the command, printing each line of its combined stdout and stderr prefixed with the cluster name
+    """
+    proc = subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    for line in proc.stdout:
+        print_prefixed(cluster, line.rstrip("\n"))
+    return proc.wait()
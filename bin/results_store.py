@@ -0,0 +1,323 @@
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from constants import LOADTEST_RESULTS_DIRECTORY
+from emitter_stats import SAMPLE_FIELDS, read_samples
+
+# run metadata, keyed by run id
+RUNS_FILE = "runs.json"
+# every run's samples as one set of columns, with `run` and `cluster` index columns
+METRICS_FILE = "metrics.npz"
+
+
+@dataclass
+class RunMetadata:
+    run_id: str
+    created_at: float
+    era: str
+    image_tag: str
+    # node count per cluster
+    clusters: Dict[str, int]
+    # the LoadTestConfig generated for each loadtest cluster
+    loadtest_configs: Dict[str, dict]
+    # extra per-run data, e.g. emitter resource usage
+    extra: Dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def target_tps(self) -> Optional[int]:
+        return next(
+            (
+                config["target_tps"]
+                for config in self.loadtest_configs.values()
+                if config.get("target_tps")
+            ),
+            None,
+        )
+
+
+@dataclass
+class ResultsStore:
+    runs: List[RunMetadata]
+    # column name -> array, all of the same length. `run` indexes into runs, `cluster` into cluster_names
+    columns: Dict[str, np.ndarray]
+    cluster_names: List[str]
+
+    def run_index(self, run_id: str) -> Optional[int]:
+        return next(
+            (i for i, run in enumerate(self.runs) if run.run_id == run_id), None
+        )
+
+
+def load_results_store(results_directory: str = LOADTEST_RESULTS_DIRECTORY) -> ResultsStore:
+    try:
+        with open(f"{results_directory}/{RUNS_FILE}", "r") as f:
+            runs = [RunMetadata(**run) for run in json.load(f)]
+    except FileNotFoundError:
+        runs = []
+    try:
+        with np.load(f"{results_directory}/{METRICS_FILE}") as metrics:
+            columns = {name: metrics[name] for name in metrics.files if name != "cluster_names"}
+            cluster_names = [str(name) for name in metrics["cluster_names"]]
+    except FileNotFoundError:
+        columns = {
+            "run": np.empty(0, dtype=np.int64),
+            "cluster": np.empty(0, dtype=np.int64),
+            **{name: np.empty(0, dtype=np.float64) for name in SAMPLE_FIELDS},
+        }
+        cluster_names = []
+    return ResultsStore(runs=runs, columns=columns, cluster_names=cluster_names)
+
+
+def save_results_store(
+    store: ResultsStore, results_directory: str = LOADTEST_RESULTS_DIRECTORY
+) -> None:
+    os.makedirs(results_directory, exist_ok=True)
+    with open(f"{results_directory}/{RUNS_FILE}", "w") as f:
+        json.dump([asdict(run) for run in store.runs], f, indent=2)
+    np.savez(
+        f"{results_directory}/{METRICS_FILE}",
+        cluster_names=np.array(store.cluster_names),
+        **store.columns,
+    )
+
+
+def record_run(
+    metadata: RunMetadata, results_directory: str = LOADTEST_RESULTS_DIRECTORY
+) -> None:
+    """
+    Add or replace the run's metadata, keeping any metrics already stored for it
+    """
+    store = load_results_store(results_directory)
+    index = store.run_index(metadata.run_id)
+    if index is None:
+        store.runs.append(metadata)
+    else:
+        metadata.extra = {**store.runs[index].extra, **metadata.extra}
+        store.runs[index] = metadata
+    save_results_store(store, results_directory)
+
+
+def update_run_extra(
+    run_id: str, key: str, value: dict, results_directory: str = LOADTEST_RESULTS_DIRECTORY
+) -> None:
+    """
+    Store extra data with a recorded run, e.g. its emitters' resource usage
+    """
+    store = load_results_store(results_directory)
+    index = store.run_index(run_id)
+    if index is None:
+        raise KeyError(f"Run {run_id} is not in the results store")
+    store.runs[index].extra[key] = value
+    save_results_store(store, results_directory)
+
+
+def latest_run_id(results_directory: str = LOADTEST_RESULTS_DIRECTORY) -> Optional[str]:
+    runs = load_results_store(results_directory).runs
+    return max(runs, key=lambda run: run.created_at).run_id if runs else None
+
+
+def ingest_run_metrics(
+    run_id: str,
+    cluster_files: Dict[str, str],
+    results_directory: str = LOADTEST_RESULTS_DIRECTORY,
+) -> int:
+    """
+    Replace the run's samples in the store with those in the given per-cluster time series files.
+    Runs that were never recorded get placeholder metadata. Returns the number of samples ingested
+    """
+    store = load_results_store(results_directory)
+    run = store.run_index(run_id)
+    if run is None:
+        store.runs.append(
+            RunMetadata(
+                run_id=run_id,
+                created_at=time.time(),
+                era="",
+                image_tag="",
+                clusters={},
+                loadtest_configs={},
+            )
+        )
+        run = len(store.runs) - 1
+
+    keep = store.columns["run"] != run
+    new_columns: Dict[str, List[np.ndarray]] = {
+        name: [column[keep]] for name, column in store.columns.items()
+    }
+    ingested = 0
+    for cluster_name, path in cluster_files.items():
+        if cluster_name not in store.cluster_names:
+            store.cluster_names.append(cluster_name)
+        samples = [asdict(sample) for sample in read_samples(path)]
+        ingested += len(samples)
+        new_columns["run"].append(np.full(len(samples), run))
+        new_columns["cluster"].append(
+            np.full(len(samples), store.cluster_names.index(cluster_name))
+        )
+        for name in SAMPLE_FIELDS:
+            new_columns[name].append(
+                np.array([sample[name] for sample in samples], dtype=np.float64)
+            )
+
+    store.columns = {
+        name: np.concatenate(parts).astype(
+            np.int64 if name in ("run", "cluster") else np.float64
+        )
+        for name, parts in new_columns.items()
+    }
+    save_results_store(store, results_directory)
+    return ingested
+
+
+def aligned_window(
+    run: np.ndarray, cluster: np.ndarray, timestamp: np.ndarray, num_runs: int, num_clusters: int
+) -> np.ndarray:
+    """
+    Mask out each run's samples outside the window in which all of its emitters were reporting,
+    so that emitters that started or stopped at different times are compared over the same window.
+    Runs whose emitters never overlapped are left as they are
+    """
+    if len(run) == 0:
+        return np.zeros(0, dtype=bool)
+    group = run * num_clusters + cluster
+    num_groups = num_runs * num_clusters
+    first = np.full(num_groups, np.inf)
+    last = np.full(num_groups, -np.inf)
+    np.minimum.at(first, group, timestamp)
+    np.maximum.at(last, group, timestamp)
+    reporting = np.isfinite(first)
+    group_run = np.arange(num_groups) // num_clusters
+    window_start = np.full(num_runs, -np.inf)
+    window_end = np.full(num_runs, np.inf)
+    np.maximum.at(window_start, group_run[reporting], first[reporting])
+    np.minimum.at(window_end, group_run[reporting], last[reporting])
+    overlapping = window_start <= window_end
+    window_start[~overlapping], window_end[~overlapping] = -np.inf, np.inf
+    return (timestamp >= window_start[run]) & (timestamp <= window_end[run])
+
+
+def aligned_window_mask(store: ResultsStore) -> np.ndarray:
+    """
+    The aligned window of every run in the store
+    """
+    columns = store.columns
+    return aligned_window(
+        columns["run"],
+        columns["cluster"],
+        columns["timestamp"],
+        len(store.runs),
+        len(store.cluster_names),
+    )
+
+
+def steady_state_mask(store: ResultsStore, warmup_fraction: float) -> np.ndarray:
+    """
+    Mask out samples outside each run's aligned window, and the first warmup_fraction of each
+    (run, cluster) time series within it, where the emitter is still ramping up
+    """
+    columns = store.columns
+    aligned = np.flatnonzero(aligned_window_mask(store))
+    n = len(aligned)
+    mask = np.zeros(len(columns["run"]), dtype=bool)
+    if n == 0:
+        return mask
+    run = columns["run"][aligned]
+    cluster = columns["cluster"][aligned]
+    order = np.lexsort((columns["timestamp"][aligned], cluster, run))
+    group = run[order] * (len(store.cluster_names) + 1) + cluster[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(group)) + 1]
+    counts = np.diff(np.r_[starts, n])
+    position = np.arange(n) - np.repeat(starts, counts)
+    mask[aligned[order]] = position >= np.floor(np.repeat(counts, counts) * warmup_fraction)
+    return mask
+
+
+def group_mean(values: np.ndarray, groups: np.ndarray, num_groups: int) -> np.ndarray:
+    """
+    Mean of each group's values, leaving out NaN values that the emitter didn't report. NaN for groups
+    without any value
+    """
+    reported = ~np.isnan(values)
+    counts = np.bincount(groups[reported], minlength=num_groups)
+    sums = np.bincount(groups[reported], weights=values[reported], minlength=num_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def run_sustained_tps(store: ResultsStore, warmup_fraction: float = 0.1) -> np.ndarray:
+    """
+    Sustained committed TPS of each run: the steady-state mean of each emitter, summed across clusters
+    """
+    mask = steady_state_mask(store, warmup_fraction)
+    num_clusters = len(store.cluster_names)
+    num_runs = len(store.runs)
+    run = store.columns["run"][mask]
+    cluster = store.columns["cluster"][mask]
+    per_run_cluster = group_mean(
+        store.columns["committed_tps"][mask],
+        run * num_clusters + cluster,
+        num_runs * num_clusters,
+    ).reshape(num_runs, num_clusters)
+    return np.nansum(per_run_cluster, axis=1)
+
+
+def run_mean(
+    store: ResultsStore, column: str, warmup_fraction: float = 0.1
+) -> np.ndarray:
+    """
+    Steady-state mean of the column for each run, across all of its clusters
+    """
+    mask = steady_state_mask(store, warmup_fraction)
+    return group_mean(
+        store.columns[column][mask], store.columns["run"][mask], len(store.runs)
+    )
+
+
+def best_sustained_tps_by_image_tag(
+    store: ResultsStore, warmup_fraction: float = 0.1
+) -> List[Tuple[str, float, str]]:
+    """
+    (image tag, best sustained TPS, run id) for each image tag, best first
+    """
+    if not store.runs:
+        return []
+    tps = run_sustained_tps(store, warmup_fraction)
+    image_tags, tag_index = np.unique(
+        np.array([run.image_tag for run in store.runs]), return_inverse=True
+    )
+    # sort by tag then TPS, so the last run of each tag is its best
+    order = np.lexsort((tps, tag_index))
+    last = np.r_[np.flatnonzero(np.diff(tag_index[order])), len(order) - 1]
+    best = order[last]
+    return sorted(
+        (
+            (str(image_tags[tag_index[i]]), float(tps[i]), store.runs[i].run_id)
+            for i in best
+        ),
+        key=lambda row: row[1],
+        reverse=True,
+    )
+
+
+def p99_latency_by_target_tps(
+    store: ResultsStore, warmup_fraction: float = 0.1
+) -> List[Tuple[int, float, float, str]]:
+    """
+    (target TPS, mean p99 latency ms, sustained TPS, run id) for each run with a target TPS, by target TPS
+    """
+    if not store.runs:
+        return []
+    p99 = run_mean(store, "p99_latency_ms", warmup_fraction)
+    tps = run_sustained_tps(store, warmup_fraction)
+    target = np.array([run.target_tps or 0 for run in store.runs])
+    rows = np.flatnonzero((target > 0) & ~np.isnan(p99))
+    rows = rows[np.argsort(target[rows], kind="stable")]
+    return [
+        (int(target[i]), float(p99[i]), float(tps[i]), store.runs[i].run_id)
+        for i in rows
+    ]
@@ -0,0 +1,265 @@
+import itertools
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Set
+
+from constants import (
+    CLUSTER_STAKE_AMOUNTS,
+    CLUSTERS,
+    NAMESPACE,
+    VALIDATOR_STAKE_AMOUNT,
+    Cluster,
+    apps_v1_api,
+    core_v1_api,
+)
+from multicluster import run_on_clusters
+from target_probe import probe_targets
+
+# validator statefulsets are named {release}-aptos-node-{index}-validator, where the helm release is the cluster name
+VALIDATOR_STATEFULSET_PATTERN = re.compile(
+    r"^(?P<release>.+)-aptos-node-(?P<index>\d+)-validator$"
+)
+ROLLOUT_POLL_INTERVAL_SECS = 5
+
+
+def quorum_voting_power(total_power: int) -> int:
+    """
+    The 2f+1 quorum of voting power, as in consensus_sim
+    """
+    return total_power * 2 // 3 + 1
+
+
+def total_voting_power() -> int:
+    """
+    The voting power of every validator, staked as genesis stakes them
+    """
+    return sum(
+        count * CLUSTER_STAKE_AMOUNTS.get(cluster, VALIDATOR_STAKE_AMOUNT)
+        for cluster, count in CLUSTERS.items()
+    )
+
+
+def max_faulty_voting_power(total_power: int) -> int:
+    """
+    The most voting power that can be down while the rest still forms a quorum
+    """
+    return max(0, total_power - quorum_voting_power(total_power))
+
+
+@dataclass(frozen=True)
+class ValidatorNode:
+    cluster: Cluster
+    index: int
+
+    @property
+    def stake(self) -> int:
+        return CLUSTER_STAKE_AMOUNTS.get(self.cluster, VALIDATOR_STAKE_AMOUNT)
+
+    @property
+    def statefulset(self) -> str:
+        return f"{self.cluster.value}-aptos-node-{self.index}-validator"
+
+    @property
+    def pod(self) -> str:
+        return f"{self.statefulset}-0"
+
+
+def voting_power(nodes: Iterable[ValidatorNode]) -> int:
+    return sum(node.stake for node in nodes)
+
+
+def validator_objects(
+    cluster: Cluster, objects: Dict[str, dict], keys: List[str]
+) -> Dict[str, ValidatorNode]:
+    """
+    The validator statefulsets among the given objects of the cluster's render, by object key
+    """
+    validators = {}
+    for key in keys:
+        obj = objects[key]
+        match = VALIDATOR_STATEFULSET_PATTERN.match(obj["metadata"]["name"])
+        if obj["kind"] == "StatefulSet" and match and match.group("release") == cluster.value:
+            validators[key] = ValidatorNode(cluster, int(match.group("index")))
+    return validators
+
+
+def plan_batches(
+    validators: Dict[Cluster, List[ValidatorNode]], batch_size: int, max_power: int
+) -> List[List[ValidatorNode]]:
+    """
+    Split the validators into batches of at most batch_size validators and max_power voting power, taking
+    one validator from each cluster in turn, so that every batch spreads across as many regions as it can.
+    A validator with more stake than max_power gets a batch of its own, which the caller has to reject
+    """
+    queues = [
+        sorted(cluster_validators, key=lambda node: node.index)
+        for cluster_validators in validators.values()
+    ]
+    interleaved = [
+        node
+        for round_nodes in itertools.zip_longest(*queues)
+        for node in round_nodes
+        if node is not None
+    ]
+    batches: List[List[ValidatorNode]] = []
+    for node in interleaved:
+        if (
+            not batches
+            or len(batches[-1]) >= batch_size
+            or voting_power(batches[-1]) + node.stake > max_power
+        ):
+            batches.append([])
+        batches[-1].append(node)
+    return batches
+
+
+def pod_ready(pod) -> bool:
+    return any(
+        condition.type == "Ready" and condition.status == "True"
+        for condition in pod.status.conditions or []
+    )
+
+
+def unready_validators(clusters: List[Cluster]) -> Set[ValidatorNode]:
+    """
+    Validators whose pod is missing or not Ready, listed from every cluster at once
+    """
+
+    def cluster_unready(cluster: Cluster) -> Set[ValidatorNode]:
+        pods = core_v1_api(cluster).list_namespaced_pod(NAMESPACE).items
+        ready = {pod.metadata.name for pod in pods if pod_ready(pod)}
+        return {
+            ValidatorNode(cluster, i)
+            for i in range(CLUSTERS[cluster])
+            if ValidatorNode(cluster, i).pod not in ready
+        }
+
+    unready: Set[ValidatorNode] = set()
+    for result in run_on_clusters(cluster_unready, clusters).values():
+        if not result.ok:
+            raise result.error
+        unready |= result.value
+    return unready
+
+
+def statefulset_rolled_out(statefulset) -> bool:
+    """
+    Whether the statefulset's latest spec is rolled out to all its replicas, and they are all Ready
+    """
+    status = statefulset.status
+    replicas = statefulset.spec.replicas or 0
+    return (
+        (status.observed_generation or 0) >= statefulset.metadata.generation
+        and (status.updated_replicas or 0) >= replicas
+        and (status.ready_replicas or 0) >= replicas
+        and status.current_revision == status.update_revision
+    )
+
+
+def rolled_out(batch: List[ValidatorNode]) -> bool:
+    by_cluster: Dict[Cluster, List[ValidatorNode]] = {}
+    for node in batch:
+        by_cluster.setdefault(node.cluster, []).append(node)
+
+    def cluster_rolled_out(cluster: Cluster) -> bool:
+        api = apps_v1_api(cluster)
+        return all(
+            statefulset_rolled_out(api.read_namespaced_stateful_set(node.statefulset, NAMESPACE))
+            for node in by_cluster[cluster]
+        )
+
+    results = run_on_clusters(cluster_rolled_out, list(by_cluster))
+    for result in results.values():
+        if not result.ok:
+            raise result.error
+    return all(result.value for result in results.values())
+
+
+def lagging_validators(
+    batch: List[ValidatorNode], targets: Dict[ValidatorNode, str], max_ledger_lag: int
+) -> List[ValidatorNode]:
+    """
+    Validators of the batch whose REST API is down, or more than max_ledger_lag versions behind the
+    most up to date validator
+    """
+    probes = {
+        probe.target: probe
+        for probe in probe_targets(
+            {target: node.cluster for node, target in targets.items()}, attempts=1
+        )
+    }
+    highest_version = max(probe.ledger_version for probe in probes.values())
+    return [
+        node
+        for node in batch
+        if not probes[targets[node]].healthy
+        or highest_version - probes[targets[node]].ledger_version > max_ledger_lag
+    ]
+
+
+def wait_until(condition: Callable[[], bool], timeout_secs: int, description: str) -> None:
+    deadline = time.time() + timeout_secs
+    while not condition():
+        if time.time() > deadline:
+            raise TimeoutError(f"Timed out after {timeout_secs}s waiting for {description}")
+        time.sleep(ROLLOUT_POLL_INTERVAL_SECS)
+
+
+@dataclass
+class BatchTiming:
+    nodes: List[ValidatorNode]
+    # waiting for other validators to recover, so the batch doesn't take more than f of the voting power down
+    headroom_secs: float
+    apply_secs: float
+    ready_secs: float
+    catch_up_secs: float
+
+    @property
+    def total_secs(self) -> float:
+        return self.headroom_secs + self.apply_secs + self.ready_secs + self.catch_up_secs
+
+
+def rolling_upgrade(
+    batches: List[List[ValidatorNode]],
+    apply_batch: Callable[[List[ValidatorNode]], None],
+    targets: Dict[ValidatorNode, str],
+    max_power: int,
+    timeout_secs: int,
+    max_ledger_lag: int,
+    on_batch: Callable[[int, BatchTiming], None] = lambda i, timing: None,
+) -> List[BatchTiming]:
+    """
+    Upgrade the batches one after the other. Before each batch, wait until the voting power of the
+    validators that are down, together with the batch, is at most max_power. After applying it, wait until the batch's pods are
+    rolled out and Ready, and its REST APIs have caught up with the rest of the network
+    """
+    clusters = list(CLUSTERS)
+    timings = []
+    for i, batch in enumerate(batches):
+        start_time = time.time()
+        wait_until(
+            lambda: voting_power(unready_validators(clusters) | set(batch)) <= max_power,
+            timeout_secs,
+            "enough of the other validators to be up to leave room for the batch",
+        )
+        headroom_time = time.time()
+        apply_batch(batch)
+        applied_time = time.time()
+        wait_until(lambda: rolled_out(batch), timeout_secs, "the batch to be rolled out and Ready")
+        ready_time = time.time()
+        wait_until(
+            lambda: not lagging_validators(batch, targets, max_ledger_lag),
+            timeout_secs,
+            f"the batch to be within {max_ledger_lag} versions of the network",
+        )
+        timing = BatchTiming(
+            nodes=batch,
+            headroom_secs=headroom_time - start_time,
+            apply_secs=applied_time - headroom_time,
+            ready_secs=ready_time - applied_time,
+            catch_up_secs=time.time() - ready_time,
+        )
+        timings.append(timing)
+        on_batch(i, timing)
+    return timings
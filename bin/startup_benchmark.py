@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+import click
+
+# commands that should start without reading config or importing kubernetes
+DEFAULT_COMMANDS = [
+    "./bin/cluster.py --help",
+    "./bin/cluster.py kube --help",
+    "./bin/cluster.py helm --help",
+    "./bin/loadtest.py --help",
+]
+
+
+def time_command(command: str, runs: int) -> List[float]:
+    timings = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *command.split()],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+def imports_kubernetes(command: str) -> bool:
+    """
+    Whether running the command imports the kubernetes package, according to -X importtime
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *command.split()],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return any(line.rstrip().endswith("| kubernetes") for line in proc.stderr.splitlines())
+
+
+@click.command()
+@click.argument("commands", nargs=-1)
+@click.option(
+    "--runs",
+    type=int,
+    default=10,
+    show_default=True,
+    help="Number of times to run each command",
+)
+def main(commands: List[str], runs: int) -> None:
+    """
+    Measure the wall time from process start to exit of CLI commands.
+    Must be run from the root of the repository.
+
+    \b
+    params:
+        commands - Commands to time, e.g. "./bin/cluster.py --help". Defaults to the --help of each CLI
+    """
+    for command in commands or DEFAULT_COMMANDS:
+        timings = time_command(command, runs)
+        print(
+            f"{command}: median {statistics.median(timings) * 1000:.0f}ms, "
+            f"min {min(timings) * 1000:.0f}ms, max {max(timings) * 1000:.0f}ms, "
+            f"imports kubernetes: {imports_kubernetes(command)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
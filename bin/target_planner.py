@@ -0,0 +1,133 @@
+import csv
+import math
+import statistics
+from dataclasses import dataclass
+from functools import reduce
+from typing import Dict, List, Optional, Tuple
+
+from constants import Cluster
+from target_probe import ProbeResult
+
+RTT_LATENCY_FILE = "data/google_cloud_inter_region_ping_rtt_latency.csv"
+# round trip within a region, which the inter-region measurements don't cover
+INTRA_REGION_RTT_MS = 1.0
+# each node's share of the load is split into this many slots per unit of capacity
+SLOTS_PER_NODE = 4
+
+
+def load_rtt_matrix(path: str = RTT_LATENCY_FILE) -> Dict[Tuple[str, str], float]:
+    """
+    (sending region, receiving region) -> ping RTT in milliseconds
+    """
+    with open(path, "r", newline="") as f:
+        return {
+            (row["sending_region"], row["receiving_region"]): float(row["milliseconds"])
+            for row in csv.DictReader(f)
+        }
+
+
+def region_rtt_ms(rtt: Dict[Tuple[str, str], float], source: str, destination: str) -> float:
+    if source == destination:
+        return INTRA_REGION_RTT_MS
+    if (source, destination) in rtt:
+        return rtt[(source, destination)]
+    if (destination, source) in rtt:
+        return rtt[(destination, source)]
+    raise Exception(f"No RTT between {source} and {destination} in {RTT_LATENCY_FILE}")
+
+
+def node_excess_latency_ms(probes: Dict[str, ProbeResult]) -> Dict[str, float]:
+    """
+    How much slower each probed node responded than the median node of its cluster. The probes
+    run from one place, so only the difference within a cluster says something about the node itself
+    """
+    by_cluster: Dict[Cluster, List[float]] = {}
+    for probe in probes.values():
+        by_cluster.setdefault(probe.cluster, []).append(probe.latency_ms)
+    medians = {cluster: statistics.median(latencies) for cluster, latencies in by_cluster.items()}
+    return {
+        target: max(0.0, probe.latency_ms - medians[probe.cluster])
+        for target, probe in probes.items()
+    }
+
+
+@dataclass
+class TargetPlan:
+    # each emitter's targets. Targets are repeated to give them a bigger share of the emitter's load
+    targets: Dict[Cluster, List[str]]
+    # each target's share of the total load
+    load: Dict[str, float]
+    # load-weighted mean of the estimated emitter to target latency
+    mean_latency_ms: float
+
+
+def plan_targets(
+    emitters: List[Cluster],
+    targets: Dict[str, Cluster],
+    rtt: Dict[Tuple[str, str], float],
+    probes: Optional[Dict[str, ProbeResult]] = None,
+    capacities: Optional[Dict[str, float]] = None,
+) -> TargetPlan:
+    """
+    Split the targets among the emitters so that each target gets load in proportion to its capacity,
+    and each emitter sends as much of its load as it can to the targets closest to it.
+
+    This is a transportation problem: the emitters supply equal load, each target demands load in
+    proportion to its capacity, and the cost of each emitter to target route is the RTT between their
+    regions plus how much slower the target probed than its peers. It is solved over integer load slots
+    with the least cost method, which is optimal when the emitters' own regions can absorb their load
+    and close to it otherwise
+    """
+    if probes is not None:
+        targets = {target: cluster for target, cluster in targets.items() if target in probes}
+    if not emitters or not targets:
+        raise Exception("Need at least one emitter and one target to plan")
+    excess_latency_ms = node_excess_latency_ms(probes) if probes else {}
+    capacities = capacities or {}
+
+    demand = {
+        target: max(1, round(capacities.get(target, 1.0) * SLOTS_PER_NODE))
+        for target in targets
+    }
+    total_slots = sum(demand.values())
+    supply = {
+        emitter: total_slots // len(emitters) + (1 if i < total_slots % len(emitters) else 0)
+        for i, emitter in enumerate(emitters)
+    }
+    cost = {
+        (emitter, target): region_rtt_ms(rtt, emitter.region, cluster.region)
+        + excess_latency_ms.get(target, 0.0)
+        for emitter in emitters
+        for target, cluster in targets.items()
+    }
+
+    flow: Dict[Tuple[Cluster, str], int] = {}
+    for emitter, target in sorted(
+        cost, key=lambda route: (cost[route], emitters.index(route[0]), route[1])
+    ):
+        slots = min(supply[emitter], demand[target])
+        if slots:
+            flow[(emitter, target)] = slots
+            supply[emitter] -= slots
+            demand[target] -= slots
+
+    emitter_targets: Dict[Cluster, List[str]] = {}
+    for emitter in emitters:
+        routes = sorted(
+            ((target, slots) for (e, target), slots in flow.items() if e == emitter),
+            key=lambda route: (cost[(emitter, route[0])], route[0]),
+        )
+        unit = reduce(math.gcd, (slots for _, slots in routes), 0) or 1
+        emitter_targets[emitter] = [
+            target for target, slots in routes for _ in range(slots // unit)
+        ]
+
+    load: Dict[str, float] = {}
+    for (_, target), slots in flow.items():
+        load[target] = load.get(target, 0.0) + slots / total_slots
+    return TargetPlan(
+        targets=emitter_targets,
+        load=load,
+        mean_latency_ms=sum(cost[route] * slots for route, slots in flow.items())
+        / total_slots,
+    )
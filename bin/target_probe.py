@@ -0,0 +1,167 @@
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from constants import Cluster
+
+PROBE_PATH = "/v1"
+PROBE_DEPENDENCY_ERROR = "Probing targets requires aiohttp, install it with `pip install aiohttp`"
+# with latency weighting, the fastest target is repeated this many times in the emitter's targets
+LATENCY_WEIGHT_MAX_REPEATS = 4
+
+
+@dataclass
+class ProbeResult:
+    target: str
+    cluster: Cluster
+    latency_ms: float = float("inf")
+    ledger_version: int = -1
+    error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.error is None
+
+
+def probe_available() -> bool:
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+async def probe_target(
+    session, target: str, cluster: Cluster, attempts: int
+) -> ProbeResult:
+    """
+    GET the target's /v1 index `attempts` times, and record the median latency and the latest ledger version
+    """
+    result = ProbeResult(target=target, cluster=cluster)
+    latencies = []
+    try:
+        for _ in range(attempts):
+            start_time = time.perf_counter()
+            async with session.get(f"{target}{PROBE_PATH}") as response:
+                response.raise_for_status()
+                index = await response.json(content_type=None)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            result.ledger_version = max(result.ledger_version, int(index["ledger_version"]))
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        return result
+    result.latency_ms = statistics.median(latencies)
+    return result
+
+
+async def probe_targets_async(
+    targets: Dict[str, Cluster], attempts: int, timeout_secs: float, concurrency: int
+) -> List[ProbeResult]:
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError(PROBE_DEPENDENCY_ERROR) from e
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=timeout_secs)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        return await asyncio.gather(
+            *[
+                probe_target(session, target, cluster, attempts)
+                for target, cluster in targets.items()
+            ]
+        )
+
+
+def probe_targets(
+    targets: Dict[str, Cluster],
+    attempts: int = 3,
+    timeout_secs: float = 5.0,
+    concurrency: int = 64,
+) -> List[ProbeResult]:
+    """
+    Probe every target concurrently, over a shared pool of at most `concurrency` connections
+    """
+    if not targets:
+        return []
+    return asyncio.run(probe_targets_async(targets, attempts, timeout_secs, concurrency))
+
+
+@dataclass
+class ProbeFilterResult:
+    kept: Dict[str, ProbeResult] = field(default_factory=dict)
+    # target -> reason
+    dropped: Dict[str, str] = field(default_factory=dict)
+
+
+def filter_probe_results(
+    results: Iterable[ProbeResult], max_ledger_lag: int, max_latency_ms: float
+) -> ProbeFilterResult:
+    """
+    Drop targets that failed the probe, are more than max_ledger_lag versions behind the most
+    up to date target, or are slower than max_latency_ms
+    """
+    results = list(results)
+    filtered = ProbeFilterResult()
+    highest_version = max((result.ledger_version for result in results), default=-1)
+    for result in results:
+        if not result.healthy:
+            filtered.dropped[result.target] = f"unhealthy ({result.error})"
+        elif highest_version - result.ledger_version > max_ledger_lag:
+            filtered.dropped[result.target] = (
+                f"lagging {highest_version - result.ledger_version} versions"
+            )
+        elif result.latency_ms > max_latency_ms:
+            filtered.dropped[result.target] = f"slow ({result.latency_ms:.0f}ms)"
+        else:
+            filtered.kept[result.target] = result
+    return filtered
+
+
+@dataclass
+class TargetFilter:
+    """
+    Selects the loadtest targets of each cluster from the probed targets
+    """
+
+    probes: Dict[str, ProbeResult]
+    # keep only the fastest N targets of each cluster
+    fastest_n: Optional[int] = None
+    # repeat targets in inverse proportion to their latency, so faster targets get a bigger share of the load
+    weight_by_latency: bool = False
+
+    def select(self, cluster_targets: Dict[Cluster, List[str]]) -> List[str]:
+        selected = []
+        for targets in cluster_targets.values():
+            targets = sorted(
+                (target for target in targets if target in self.probes),
+                key=lambda target: self.probes[target].latency_ms,
+            )
+            selected.extend(targets[: self.fastest_n] if self.fastest_n else targets)
+        if self.weight_by_latency:
+            return self.weighted(selected)
+        return selected
+
+    def weighted(self, targets: List[str]) -> List[str]:
+        """
+        Repeat each target round(fastest latency / its latency * LATENCY_WEIGHT_MAX_REPEATS) times, and at least once
+        """
+        if not targets:
+            return targets
+        fastest_ms = max(min(self.probes[target].latency_ms for target in targets), 1.0)
+        return [
+            target
+            for target in targets
+            for _ in range(
+                max(
+                    1,
+                    round(
+                        fastest_ms
+                        / max(self.probes[target].latency_ms, 1.0)
+                        * LATENCY_WEIGHT_MAX_REPEATS
+                    ),
+                )
+            )
+        ]
@@ -0,0 +1,147 @@
+import math
+import statistics
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from emitter_stats import EmitterSample
+from results_store import aligned_window
+
+# two-sided 95% normal quantile, for the confidence bounds of a step's committed TPS
+Z_95 = 1.96
+
+
+@dataclass
+class StepResult:
+    target_tps: int
+    # network-wide, summed across the emitters
+    submitted_tps: float
+    committed_tps: float
+    # half width of the 95% confidence interval of committed_tps
+    committed_tps_ci: float
+    # mean across the emitters
+    p99_latency_ms: float
+    run_id: str = ""
+
+    @property
+    def commit_ratio(self) -> float:
+        return self.committed_tps / self.submitted_tps if self.submitted_tps else 0.0
+
+
+@dataclass
+class SweepCriteria:
+    min_commit_ratio: float
+    max_p99_latency_ms: float
+
+    def sustainable(self, step: StepResult) -> bool:
+        return (
+            step.commit_ratio >= self.min_commit_ratio
+            and step.p99_latency_ms <= self.max_p99_latency_ms
+        )
+
+
+@dataclass
+class SweepResult:
+    steps: List[StepResult] = field(default_factory=list)
+    # highest sustainable step, and lowest unsustainable step above it
+    best: Optional[StepResult] = None
+    knee: Optional[StepResult] = None
+
+
+def aligned_samples(
+    samples: Dict[str, Sequence[EmitterSample]]
+) -> Dict[str, Sequence[EmitterSample]]:
+    """
+    Only the samples within the aligned window of the results store, as one run of these emitters
+    """
+    emitters = [list(emitter_samples) for emitter_samples in samples.values()]
+    cluster = np.repeat(np.arange(len(emitters)), [len(emitter_samples) for emitter_samples in emitters])
+    timestamp = np.array(
+        [sample.timestamp for emitter_samples in emitters for sample in emitter_samples], dtype=np.float64
+    )
+    mask = aligned_window(np.zeros(len(cluster), dtype=np.int64), cluster, timestamp, 1, len(emitters))
+    return {
+        name: [sample for sample, keep in zip(emitter_samples, mask[cluster == i]) if keep]
+        for i, (name, emitter_samples) in enumerate(zip(samples, emitters))
+    }
+
+
+def summarize_step(
+    target_tps: int,
+    samples: Dict[str, Sequence[EmitterSample]],
+    warmup_fraction: float = 0.1,
+    run_id: str = "",
+) -> StepResult:
+    """
+    Summarize one run from each emitter's samples, over the window in which all emitters were reporting,
+    ignoring the warmup at the start of each emitter's run
+    """
+    samples = aligned_samples(samples)
+    submitted, committed, variance, p99 = 0.0, 0.0, 0.0, []
+    for emitter_samples in samples.values():
+        steady = list(emitter_samples)[math.floor(len(emitter_samples) * warmup_fraction) :]
+        if not steady:
+            continue
+        committed_tps = [sample.committed_tps for sample in steady]
+        submitted += statistics.fmean(sample.submitted_tps for sample in steady)
+        committed += statistics.fmean(committed_tps)
+        if len(steady) > 1:
+            variance += statistics.variance(committed_tps) / len(steady)
+        # lines without latency are left out, rather than counted as 0ms
+        reported_p99 = [
+            sample.p99_latency_ms for sample in steady if not math.isnan(sample.p99_latency_ms)
+        ]
+        if reported_p99:
+            p99.append(statistics.fmean(reported_p99))
+    return StepResult(
+        target_tps=target_tps,
+        submitted_tps=submitted,
+        committed_tps=committed,
+        committed_tps_ci=Z_95 * math.sqrt(variance),
+        p99_latency_ms=statistics.fmean(p99) if p99 else math.inf,
+        run_id=run_id,
+    )
+
+
+def search_max_tps(
+    run_step: Callable[[int], StepResult],
+    criteria: SweepCriteria,
+    start_tps: int,
+    max_tps: int,
+    ramp_factor: float = 2.0,
+    resolution: int = 500,
+    max_steps: int = 12,
+    on_step: Callable[[StepResult, bool], None] = lambda step, sustainable: None,
+) -> SweepResult:
+    """
+    Ramp the target TPS geometrically from start_tps until a step is unsustainable, then binary search
+    between the last sustainable and the first unsustainable target until they are within resolution
+    """
+    result = SweepResult()
+
+    def step(target_tps: int) -> bool:
+        step_result = run_step(target_tps)
+        sustainable = criteria.sustainable(step_result)
+        result.steps.append(step_result)
+        on_step(step_result, sustainable)
+        if sustainable:
+            result.best = step_result
+        else:
+            result.knee = step_result
+        return sustainable
+
+    target_tps = start_tps
+    while len(result.steps) < max_steps and step(target_tps):
+        if target_tps >= max_tps:
+            return result
+        target_tps = min(max_tps, max(target_tps + 1, int(target_tps * ramp_factor)))
+
+    if result.best is None:
+        return result
+    while (
+        len(result.steps) < max_steps
+        and result.knee.target_tps - result.best.target_tps > resolution
+    ):
+        step((result.best.target_tps + result.knee.target_tps) // 2)
+    return result
@@ -0,0 +1,66 @@
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+from emitter_stats import (  # noqa: E402
+    IncompleteLines,
+    parse_emitter_line,
+    parse_emitter_stream,
+    split_log_timestamp,
+)
+
+RATE_LINE = (
+    "submitted: 4979 txn/s, committed: 4969 txn/s, expired: 2 txn/s, failed submission: 1 txn/s, "
+    "latency: 3380 ms, (p50: 3300 ms, p90: 4300 ms, p99: 5900 ms), latency samples: 49690"
+)
+
+
+def test_parse_emitter_line():
+    sample = parse_emitter_line(RATE_LINE, 10.0)
+    assert sample.timestamp == 10.0
+    assert sample.submitted_tps == 4979 and sample.committed_tps == 4969
+    assert sample.expired_tps == 2 and sample.failed_submission_tps == 1
+    assert sample.p50_latency_ms == 3300 and sample.p99_latency_ms == 5900
+    assert parse_emitter_line("minting accounts...", 10.0) is None
+
+
+def test_misspelled_unit():
+    sample = parse_emitter_line(RATE_LINE.replace("failed submission: 1 txn/s", "failed submission: 7 tnx/s"), 0)
+    assert sample.failed_submission_tps == 7
+
+
+def test_missing_fields_are_nan():
+    sample = parse_emitter_line("submitted: 10 txn/s, committed: 9 txn/s, expired: 0 txn/s", 0)
+    assert sample.committed_tps == 9 and sample.expired_tps == 0
+    assert math.isnan(sample.p99_latency_ms) and math.isnan(sample.failed_submission_tps)
+    # without submitted and committed there is no sample
+    assert parse_emitter_line("submitted: 10 txn/s", 0) is None
+
+
+def test_stream_reports_incomplete_lines(capsys):
+    incomplete = IncompleteLines("bench")
+    lines = [RATE_LINE, RATE_LINE.replace(", (p50: 3300 ms, p90: 4300 ms, p99: 5900 ms)", ""), "other"]
+    samples = list(parse_emitter_stream(lines, incomplete))
+    assert len(samples) == 2
+    assert incomplete.count == 1
+    assert "p50, p90, p99" in capsys.readouterr().out
+
+
+def test_split_log_timestamp():
+    timestamp, line = split_log_timestamp(f"2024-05-01T12:00:00.250000000Z {RATE_LINE}")
+    assert timestamp == 1714564800.25
+    assert line == RATE_LINE
+    timestamp, _ = split_log_timestamp("2024-05-01T14:00:00+02:00 x")
+    assert timestamp == 1714564800
+    assert split_log_timestamp(RATE_LINE) == (None, RATE_LINE)
+
+
+def test_stream_uses_logged_timestamps():
+    # a log backlog read all at once keeps the times the lines were logged
+    lines = [
+        f"2024-05-01T12:00:0{second}Z {RATE_LINE}" for second in range(3)
+    ]
+    samples = list(parse_emitter_stream(lines))
+    assert [sample.timestamp for sample in samples] == [1714564800, 1714564801, 1714564802]
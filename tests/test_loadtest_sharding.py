@@ -0,0 +1,55 @@
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+from constants import CLUSTERS  # noqa: E402
+from loadtest import shard_loadtest_config  # noqa: E402
+
+CLUSTER = list(CLUSTERS)[0]
+
+
+def shard_configs(targets, shards, target_tps=7000, mempool_backlog=700):
+    config = {
+        "targets": targets,
+        "target_tps": target_tps,
+        "mempool_backlog": mempool_backlog,
+        "emitters_per_cluster": shards,
+        "account_minter_seed": None,
+    }
+    return [shard_loadtest_config(CLUSTER, config, shard) for shard in range(shards)]
+
+
+def test_single_emitter_is_unchanged():
+    [config] = shard_configs(["a", "b"], 1)
+    assert config["targets"] == ["a", "b"] and config["target_tps"] == 7000
+
+
+def test_weights_are_preserved():
+    targets = ["a", "a", "b", "c", "c", "c", "d"]
+    configs = shard_configs(targets, 3)
+    assert sum(config["target_tps"] for config in configs) == 7000
+    assert sum(config["mempool_backlog"] for config in configs) == 700
+    # each target keeps all its copies in one emitter
+    assert Counter(target for config in configs for target in config["targets"]) == Counter(targets)
+    # and each emitter's load is the share of the cluster's copies it holds
+    for config in configs:
+        assert config["target_tps"] == 7000 * len(config["targets"]) // len(targets)
+    assert len({config["account_minter_seed"] for config in configs}) == 3
+
+
+def test_more_emitters_than_targets():
+    configs = shard_configs(["a", "a", "b"], 5, target_tps=6000)
+    assert sum(config["target_tps"] for config in configs) == 6000
+    tps_by_target = Counter()
+    for config in configs:
+        [target] = set(config["targets"])
+        tps_by_target[target] += config["target_tps"]
+    # shared targets split their load, rather than each emitter sending them the whole of it
+    assert tps_by_target == {"a": 4000, "b": 2000}
+
+
+def test_unlimited_tps_stays_unlimited():
+    configs = shard_configs(["a", "b"], 2, target_tps=0)
+    assert [config["target_tps"] for config in configs] == [0, 0]
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+from emitter_stats import SAMPLE_FIELDS  # noqa: E402
+from results_store import (  # noqa: E402
+    ResultsStore,
+    aligned_window,
+    group_mean,
+    steady_state_mask,
+)
+
+
+def test_aligned_window():
+    # run 0: cluster 0 reports 0..9, cluster 1 reports 3..12. run 1: the clusters never overlap
+    run = np.array([0] * 10 + [0] * 10 + [1] * 2 + [1] * 2)
+    cluster = np.array([0] * 10 + [1] * 10 + [0] * 2 + [1] * 2)
+    timestamp = np.r_[np.arange(10), np.arange(3, 13), [0, 1], [5, 6]].astype(float)
+    mask = aligned_window(run, cluster, timestamp, 2, 2)
+    assert list(timestamp[mask & (run == 0) & (cluster == 0)]) == list(range(3, 10))
+    assert list(timestamp[mask & (run == 0) & (cluster == 1)]) == list(range(3, 10))
+    assert mask[run == 1].all()
+    assert len(aligned_window(np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0), 0, 0)) == 0
+
+
+def test_steady_state_mask():
+    # two clusters with 10 samples each, the second starting 2s later
+    run = np.zeros(20, dtype=np.int64)
+    cluster = np.repeat([0, 1], 10)
+    timestamp = np.r_[np.arange(10), np.arange(2, 12)].astype(float)
+    columns = {name: np.zeros(20) for name in SAMPLE_FIELDS}
+    columns.update(run=run, cluster=cluster, timestamp=timestamp)
+    store = ResultsStore(runs=[None], columns=columns, cluster_names=["a", "b"])
+    mask = steady_state_mask(store, warmup_fraction=0.25)
+    # the aligned window is 2..9, 8 samples per cluster, of which the first 2 are warmup
+    assert list(timestamp[mask & (cluster == 0)]) == list(range(4, 10))
+    assert list(timestamp[mask & (cluster == 1)]) == list(range(4, 10))
+
+
+def test_group_mean_ignores_nan():
+    values = np.array([1.0, np.nan, 3.0, np.nan])
+    means = group_mean(values, np.array([0, 0, 1, 2]), 3)
+    assert means[0] == 1.0 and means[1] == 3.0 and np.isnan(means[2])
@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+import rolling_upgrade  # noqa: E402
+from constants import CLUSTERS, VALIDATOR_STAKE_AMOUNT  # noqa: E402
+from rolling_upgrade import (  # noqa: E402
+    ValidatorNode,
+    max_faulty_voting_power,
+    plan_batches,
+    quorum_voting_power,
+    voting_power,
+)
+
+US, EUROPE, ASIA = list(CLUSTERS)[:3]
+
+
+def validators(counts):
+    return {cluster: [ValidatorNode(cluster, i) for i in range(count)] for cluster, count in counts.items()}
+
+
+def test_quorum():
+    assert quorum_voting_power(100) == 67
+    assert max_faulty_voting_power(100) == 33
+    assert max_faulty_voting_power(3) == 0
+    assert max_faulty_voting_power(4) == 1
+
+
+def test_batches_interleave_regions():
+    batches = plan_batches(validators({US: 3, EUROPE: 2, ASIA: 1}), 4, 100 * VALIDATOR_STAKE_AMOUNT)
+    assert [[(node.cluster, node.index) for node in batch] for batch in batches] == [
+        [(US, 0), (EUROPE, 0), (ASIA, 0), (US, 1)],
+        [(EUROPE, 1), (US, 2)],
+    ]
+
+
+def test_batches_stay_within_stake_budget(monkeypatch):
+    monkeypatch.setattr(rolling_upgrade, "CLUSTER_STAKE_AMOUNTS", {US: 10 * VALIDATOR_STAKE_AMOUNT})
+    budget = 12 * VALIDATOR_STAKE_AMOUNT
+    batches = plan_batches(validators({US: 2, EUROPE: 4, ASIA: 4}), 10, budget)
+    assert all(voting_power(batch) <= budget for batch in batches)
+    assert sorted((node.cluster.value, node.index) for batch in batches for node in batch) == sorted(
+        (cluster.value, i) for cluster, count in {US: 2, EUROPE: 4, ASIA: 4}.items() for i in range(count)
+    )
+    # a heavy validator takes most of a batch, so it holds fewer validators than --batch-size
+    assert [len(batch) for batch in batches] == [3, 3, 4]
+
+
+def test_heavy_validator_gets_its_own_batch(monkeypatch):
+    monkeypatch.setattr(rolling_upgrade, "CLUSTER_STAKE_AMOUNTS", {US: 10 * VALIDATOR_STAKE_AMOUNT})
+    batches = plan_batches(validators({US: 1, EUROPE: 2}), 10, 5 * VALIDATOR_STAKE_AMOUNT)
+    assert [[node.cluster for node in batch] for batch in batches] == [[US], [EUROPE, EUROPE]]
@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bin"))
+
+from constants import CLUSTERS  # noqa: E402
+from target_probe import (  # noqa: E402
+    TargetFilter,
+    filter_probe_results,
+    probe_targets,
+)
+
+# path -> (ledger version, delay in seconds), or None to fail with a 500
+STUB_NODES = {
+    "/fast": (1000, 0),
+    "/medium": (1000, 0.05),
+    "/slow": (1000, 0.5),
+    "/lagging": (10, 0),
+    "/down": None,
+}
+
+
+class StubNodeHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        node = STUB_NODES.get(self.path[: -len("/v1")]) if self.path.endswith("/v1") else None
+        if node is None:
+            self.send_response(500)
+            self.end_headers()
+            return
+        ledger_version, delay_secs = node
+        time.sleep(delay_secs)
+        body = json.dumps({"chain_id": 4, "ledger_version": str(ledger_version)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+@pytest.fixture(scope="module")
+def targets():
+    pytest.importorskip("aiohttp")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubNodeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    cluster = list(CLUSTERS)[0]
+    yield {
+        f"http://127.0.0.1:{server.server_address[1]}{path}": cluster
+        for path in STUB_NODES
+    }
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def probes(targets):
+    return {
+        result.target.rsplit("/", 1)[1]: result
+        for result in probe_targets(targets, attempts=2, timeout_secs=5)
+    }
+
+
+def test_probe_targets(probes):
+    assert probes["fast"].healthy and probes["fast"].ledger_version == 1000
+    assert probes["lagging"].healthy and probes["lagging"].ledger_version == 10
+    assert not probes["down"].healthy
+    assert probes["fast"].latency_ms < probes["slow"].latency_ms
+
+
+def test_filter_probe_results(probes):
+    filtered = filter_probe_results(probes.values(), max_ledger_lag=100, max_latency_ms=300)
+    kept = {target.rsplit("/", 1)[1] for target in filtered.kept}
+    dropped = {target.rsplit("/", 1)[1]: reason for target, reason in filtered.dropped.items()}
+    assert kept == {"fast", "medium"}
+    assert dropped["down"].startswith("unhealthy")
+    assert dropped["lagging"].startswith("lagging 990 versions")
+    assert dropped["slow"].startswith("slow")
+
+
+def test_fastest_n(probes, targets):
+    filtered = filter_probe_results(probes.values(), max_ledger_lag=100, max_latency_ms=10000)
+    cluster = list(CLUSTERS)[0]
+    # --fastest-n keeps the fastest of the targets that passed the probe, whatever their order
+    selected = TargetFilter(probes=filtered.kept, fastest_n=2).select({cluster: list(targets)})
+    assert [target.rsplit("/", 1)[1] for target in selected] == ["fast", "medium"]
+    selected = TargetFilter(probes=filtered.kept).select({cluster: list(targets)})
+    assert sorted(target.rsplit("/", 1)[1] for target in selected) == ["fast", "medium", "slow"]